@@ -0,0 +1,449 @@
+#! python3  # noqa: E265
+
+#   Copyright (C) 2016 BRGM (http:///brgm.fr)
+#   Copyright (C) 2016 Oslandia <infos@oslandia.com>
+#
+#   This library is free software; you can redistribute it and/or
+#   modify it under the terms of the GNU Library General Public
+#   License as published by the Free Software Foundation; either
+#   version 2 of the License, or (at your option) any later version.
+#
+#   This library is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   Library General Public License for more details.
+#   You should have received a copy of the GNU Library General Public
+#   License along with this library; if not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Extraction of the id, geometries and attribute values of GML feature nodes.
+
+    This module imports no QGIS module: it runs in the worker processes used to
+    load big documents, which are plain Python interpreters. Geometries are
+    returned as WKB.
+"""
+
+# standard library
+import copy
+import functools
+import re
+import struct
+import xml.etree.ElementTree as ET
+
+from osgeo import ogr, osr
+
+from gml_application_schema_toolbox.core.xml_utils import (
+    no_prefix,
+    ns_agnostic_xpath,
+    remove_prefix,
+    resolve_xpath,
+    split_tag,
+)
+
+
+def _own_srs_name(tree):
+    # srsName attribute of the current element
+    for k, v in tree.attrib.items():
+        if no_prefix(k) == "srsName":
+            return v
+    return None
+
+
+def _get_srs_name(tree, inherited_srs=None):
+    # get srsName, either from the current element, from an ancestor
+    # (inherited_srs) or from a child
+    n = _own_srs_name(tree)
+    if n is not None:
+        return n
+    if inherited_srs is not None:
+        # no need to look further in the subtree
+        return inherited_srs
+    for child in tree:
+        n = _get_srs_name(child)
+        if n is not None:
+            return n
+    return None
+
+
+@functools.lru_cache(maxsize=64)
+def _get_srid_from_name(srs_name: str) -> tuple:
+    """[summary]
+
+    For reference:
+        EPSG:4326
+        urn:EPSG:geographicCRS:4326
+        urn:ogc:def:crs:EPSG:4326
+        urn:ogc:def:crs:EPSG::4326
+        urn:ogc:def:crs:EPSG:6.6:4326
+        urn:x-ogc:def:crs:EPSG:6.6:4326
+        http://www.opengis.net/gml/srs/epsg.xml#4326
+        http://www.epsg.org/6.11.2/4326
+
+    Results are cached, since a document usually has only a few distinct
+    srsName values and reading the EPSG database is costly.
+
+    :param srs_name: [description]
+    :type srs_name: [str]
+    :return: (srid, True if the axis order is swapped for this srid)
+    :rtype: [type]
+    """
+    sr = osr.SpatialReference()
+
+    # get the last number
+    m = re.search("([0-9]+)/?$", srs_name)
+    srid = int(m.group(1))
+    sr.ImportFromEPSGA(srid)
+    srid_axis_swapped = sr.EPSGTreatsAsLatLong() or sr.EPSGTreatsAsNorthingEasting()
+    return (srid, srid_axis_swapped)
+
+
+# GML elements that may come before coordinates and that are ignored
+_GML_METADATA_TAGS = (
+    "metaDataProperty",
+    "description",
+    "descriptionReference",
+    "identifier",
+    "name",
+)
+
+
+def _gml_srs_dimension(node, default):
+    for k, v in node.attrib.items():
+        if no_prefix(k) == "srsDimension":
+            return int(v)
+    return default
+
+
+def _gml_coordinates(node, dim=2):
+    """Parse the pos, posList or coordinates children of a gml:Point,
+    gml:LineString or gml:LinearRing node.
+
+    :returns: (dimension, flat list of coordinates), or None if the node \
+        is not made of plain coordinates
+    """
+    dim = _gml_srs_dimension(node, dim)
+    coord_dim = None
+    coords = []
+    for child in node:
+        ns, tag = split_tag(child.tag)
+        if not ns.startswith("http://www.opengis.net/gml"):
+            return None
+        if tag in _GML_METADATA_TAGS:
+            continue
+        if child.text is None:
+            return None
+        if tag in ("pos", "posList"):
+            d = _gml_srs_dimension(child, dim)
+            values = [float(v) for v in child.text.split()]
+        elif tag == "coordinates":
+            separators = {no_prefix(k): v for k, v in child.attrib.items()}
+            if (
+                separators.get("decimal", ".") != "."
+                or separators.get("cs", ",") != ","
+                or separators.get("ts", " ") != " "
+            ):
+                # custom separators
+                return None
+            tuples = [t.split(",") for t in child.text.split()]
+            d = len(tuples[0]) if tuples else dim
+            if any(len(t) != d for t in tuples):
+                return None
+            values = [float(v) for t in tuples for v in t]
+        else:
+            return None
+        if coord_dim is not None and d != coord_dim:
+            return None
+        coord_dim = d
+        coords += values
+    if coord_dim not in (2, 3) or len(coords) == 0 or len(coords) % coord_dim != 0:
+        return None
+    return coord_dim, coords
+
+
+def _wkb_points(dim, coords, swap_xy):
+    if swap_xy:
+        coords[0::dim], coords[1::dim] = coords[1::dim], coords[0::dim]
+    return struct.pack("<{}d".format(len(coords)), *coords)
+
+
+def _wkb_from_simple_gml(tree, swap_xy):
+    """Build the (little endian, ISO) WKB of a gml:Point, gml:LineString or
+    gml:Polygon made of plain coordinates, without going through OGR.
+
+    :returns: the WKB, or None if the geometry must be parsed by OGR
+    """
+    ns, tag = split_tag(tree.tag)
+    dim = _gml_srs_dimension(tree, 2)
+    if tag == "Point":
+        r = _gml_coordinates(tree, dim)
+        if r is None or len(r[1]) != r[0]:
+            return None
+        dim, coords = r
+        return struct.pack("<BI", 1, 1001 if dim == 3 else 1) + _wkb_points(
+            dim, coords, swap_xy
+        )
+    elif tag == "LineString":
+        r = _gml_coordinates(tree, dim)
+        if r is None:
+            return None
+        dim, coords = r
+        return struct.pack(
+            "<BII", 1, 1002 if dim == 3 else 2, len(coords) // dim
+        ) + _wkb_points(dim, coords, swap_xy)
+    elif tag == "Polygon":
+        rings = []
+        for child in tree:
+            ns, c_tag = split_tag(child.tag)
+            if c_tag in _GML_METADATA_TAGS:
+                continue
+            if c_tag not in (
+                "exterior",
+                "interior",
+                "outerBoundaryIs",
+                "innerBoundaryIs",
+            ):
+                return None
+            if len(child) != 1 or no_prefix(child[0].tag) != "LinearRing":
+                return None
+            r = _gml_coordinates(child[0], dim)
+            if r is None:
+                return None
+            if c_tag in ("exterior", "outerBoundaryIs"):
+                rings.insert(0, r)
+            else:
+                rings.append(r)
+        exteriors = [
+            c for c in tree if no_prefix(c.tag) in ("exterior", "outerBoundaryIs")
+        ]
+        if len(exteriors) != 1 or any(d != rings[0][0] for d, _ in rings):
+            return None
+        dim = rings[0][0]
+        wkb = struct.pack("<BII", 1, 1003 if dim == 3 else 3, len(rings))
+        for _, coords in rings:
+            wkb += struct.pack("<I", len(coords) // dim)
+            wkb += _wkb_points(dim, coords, swap_xy)
+        return wkb
+    return None
+
+
+def _wkbFromGml(tree, swap_xy, default_srs=None, inherited_srs=None):
+    """Convert a GML geometry node
+
+    :returns: (WKB, srid, True if X/Y axes still have to be swapped), or None
+    """
+    # extract the srid
+    srid = None
+    srid_axis_swapped = False
+
+    srs_name = _get_srs_name(tree, inherited_srs)
+    if srs_name is None and default_srs is not None:
+        srid, srid_axis_swapped = _get_srid_from_name(default_srs)
+    elif srs_name is not None:
+        srid, srid_axis_swapped = _get_srid_from_name(srs_name)
+    else:
+        # No SRID found, force to 4326
+        srid, srid_axis_swapped = 4326, True
+
+    # inversion
+    swap_xy = swap_xy ^ srid_axis_swapped
+
+    # fast path for simple geometries, axes are swapped while building the WKB
+    try:
+        wkb = _wkb_from_simple_gml(tree, swap_xy)
+    except ValueError:
+        # not a number, let OGR deal with it
+        wkb = None
+    if wkb is not None:
+        return wkb, srid, False
+
+    # call ogr for GML parsing
+    s = ET.tostring(tree, encoding="unicode")
+    g = ogr.CreateGeometryFromGML(s)
+    if g is None:
+        return None
+
+    wkb = g.ExportToWkb()
+    if g.GetGeometryType() in (ogr.wkbPolyhedralSurface, ogr.wkbTIN):
+        # Polyhedral and TIN are not supported by QGIS
+        # So we convert them to multipolygon by poking the geometry type
+        # It works only because the memory structure is the same
+        wkb = wkb[:4] + b"\x06" + wkb[5:]
+
+    # axes are swapped by the caller, once the geometry is read by QGIS
+    return wkb, srid, swap_xy
+
+
+def _extractGmlGeometries(
+    tree, swap_xy, default_srs=None, parent=None, inherited_srs=None
+):
+    geoms = []
+    inherited_srs = _own_srs_name(tree) or inherited_srs
+    ns, tag = split_tag(tree.tag)
+    if ns.startswith("http://www.opengis.net/gml"):
+        if tag in [
+            "Point",
+            "LineString",
+            "Polygon",
+            "PolyhedralSurface",
+            "Tin",
+            "MultiPoint",
+            "MultiLineString",
+            "MultiPolygon",
+            "MultiCurve",
+            "MultiSurface",
+            "Curve",
+            "OrientableCurve",
+            "Surface",
+            "CompositeCurve",
+            "CompositeSurface",
+            "MultiGeometry",
+            "Envelope",
+        ]:
+            g = _wkbFromGml(tree, swap_xy, default_srs, inherited_srs)
+            if g is not None:
+                return [(g, parent.tag)]
+
+    for child in tree:
+        geoms += _extractGmlGeometries(child, swap_xy, default_srs, tree, inherited_srs)
+    return geoms
+
+
+def _extractGmlFromXPath(tree, xpath, swap_xy, default_srs=None):
+    r = resolve_xpath(tree, xpath)
+    if r is not None:
+        if isinstance(r, list):
+            return [(_wkbFromGml(x, swap_xy, default_srs), "") for x in r]
+        else:
+            return [(_wkbFromGml(r, swap_xy, default_srs), "")]
+    return None
+
+
+class XPathAttributeMatcher(object):
+    """An XPath expression of an attribute mapping, compiled once for a whole load"""
+
+    def __init__(self, xpath, convert=None):
+        """
+        :param xpath: XPath expression, written for features without namespaces
+        :param convert: function converting the text value to the attribute type, \
+            None if the type is not supported. It is sent to worker processes, \
+            so it must be picklable
+        """
+        self.xpath = xpath
+        self.get_text = xpath.endswith("/text()")
+        path = xpath[0:-7] if self.get_text else xpath
+        ns_path = ns_agnostic_xpath(path)
+        # if the expression cannot run on the original feature, it has to be
+        # evaluated on a copy processed by remove_prefix
+        self.needs_copy = ns_path is None
+        self.path = path if self.needs_copy else ns_path
+        self.convert = convert
+
+    def value(self, node):
+        """Return the converted attribute value for a feature node, or None"""
+        nodes = node.findall(self.path)
+        if self.get_text:
+            texts = [n.text if n.text is not None else "" for n in nodes]
+            if len(texts) == 1:
+                v = texts[0]
+            elif len(texts) == 0:
+                v = ""
+            else:
+                v = "[" + ";".join(texts) + "]"
+        elif len(nodes) == 1:
+            v = nodes[0].text
+        elif len(nodes) == 0:
+            v = None
+        else:
+            v = "[" + ";".join([n.text or "" for n in nodes]) + "]"
+
+        if v is None or self.convert is None:
+            return None
+        try:
+            return self.convert(v)
+        except ValueError:
+            return None
+
+
+def extract_feature(
+    feature, i, swap_xy, default_srs, attribute_matchers, geometry_mapping
+):
+    """Extract the id, the geometries and the attribute values of a feature node
+
+    :param feature: the feature node
+    :param i: the feature number, used as id when the feature has none
+    :param swap_xy: whether to force X/Y coordinate swapping
+    :param default_srs: srsName used for geometries without one
+    :param attribute_matchers: list of (attribute, XPathAttributeMatcher)
+    :param geometry_mapping: an XPath expression used to extract the geometry
+    :returns: (fid, geometries, { 'attr1' : value }), geometries being a list of \
+        ((WKB, srid, swap_xy) or None, tag), or None
+    """
+    # get the id from gml:identifier, then from the "id" attribute
+    fid = None
+    for child in feature:
+        f_ns, f_tag = split_tag(child.tag)
+        if f_tag == "identifier":
+            fid = child.text
+            break
+    if fid is None:
+        for k, v in feature.attrib.items():
+            f_ns, f_tag = split_tag(k)
+            if f_tag == "id":
+                fid = v
+                break
+    if fid is None:
+        fid = str(i)
+
+    # get the geometry
+    if geometry_mapping:
+        geoms = _extractGmlFromXPath(
+            feature, geometry_mapping, swap_xy, default_srs=default_srs
+        )
+    else:
+        geoms = _extractGmlGeometries(feature, swap_xy, default_srs=default_srs)
+
+    # get attribute values
+    attrvalues = {}
+    feature2 = None
+    for attr, matcher in attribute_matchers:
+        if matcher.needs_copy:
+            # a copy of the feature without namespaces
+            if feature2 is None:
+                feature2 = copy.deepcopy(feature)
+                remove_prefix(feature2)
+            attrvalues[attr] = matcher.value(feature2)
+        else:
+            attrvalues[attr] = matcher.value(feature)
+
+    return fid, geoms, attrvalues
+
+
+# attribute matchers and geometry mapping of a worker process
+_worker_state = None
+
+
+def init_worker(attribute_matchers, geometry_mapping):
+    """Initializer of the worker processes, called once by each process"""
+    global _worker_state
+    _worker_state = (attribute_matchers, geometry_mapping)
+
+
+def extract_batch(batch, swap_xy):
+    """Extract a batch of serialized features, in a worker process
+
+    :param batch: list of (feature number, feature XML, default srsName)
+    :returns: list of (fid, geometries, attribute values), as extract_feature()
+    """
+    attribute_matchers, geometry_mapping = _worker_state
+    results = []
+    for i, xml, default_srs in batch:
+        fid, geoms, attrvalues = extract_feature(
+            ET.fromstring(xml),
+            i,
+            swap_xy,
+            default_srs,
+            attribute_matchers,
+            geometry_mapping,
+        )
+        results.append((fid, geoms, attrvalues))
+    return results
@@ -32,9 +32,7 @@ def extract_features(doc):
         features = []
         bbox = None
         bbox_srs = None
-        if node.tag.startswith("{http://www.opengis.net/wfs") and node.tag.endswith(
-            "FeatureCollection"
-        ):
+        if _is_wfs_collection(node):
             # WFS features
             for child in node:
                 if no_prefix(child.tag) == "member":
@@ -52,26 +50,13 @@ def extract_features(doc):
                     for cchild in child:
                         features.append(cchild)
                 elif no_prefix(child.tag) == "boundedBy":
-                    lc = None
-                    uc = None
-                    for cchild in child:
-                        if no_prefix(cchild.tag) == "Envelope":
-                            for k, v in cchild.attrib.items():
-                                if no_prefix(k) == "srsName":
-                                    bbox_srs = v
-                            for ccchild in cchild:
-                                if no_prefix(ccchild.tag) == "lowerCorner":
-                                    lc = ccchild.text
-                                elif no_prefix(ccchild.tag) == "upperCorner":
-                                    uc = ccchild.text
-                    if lc is not None and uc is not None:
-                        lcp = [float(x) for x in lc.split(" ")]
-                        ucp = [float(x) for x in uc.split(" ")]
-                        bbox = (lcp[0], lcp[1], ucp[0], ucp[1])
-
-        elif node.tag.startswith("{http://www.opengis.net/sos/2") and node.tag.endswith(
-            "GetObservationResponse"
-        ):
+                    nbbox, nbbox_srs = _envelope_from_bounded_by(child)
+                    if nbbox_srs is not None:
+                        bbox_srs = nbbox_srs
+                    if nbbox is not None:
+                        bbox = nbbox
+
+        elif _is_sos_response(node):
             # SOS features
             for child in node:
                 if no_prefix(child.tag) == "observationData":
@@ -86,3 +71,111 @@ def extract_features(doc):
 
 def extract_features_from_file(file_path):
     return extract_features(ET.parse(file_path))
+
+
+def _is_wfs_collection(node):
+    return node.tag.startswith("{http://www.opengis.net/wfs") and node.tag.endswith(
+        "FeatureCollection"
+    )
+
+
+def _is_sos_response(node):
+    return node.tag.startswith("{http://www.opengis.net/sos/2") and node.tag.endswith(
+        "GetObservationResponse"
+    )
+
+
+def _envelope_from_bounded_by(node):
+    """Return (bbox, bbox_srs) from a boundedBy node"""
+    bbox = None
+    bbox_srs = None
+    lc = None
+    uc = None
+    for child in node:
+        if no_prefix(child.tag) == "Envelope":
+            for k, v in child.attrib.items():
+                if no_prefix(k) == "srsName":
+                    bbox_srs = v
+            for cchild in child:
+                if no_prefix(cchild.tag) == "lowerCorner":
+                    lc = cchild.text
+                elif no_prefix(cchild.tag) == "upperCorner":
+                    uc = cchild.text
+    if lc is not None and uc is not None:
+        lcp = [float(x) for x in lc.split(" ")]
+        ucp = [float(x) for x in uc.split(" ")]
+        bbox = (lcp[0], lcp[1], ucp[0], ucp[1])
+    return bbox, bbox_srs
+
+
+def _is_streamed_feature(elem, parent, grand_parent) -> bool:
+    """Tell if a node parsed by :func:`iter_features` is a feature
+
+    :param elem: the node
+    :param parent: its parent node, None for the root node
+    :param grand_parent: the parent of its parent, None if there is none
+    """
+    if parent is None:
+        # it seems to be an isolated feature
+        return not _is_wfs_collection(elem) and not _is_sos_response(elem)
+    if grand_parent is None:
+        return False
+    if _is_wfs_collection(grand_parent):
+        p_tag = no_prefix(parent.tag)
+        if p_tag == "member":
+            # a member may contain another featurecollection
+            return not _is_wfs_collection(elem)
+        return p_tag in ("featureMember", "featureMembers")
+    if _is_sos_response(grand_parent):
+        return no_prefix(parent.tag) == "observationData" and parent[0] is elem
+    return False
+
+
+def iter_features(xml_file):
+    """Extract (Complex) features from a XML file, without loading the whole document
+
+    Each feature node is yielded as soon as its end tag is parsed and is cleared
+    once the consumer asks for the next one, so that the memory footprint only
+    depends on the size of one feature.
+    Features are recognized the same way as in :func:`extract_features`.
+
+    :param xml_file: the input XML file
+    :returns: an iterator over (bbox, bbox_srs, node)
+              where bbox and bbox_srs are the collection bounding box known so far
+    """
+    bbox = None
+    bbox_srs = None
+    # ancestors of the current node
+    stack = []
+    for event, elem in ET.iterparse(xml_file, ["start-ns", "start", "end"]):
+        if event == "start-ns":
+            try:
+                ET.register_namespace(*elem)
+            except ValueError:
+                # reserved prefix (ns0, ns1...)
+                pass
+            continue
+        if event == "start":
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        parent = stack[-1] if len(stack) > 0 else None
+        grand_parent = stack[-2] if len(stack) > 1 else None
+        tag = no_prefix(elem.tag)
+
+        if _is_streamed_feature(elem, parent, grand_parent):
+            yield bbox, bbox_srs, elem
+            elem.clear()
+            if parent is not None and no_prefix(parent.tag) != "observationData":
+                parent.remove(elem)
+        elif parent is not None and _is_wfs_collection(parent):
+            if tag == "boundedBy" and bbox is None:
+                bbox, bbox_srs = _envelope_from_bounded_by(elem)
+            if tag in ("member", "featureMember", "featureMembers", "boundedBy"):
+                elem.clear()
+                parent.remove(elem)
+        elif parent is not None and _is_sos_response(parent):
+            if tag == "observationData":
+                elem.clear()
+                parent.remove(elem)
@@ -1,13 +1,170 @@
+import contextlib
+import threading
+import time
+
 from osgeo import ogr
 
 from gml_application_schema_toolbox.core.xml_utils import no_ns
 
+# maximum number of pkid values in the IN list of a query
+MAX_PKIDS_PER_QUERY = 500
+
+
+# number of seconds after which an unused datasource is closed
+DATASOURCE_MAX_IDLE_TIME = 300
+
+# maximum number of unused datasources kept opened, for each database
+DATASOURCE_MAX_IDLE_COUNT = 4
+
+
+class DatasourcePool:
+    """A pool of opened OGR datasources, keyed by (provider, uri, schema).
+
+    A datasource is used by one borrower at a time: acquire() returns an idle
+    datasource or opens a new one, release() gives it back to the pool.
+    Datasources unused for more than max_idle_time seconds are closed, as well
+    as the ones released when max_idle_count datasources of the same database
+    are already idle.
+
+    The GMLAS metadata of each database is kept under the same key, so that it
+    is only read once by all the resolvers.
+    """
+
+    def __init__(
+        self,
+        max_idle_time=DATASOURCE_MAX_IDLE_TIME,
+        max_idle_count=DATASOURCE_MAX_IDLE_COUNT,
+    ):
+        self.max_idle_time = max_idle_time
+        self.max_idle_count = max_idle_count
+        self._lock = threading.Lock()
+        # key => list of (datasource, release time)
+        self._idle = {}
+        # key => metadata
+        self._metadata = {}
+
+    def _evict(self):
+        limit = time.monotonic() - self.max_idle_time
+        for key, idle in list(self._idle.items()):
+            idle[:] = [(ds, t) for ds, t in idle if t >= limit]
+            if not idle:
+                del self._idle[key]
+
+    def acquire(self, provider, uri, schema):
+        """Return an opened datasource, to be given back with release()"""
+        with self._lock:
+            self._evict()
+            idle = self._idle.get((provider, uri, schema))
+            if idle:
+                return idle.pop()[0]
+
+        ogr.UseExceptions()
+        drv = ogr.GetDriverByName(provider)
+        ds = drv.Open(uri)
+        if ds is None:
+            raise RuntimeError("Problem opening {}".format(uri))
+        return ds
+
+    def release(self, provider, uri, schema, ds):
+        """Give a datasource back to the pool. It is closed if the pool is full"""
+        with self._lock:
+            self._evict()
+            key = (provider, uri, schema)
+            idle = self._idle.get(key, [])
+            if len(idle) < self.max_idle_count:
+                idle.append((ds, time.monotonic()))
+                self._idle[key] = idle
+            # otherwise, the datasource is closed once dropped
+
+    def metadata(self, provider, uri, schema, load):
+        """Return the metadata of a database, read by load() on first use"""
+        key = (provider, uri, schema)
+        with self._lock:
+            if key in self._metadata:
+                return self._metadata[key]
+        # read out of the lock, the first one read wins
+        metadata = load()
+        with self._lock:
+            return self._metadata.setdefault(key, metadata)
+
+    def clear(self):
+        """Close all the idle datasources and forget the metadata"""
+        with self._lock:
+            self._idle = {}
+            self._metadata = {}
+
+
+# datasources shared by all the resolvers
+datasource_pool = DatasourcePool()
+
 
 def lstartswith(l1, l2):
     """Return True if l1 starts with elements in l2"""
     return len([(a, b) for (a, b) in zip(l1, l2) if a == b]) == len(l2)
 
 
+def sql_literal(value) -> str:
+    """Return a value as a SQL string literal"""
+    return "'{}'".format(str(value).replace("'", "''"))
+
+
+class XPathPlan:
+    """The SQL query resolving an XPath from a feature of a layer.
+
+    OGR cannot bind parameters of SQL statements, the pkid value is bound as a
+    literal by sql().
+    """
+
+    def __init__(self, table, field, tables, joins, pkid_column):
+        """
+        @param table the table of the resolved field
+        @param field the resolved field
+        @param tables tables of the query
+        @param joins join conditions between these tables
+        @param pkid_column the qualified pkid column of the starting layer
+        """
+        self.table = table
+        self.field = field
+        self.tables = tables
+        self.joins = joins
+        self.pkid_column = pkid_column
+        # the statements, without the condition on the pkid
+        self._select = "select {}.{} from {}".format(table, field, ", ".join(tables))
+        self._select_many = (
+            "select {} as xpath_pkid, {}.{} as xpath_value from {}".format(
+                pkid_column, table, field, ", ".join(tables)
+            )
+        )
+        self._joins = "".join(" and " + join for join in joins)
+
+    def _query(self, pkid_condition, select=None) -> str:
+        return "{} where {}{}".format(
+            select or self._select, pkid_condition, self._joins
+        )
+
+    def sql(self, pkid_value) -> str:
+        """Return the query for the given pkid"""
+        return self._query("{} = {}".format(self.pkid_column, sql_literal(pkid_value)))
+
+    def sql_columns(self, pkid_value, columns) -> str:
+        """Return the query for the given pkid, selecting other columns of the \
+        tables of the plan"""
+        return self._query(
+            "{} = {}".format(self.pkid_column, sql_literal(pkid_value)),
+            "select {} from {}".format(", ".join(columns), ", ".join(self.tables)),
+        )
+
+    def sql_many(self, pkid_values) -> str:
+        """Return the query for several pkids. Its columns are xpath_pkid and \
+        xpath_value"""
+        return self._query(
+            "{} in ({})".format(
+                self.pkid_column, ", ".join(sql_literal(v) for v in pkid_values)
+            ),
+            self._select_many,
+        )
+
+
 class GmlAsXPathResolver:
     def __init__(self, uri, provider, schema):
         """
@@ -17,73 +174,164 @@ class GmlAsXPathResolver:
         @param schema name of the PostgreSQL schema where tables and metadata tables are
         """
 
-        ogr.UseExceptions()
-        drv = ogr.GetDriverByName(provider)
-        self._ds = drv.Open(uri)
-        if self._ds is None:
-            raise RuntimeError("Problem opening {}".format(uri))
+        # the datasource is borrowed from the pool until close() is called
+        self._pool_key = (provider, uri, schema)
+        self._ds = datasource_pool.acquire(*self._pool_key)
         if schema != "":
             self._schema = schema + "."
         else:
             self._schema = ""
 
-    def resolve_xpath(self, ogr_layer_name, ogr_layer_pkid_name, pkid_value, xpath):
-        """Resolve an XPath relative to a current layer
-        @param ogr_layer_name the name of the OGR layer
-        @param the XPath relative to the layer
-        @return the corresponding value(s) after xpath resolution
+        self._load_metadata()
+        # (layer name, pkid name, xpath) => XPathPlan or None
+        self._plans = {}
+
+    def close(self):
+        """Give the datasource back to the pool"""
+        if getattr(self, "_ds", None) is not None:
+            datasource_pool.release(*self._pool_key, self._ds)
+            self._ds = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    @contextlib.contextmanager
+    def _execute(self, sql):
+        """Execute a SQL statement, the result set is released once used"""
+        lyr = self._ds.ExecuteSQL(sql)
+        try:
+            yield lyr
+        finally:
+            self._ds.ReleaseResultSet(lyr)
+
+    def _load_metadata(self):
+        """Load the GMLAS metadata tables once for all the resolvers of the
+        database, in in-memory indexes"""
+        metadata = datasource_pool.metadata(*self._pool_key, self._read_metadata)
+        self._layer_xpaths, self._fields, self._relationships = metadata
+
+    def _read_metadata(self):
+        """Read the GMLAS metadata tables
+
+        @returns layer xpaths, fields and relationships indexes
         """
+        # layer name => layer xpath, as a list
+        layer_xpaths = {}
+        with self._execute(
+            "select layer_name, layer_xpath from {}_ogr_layers_metadata".format(
+                self._schema
+            )
+        ) as lyr:
+            for f in lyr:
+                layer_xpaths[f.GetField("layer_name")] = f.GetField(
+                    "layer_xpath"
+                ).split("/")
+
+        # (layer name, field xpath relative to the layer, without namespaces)
+        # => (rank, field name, field category, field max occurs)
+        # the rank keeps the order of the table, the first matching field wins
+        fields = {}
+        with self._execute(
+            """
+select layer_name, field_xpath, field_name, field_category, field_max_occurs
+from {}_ogr_fields_metadata""".format(
+                self._schema
+            )
+        ) as lyr:
+            for rank, f in enumerate(lyr):
+                layer_name = f.GetField("layer_name")
+                layer_xpath = layer_xpaths.get(layer_name)
+                if layer_xpath is None or f.GetField("field_xpath") is None:
+                    continue
+                field_xpath = f.GetField("field_xpath").split("/")
+                if not lstartswith(field_xpath, layer_xpath):
+                    continue
+                # remove the layer_xpath
+                key = (
+                    layer_name,
+                    tuple(no_ns(x) for x in field_xpath[len(layer_xpath) :]),
+                )
+                if key not in fields:
+                    fields[key] = (
+                        rank,
+                        f.GetField("field_name"),
+                        f.GetField("field_category"),
+                        f.GetField("field_max_occurs"),
+                    )
+
+        # (parent layer, parent element name) => (child layer, child pkid, parent pkid)
+        relationships = {}
+        with self._execute(
+            """
+select parent_layer, parent_element_name, child_layer, child_pkid, parent_pkid
+from {}_ogr_layer_relationships""".format(
+                self._schema
+            )
+        ) as lyr:
+            for f in lyr:
+                key = (f.GetField("parent_layer"), f.GetField("parent_element_name"))
+                if key not in relationships:
+                    relationships[key] = (
+                        f.GetField("child_layer"),
+                        f.GetField("child_pkid"),
+                        f.GetField("parent_pkid"),
+                    )
+        return layer_xpaths, fields, relationships
+
+    def _find_field(self, ogr_layer_name, lxpath):
+        """Return the first field of the layer whose xpath starts the given xpath
+
+        :param lxpath: xpath relative to the layer, as a list
+        :returns: (field xpath length, field name, field category, field max occurs) \
+            or None
+        """
+        found = None
+        for i in range(len(lxpath) + 1):
+            field = self._fields.get((ogr_layer_name, tuple(lxpath[:i])))
+            if field is not None and (found is None or field[0] < found[1][0]):
+                found = (i, field)
+        if found is None:
+            return None
+        i, (_, field_name, field_category, field_max_occurs) = found
+        return i, field_name, field_category, field_max_occurs
 
-        sql_field = ""
+    def _plan(self, ogr_layer_name, ogr_layer_pkid_name, xpath):
+        """Return the SQL plan resolving an XPath relative to a layer, or None if the
+        XPath cannot be resolved. Plans are cached."""
+        key = (ogr_layer_name, ogr_layer_pkid_name, xpath)
+        if key not in self._plans:
+            self._plans[key] = self._compile(ogr_layer_name, ogr_layer_pkid_name, xpath)
+        return self._plans[key]
+
+    def _compile(self, ogr_layer_name, ogr_layer_pkid_name, xpath):
+        sql_field = None
         sql_tables = []
         sql_joins = []
-        sql_wheres = [
-            ((ogr_layer_name, ogr_layer_pkid_name), "'{}'".format(pkid_value))
-        ]
+        pkid_column = "{}.{}".format(ogr_layer_name, ogr_layer_pkid_name)
 
         lxpath = xpath.split("/")
 
         while lxpath != [] and lxpath != ["text()"]:
-            layer_xpath = None
-            for f in self._ds.ExecuteSQL(
-                "select layer_xpath from {}_ogr_layers_metadata where layer_name='{}'".format(
-                    self._schema, ogr_layer_name
-                )
-            ):
-                layer_xpath = f.GetField("layer_xpath").split("/")
-            if layer_xpath is None:
+            if ogr_layer_name not in self._layer_xpaths:
                 raise RuntimeError(
                     "Cannot find metadata of the layer '{}'".format(ogr_layer_name)
                 )
 
             # look for xpath of fields
-            field_name = None
-            field_category = None
-            field_max_occurs = 0
-            for f in self._ds.ExecuteSQL(
-                """
-select field_xpath, field_name, field_category, field_max_occurs
-from {}_ogr_fields_metadata
-where layer_name='{}'""".format(
-                    self._schema, ogr_layer_name
-                )
-            ):
-                field_xpath = f.GetField("field_xpath").split("/")
-                if lstartswith(field_xpath, layer_xpath):
-                    # remove the layer_xpath
-                    field_xpath = field_xpath[len(layer_xpath) :]
-                    if lstartswith(lxpath, [no_ns(x) for x in field_xpath]):
-                        field_name = f.GetField("field_name")
-                        field_category = f.GetField("field_category")
-                        field_max_occurs = f.GetField("field_max_occurs")
-
-                        # remaining xpath
-                        lxpath = lxpath[len(field_xpath) :]
-                        break
-
-            if field_name is None:
+            field = self._find_field(ogr_layer_name, lxpath)
+            if field is None:
                 # cannot find the xpath, aborting
                 return None
+            field_xpath_len, field_name, field_category, field_max_occurs = field
+
+            # remaining xpath
+            lxpath = lxpath[field_xpath_len:]
 
             # if no remaining xpath, we are done
             if lxpath == [] or lxpath == ["text()"]:
@@ -99,24 +347,23 @@ where layer_name='{}'""".format(
                 in ("PATH_TO_CHILD_ELEMENT_NO_LINK", "PATH_TO_CHILD_ELEMENT_WITH_LINK")
                 and field_max_occurs > 1
             )
-            sql = """
-select child_layer, child_pkid, parent_pkid
-from {}_ogr_layer_relationships
-where parent_layer='{}' and parent_element_name='{}'""".format(
-                self._schema, ogr_layer_name, field_name
-            )
-            for f in self._ds.ExecuteSQL(sql):
+            relationship = self._relationships.get((ogr_layer_name, field_name))
+            if relationship is not None:
+                child_layer, child_pkid, parent_pkid = relationship
                 sql_joins.append(
                     (
-                        f.GetField("child_layer"),
-                        f.GetField("child_pkid"),
+                        child_layer,
+                        child_pkid,
                         ogr_layer_name,
-                        f.GetField("parent_pkid") if is_1_n else field_name,
+                        parent_pkid if is_1_n else field_name,
                     )
                 )
-                ogr_layer_name = f.GetField("child_layer")
-                ogr_layer_pkid_name = f.GetField("child_pkid")
-                break
+                ogr_layer_name = child_layer
+                ogr_layer_pkid_name = child_pkid
+
+        if sql_field is None:
+            # the XPath does not point to a field
+            return None
 
         # craft the SQL query to resolve XPath
         tables = (
@@ -124,24 +371,94 @@ where parent_layer='{}' and parent_element_name='{}'""".format(
             .union(set([t for (t, _, _, _) in sql_joins]))
             .union(set([t for (_, _, t, _) in sql_joins]))
         )
-        for parent_table, parent_field, child_table, child_field in sql_joins:
-            sql_wheres.append(
-                ((parent_table, parent_field), (child_table, child_field))
-            )
-
-        where = " and ".join(
-            [
-                (
-                    "{}.{} = {}.{}".format(lyr[0], lyr[1], rec[0], rec[1])
-                    if isinstance(rec, tuple)
-                    else "{}.{} = {}".format(lyr[0], lyr[1], rec)
-                )
-                for lyr, rec in sql_wheres
-            ]
-        )
-        sql = "select {} from {} where {}".format(
-            sql_field, ", ".join(list(tables)), where
+        joins = [
+            "{}.{} = {}.{}".format(parent_table, parent_field, child_table, child_field)
+            for parent_table, parent_field, child_table, child_field in sql_joins
+        ]
+        return XPathPlan(
+            sql_tables[-1],
+            sql_field,
+            ["{}{}".format(self._schema, t) for t in sorted(tables)],
+            joins,
+            pkid_column,
         )
 
+    def resolve_xpath(self, ogr_layer_name, ogr_layer_pkid_name, pkid_value, xpath):
+        """Resolve an XPath relative to a current layer
+        @param ogr_layer_name the name of the OGR layer
+        @param the XPath relative to the layer
+        @return the corresponding value(s) after xpath resolution
+        """
+        plan = self._plan(ogr_layer_name, ogr_layer_pkid_name, xpath)
+        if plan is None:
+            return None
+
         # execute SQL
-        return [f.GetField(sql_field) for f in self._ds.ExecuteSQL(sql)]
+        with self._execute(plan.sql(pkid_value)) as lyr:
+            return [f.GetField(plan.field) for f in lyr]
+
+    def resolve_xpath_many(
+        self, ogr_layer_name, ogr_layer_pkid_name, pkid_values, xpath
+    ):
+        """Resolve an XPath relative to a current layer, for several features at once
+        @param ogr_layer_name the name of the OGR layer
+        @param ogr_layer_pkid_name the name of the pkid field of the layer
+        @param pkid_values the pkid values of the features
+        @param the XPath relative to the layer
+        @return a dict pkid value => value(s) after xpath resolution, \
+            None if the XPath cannot be resolved
+        """
+        plan = self._plan(ogr_layer_name, ogr_layer_pkid_name, xpath)
+        if plan is None:
+            return None
+
+        # pkids returned by the database may not have the type of the given ones
+        pkids = {str(v): v for v in pkid_values}
+        values = {v: [] for v in pkids.values()}
+        pkid_list = list(pkids.values())
+        # one query for each slice of pkids, to keep statements reasonably short
+        for i in range(0, len(pkid_list), MAX_PKIDS_PER_QUERY):
+            sql = plan.sql_many(pkid_list[i : i + MAX_PKIDS_PER_QUERY])
+            with self._execute(sql) as lyr:
+                for f in lyr:
+                    pkid = f.GetField("xpath_pkid")
+                    values.setdefault(pkids.get(str(pkid), pkid), []).append(
+                        f.GetField("xpath_value")
+                    )
+        return values
+
+    def resolve_xpaths(self, ogr_layer_name, ogr_layer_pkid_name, pkid_value, xpaths):
+        """Resolve several XPaths relative to a current layer, in one query.
+        The join path of each XPath must be the beginning of the longest one, \
+        e.g. XPaths of sibling elements.
+        @param ogr_layer_name the name of the OGR layer
+        @param ogr_layer_pkid_name the name of the pkid field of the layer
+        @param pkid_value the pkid value of the feature
+        @param xpaths the XPaths relative to the layer
+        @return a list of tuples, with one value for each XPath, \
+            None if an XPath cannot be resolved
+        """
+        plans = [
+            self._plan(ogr_layer_name, ogr_layer_pkid_name, xpath) for xpath in xpaths
+        ]
+        if None in plans:
+            return None
+
+        # the query of the plan with the longest join path gives all the rows
+        longest = max(plans, key=lambda plan: len(plan.joins))
+        for plan in plans:
+            if plan.joins != longest.joins[: len(plan.joins)]:
+                raise RuntimeError(
+                    "XPaths {} do not share the same join path".format(xpaths)
+                )
+
+        columns = [
+            "{}.{} as xpath_value{}".format(plan.table, plan.field, i)
+            for i, plan in enumerate(plans)
+        ]
+        sql = longest.sql_columns(pkid_value, columns)
+        with self._execute(sql) as lyr:
+            return [
+                tuple(f.GetField("xpath_value{}".format(i)) for i in range(len(plans)))
+                for f in lyr
+            ]
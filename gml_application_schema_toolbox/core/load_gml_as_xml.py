@@ -16,13 +16,17 @@
 #   License along with this library; if not, see <http://www.gnu.org/licenses/>.
 
 # standard library
+import collections
 import copy
 import json
+import multiprocessing
 import os
-import re
+import sys
 import tempfile
 import xml.etree.ElementTree as ET
+import zlib
 from builtins import object, str
+from concurrent.futures import ProcessPoolExecutor
 
 from osgeo import ogr, osr
 from qgis.core import (
@@ -30,23 +34,52 @@ from qgis.core import (
     QgsField,
     QgsGeometry,
     QgsMapLayer,
-    QgsPointXY,
     QgsVectorLayer,
     QgsWkbTypes,
 )
-from qgis.PyQt.QtCore import QVariant
+from qgis.PyQt.QtCore import QByteArray, QVariant
 
-from gml_application_schema_toolbox.core.gml_utils import extract_features
-from gml_application_schema_toolbox.core.qgis_urlopener import remote_open_from_qgis
-from gml_application_schema_toolbox.core.xml_utils import (
-    no_prefix,
-    remove_prefix,
-    resolve_xpath,
-    split_tag,
-    xml_parse,
+from gml_application_schema_toolbox.core.gml_extract import (
+    XPathAttributeMatcher,
+    extract_batch,
+    extract_feature,
+    init_worker,
 )
-
-__all__ = ["load_as_xml_layer", "properties_from_layer", "is_layer_gml_xml"]
+from gml_application_schema_toolbox.core.gml_utils import (
+    extract_features,
+    iter_features,
+)
+from gml_application_schema_toolbox.core.qgis_urlopener import remote_open_from_qgis
+from gml_application_schema_toolbox.core.xml_utils import no_prefix, xml_parse
+from gml_application_schema_toolbox.toolbelt import PlgLogger
+
+__all__ = [
+    "load_as_xml_layer",
+    "properties_from_layer",
+    "is_layer_gml_xml",
+    "xml_from_attribute",
+]
+
+# number of features written to a layer at once
+DEFAULT_CHUNK_SIZE = 1000
+
+# number of features sent at once to a worker process
+_WORKER_BATCH_SIZE = 100
+
+# geometry type of the layers, by flat type of the geometries
+_LAYER_GEOMETRY_TYPES = {
+    QgsWkbTypes.Point: "point",
+    QgsWkbTypes.MultiPoint: "multipoint",
+    QgsWkbTypes.LineString: "linestring",
+    QgsWkbTypes.MultiLineString: "multilinestring",
+    QgsWkbTypes.Polygon: "polygon",
+    QgsWkbTypes.MultiPolygon: "multipolygon",
+    QgsWkbTypes.CompoundCurve: "compoundcurve",
+    QgsWkbTypes.CircularString: "compoundcurve",
+    QgsWkbTypes.MultiCurve: "multicurve",
+    QgsWkbTypes.CurvePolygon: "curvepolygon",
+    QgsWkbTypes.MultiSurface: "multisurface",
+}
 
 
 def load_as_xml_layer(
@@ -57,6 +90,11 @@ def load_as_xml_layer(
     output_local_file=None,
     logger=None,
     swap_xy=False,
+    streaming=False,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    compress_xml=False,
+    workers=1,
+    feedback=None,
 ):
     """
     Load a GML file in a new QGIS layer
@@ -65,6 +103,11 @@ def load_as_xml_layer(
     :param attributes: { 'attr1' : ( '//xpath/expression', QVariant.Int ) }
     :param geometry_mapping: XPath expression to a gml geometry node
     :param swap_xy: True to swap X/Y coordinates
+    :param streaming: True to parse features one by one instead of the whole document
+    :param chunk_size: number of features written at once in each layer
+    :param compress_xml: True to store the _xml_ column as a zlib compressed blob
+    :param workers: number of processes used to extract geometries and attributes
+    :param feedback: optional QgsFeedback, for progress report and cancellation
     :returns: the created layer
     """
     if not output_local_file:
@@ -72,9 +115,18 @@ def load_as_xml_layer(
         output_local_file = f.name
         f.close()
 
-    s = ComplexFeatureLoaderInGpkg(output_local_file)
+    s = ComplexFeatureLoaderInGpkg(output_local_file, compress_xml)
     return s.load_complex_gml(
-        xml_uri, is_remote, attributes, geometry_mapping, logger, swap_xy
+        xml_uri,
+        is_remote,
+        attributes,
+        geometry_mapping,
+        logger,
+        swap_xy,
+        streaming,
+        chunk_size,
+        workers,
+        feedback,
     )
 
 
@@ -88,161 +140,101 @@ def is_layer_gml_xml(layer):
     return ComplexFeatureLoaderInMemory.is_layer_complex(layer)
 
 
+def xml_from_attribute(value):
+    """Returns the XML string stored in a _xml_ attribute, compressed or not"""
+    if isinstance(value, (QByteArray, bytes)):
+        return zlib.decompress(bytes(value)).decode("utf8")
+    return value
+
+
 #
 # Implementation
 #
 
 
 def _swap_qgs_geometry(qgsgeom):
-    if qgsgeom.wkbType() == QgsWkbTypes.Point:
-        p = qgsgeom.asPoint()
-        qgsgeom = QgsGeometry.fromPointXY(QgsPointXY(p[1], p[0]))
-    elif qgsgeom.wkbType() == QgsWkbTypes.MultiPoint:
-        mp = qgsgeom.asMultiPoint()
-        qgsgeom = QgsGeometry.fromMultiPointXY([QgsPointXY(p[1], p[0]) for p in mp])
-    elif qgsgeom.wkbType() == QgsWkbTypes.LineString:
-        pl = qgsgeom.asPolyline()
-        qgsgeom = QgsGeometry.fromPolylineXY([QgsPointXY(p[1], p[0]) for p in pl])
-    elif qgsgeom.wkbType() == QgsWkbTypes.MultiLineString:
-        mls = qgsgeom.asMultiPolyline()
-        qgsgeom = QgsGeometry.fromMultiPolylineXY(
-            [[QgsPointXY(p[1], p[0]) for p in pl] for pl in mls]
-        )
-    elif qgsgeom.wkbType() == QgsWkbTypes.Polygon:
-        pl = qgsgeom.asPolygon()
-        qgsgeom = QgsGeometry.fromPolygonXY(
-            [[QgsPointXY(p[1], p[0]) for p in r] for r in pl]
-        )
-    elif qgsgeom.wkbType() == QgsWkbTypes.MultiPolygon:
-        mp = qgsgeom.asMultiPolygon()
-        qgsgeom = QgsGeometry.fromMultiPolygonXY(
-            [[[QgsPointXY(p[1], p[0]) for p in r] for r in pl] for pl in mp]
-        )
+    # swap X/Y in place on the underlying abstract geometry: no intermediate
+    # list of points, and it handles Z/M values, curves and collections
+    if not qgsgeom.isNull():
+        qgsgeom.get().swapXy()
     return qgsgeom
 
 
-def _get_srs_name(tree):
-    # get srsName, either from the current element, or from a child
-    for k, v in tree.attrib.items():
-        if no_prefix(k) == "srsName":
-            return v
-    for child in tree:
-        n = _get_srs_name(child)
-        if n is not None:
-            return n
-    return None
-
+# conversion of text values, by QVariant type
+_VALUE_CONVERTERS = {
+    QVariant.Int: int,
+    QVariant.String: str,
+    QVariant.Double: float,
+    QVariant.DateTime: str,
+}
 
-def _get_srid_from_name(srs_name: str) -> tuple:
-    """[summary]
 
-    For reference:
-        EPSG:4326
-        urn:EPSG:geographicCRS:4326
-        urn:ogc:def:crs:EPSG:4326
-        urn:ogc:def:crs:EPSG::4326
-        urn:ogc:def:crs:EPSG:6.6:4326
-        urn:x-ogc:def:crs:EPSG:6.6:4326
-        http://www.opengis.net/gml/srs/epsg.xml#4326
-        http://www.epsg.org/6.11.2/4326
+def _attribute_matcher(xpath, value_type):
+    """Compile the XPath expression of an attribute mapping
 
-    :param srs_name: [description]
-    :type srs_name: [str]
-    :return: [description]
-    :rtype: [type]
+    :param xpath: XPath expression, written for features without namespaces
+    :param value_type: QVariant type of the attribute
+    :returns: XPathAttributeMatcher
     """
-    sr = osr.SpatialReference()
-
-    # get the last number
-    m = re.search("([0-9]+)/?$", srs_name)
-    srid = int(m.group(1))
-    sr.ImportFromEPSGA(srid)
-    srid_axis_swapped = sr.EPSGTreatsAsLatLong() or sr.EPSGTreatsAsNorthingEasting()
-    return (srid, srid_axis_swapped)
-
-
-def _wkbFromGml(tree, swap_xy, default_srs=None):
-    # extract the srid
-    srid = None
-    srid_axis_swapped = False
-
-    srs_name = _get_srs_name(tree)
-    if srs_name is None and default_srs is not None:
-        srid, srid_axis_swapped = _get_srid_from_name(default_srs)
-    elif srs_name is not None:
-        srid, srid_axis_swapped = _get_srid_from_name(srs_name)
+    return XPathAttributeMatcher(xpath, _VALUE_CONVERTERS.get(value_type))
+
+
+def _python_executable():
+    # sys.executable is the QGIS executable when running in QGIS, look for the
+    # interpreter QGIS is built with
+    if os.path.basename(sys.executable).lower().startswith("python"):
+        return sys.executable
+    if sys.platform == "win32":
+        candidates = [os.path.join(sys.exec_prefix, "python.exe")]
     else:
-        # No SRID found, force to 4326
-        srid, srid_axis_swapped = 4326, True
+        candidates = [
+            os.path.join(sys.exec_prefix, "bin", name)
+            for name in ("python{}.{}".format(*sys.version_info[:2]), "python3")
+        ]
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    return None
 
-    # inversion
-    swap_xy = swap_xy ^ srid_axis_swapped
 
-    # call ogr for GML parsing
-    s = ET.tostring(tree, encoding="unicode")
-    g = ogr.CreateGeometryFromGML(s)
-    if g is None:
+def _worker_context():
+    # worker processes are spawned: forking the QGIS process, which runs many
+    # threads, may deadlock. They only import gml_extract, which needs no QGIS
+    python = _python_executable()
+    if python is None:
         return None
+    context = multiprocessing.get_context("spawn")
+    context.set_executable(python)
+    return context
 
-    wkb = g.ExportToWkb()
-    if g.GetGeometryType() in (ogr.wkbPolyhedralSurface, ogr.wkbTIN):
-        # Polyhedral and TIN are not supported by QGIS
-        # So we convert them to multipolygon by poking the geometry type
-        # It works only because the memory structure is the same
-        wkb = wkb[:4] + b"\x06" + wkb[5:]
-
-    qgsgeom = QgsGeometry()
-    qgsgeom.fromWkb(wkb)
-
-    if swap_xy:
-        qgsgeom = _swap_qgs_geometry(qgsgeom)
-    return qgsgeom, srid
-
-
-def _extractGmlGeometries(tree, swap_xy, default_srs=None, parent=None):
-    geoms = []
-    ns, tag = split_tag(tree.tag)
-    if ns.startswith("http://www.opengis.net/gml"):
-        if tag in [
-            "Point",
-            "LineString",
-            "Polygon",
-            "PolyhedralSurface",
-            "Tin",
-            "MultiPoint",
-            "MultiLineString",
-            "MultiPolygon",
-            "MultiCurve",
-            "MultiSurface",
-            "Curve",
-            "OrientableCurve",
-            "Surface",
-            "CompositeCurve",
-            "CompositeSurface",
-            "MultiGeometry",
-            "Envelope",
-        ]:
-            g = _wkbFromGml(tree, swap_xy, default_srs)
-            if g is not None:
-                return [(g, parent.tag)]
-
-    for child in tree:
-        geoms += _extractGmlGeometries(child, swap_xy, default_srs, tree)
-    return geoms
-
-
-def _extractGmlFromXPath(tree, xpath, swap_xy, default_srs=None):
-    r = resolve_xpath(tree, xpath)
-    if r is not None:
-        if isinstance(r, list):
-            return [(_wkbFromGml(x, swap_xy, default_srs), "") for x in r]
-        else:
-            return [(_wkbFromGml(r, swap_xy, default_srs), "")]
-    return None
+
+def _qgs_geometries(geoms):
+    # geometries extracted as WKB, to QgsGeometry
+    if geoms is None:
+        return None
+    qgs_geoms = []
+    for g, tag in geoms:
+        if g:
+            wkb, srid, swap_xy = g
+            qgsgeom = QgsGeometry()
+            qgsgeom.fromWkb(wkb)
+            if swap_xy:
+                qgsgeom = _swap_qgs_geometry(qgsgeom)
+            g = (qgsgeom, srid)
+        qgs_geoms.append((g, tag))
+    return qgs_geoms
 
 
 class ComplexFeatureSource(object):
-    def __init__(self, xml, xpath_mapping={}, geometry_mapping=None, logger=None):
+    def __init__(
+        self,
+        xml,
+        xpath_mapping={},
+        geometry_mapping=None,
+        logger=None,
+        streaming=False,
+        workers=1,
+    ):
         """
         Construct a ComplexFeatureSource
 
@@ -251,18 +243,96 @@ class ComplexFeatureSource(object):
             Example: { 'attribute' : ('//xpath/expression', QVariant.Int) }
         :param geometry_mapping: An XPath expression used to extract the geometry
         :param logger: a logger function
+        :param streaming: if True, the document is not parsed at once. Features are \
+            read one by one by getFeatures() and discarded afterwards, so that \
+            self.features is None and self.title is only known after the first feature
+        :param workers: number of processes used to extract geometries and \
+            attributes. Features are extracted in the current process if it is 1 \
+            or if no Python interpreter is found to start the processes
         """
-        doc, _ = xml_parse(xml)
-        self.bbox, self.bbox_srs, self.features = extract_features(doc)
-        if self.features:
-            self.title = no_prefix(self.features[0].tag)
+        self.title = ""
+        if streaming:
+            self._xml = xml
+            self.bbox, self.bbox_srs, self.features = None, None, None
         else:
-            self.title = ""
+            doc, _ = xml_parse(xml)
+            self.bbox, self.bbox_srs, self.features = extract_features(doc)
+            if self.features:
+                self.title = no_prefix(self.features[0].tag)
         self.xpath_mapping = xpath_mapping
+        # compile the mapping once for all features
+        self._attribute_matchers = [
+            (attr, _attribute_matcher(xpath, value_type))
+            for attr, (xpath, value_type) in xpath_mapping.items()
+        ]
         self.geometry_mapping = geometry_mapping
         self.logger = logger
+        self.workers = workers
+
+    def _iter_features(self):
+        if self.features is not None:
+            yield from self.features
+            return
+        for bbox, bbox_srs, feature in iter_features(self._xml):
+            self.bbox, self.bbox_srs = bbox, bbox_srs
+            if not self.title:
+                self.title = no_prefix(feature.tag)
+            yield feature
+
+    def _extract_features(self, swap_xy):
+        for i, feature in enumerate(self._iter_features(), 1):
+            fid, geoms, attrvalues = extract_feature(
+                feature,
+                i,
+                swap_xy,
+                self.bbox_srs,
+                self._attribute_matchers,
+                self.geometry_mapping,
+            )
+            yield i, feature, None, (fid, _qgs_geometries(geoms), attrvalues)
+
+    def _extract_features_in_pool(self, swap_xy, context):
+        # batches sent to the workers, in document order
+        pending = collections.deque()
+        batch = []
+        with ProcessPoolExecutor(
+            self.workers,
+            mp_context=context,
+            initializer=init_worker,
+            initargs=(self._attribute_matchers, self.geometry_mapping),
+        ) as executor:
+            for i, feature in enumerate(self._iter_features(), 1):
+                xml = ET.tostring(feature)
+                if self.features is None:
+                    # streamed features are cleared once read, keep a copy
+                    feature = copy.deepcopy(feature)
+                batch.append((i, feature, xml, self.bbox_srs))
+                if len(batch) == _WORKER_BATCH_SIZE:
+                    pending.append(self._submit_batch(executor, batch, swap_xy))
+                    batch = []
+                    # limit the number of features waiting in memory
+                    if len(pending) > 2 * self.workers:
+                        yield from self._batch_results(*pending.popleft())
+            if batch:
+                pending.append(self._submit_batch(executor, batch, swap_xy))
+            while pending:
+                yield from self._batch_results(*pending.popleft())
 
-    def getFeatures(self, swap_xy: bool = False):
+    @staticmethod
+    def _submit_batch(executor, batch, swap_xy):
+        future = executor.submit(
+            extract_batch, [(i, xml, srs) for i, _, xml, srs in batch], swap_xy
+        )
+        return batch, future
+
+    @staticmethod
+    def _batch_results(batch, future):
+        for (i, feature, xml, _), (fid, geoms, attrvalues) in zip(
+            batch, future.result()
+        ):
+            yield i, feature, xml, (fid, _qgs_geometries(geoms), attrvalues)
+
+    def getFeatures(self, swap_xy: bool = False, serialized: bool = False):
         """
         The iterator that will yield a new feature.
         The yielded value is \
@@ -272,76 +342,41 @@ class ComplexFeatureSource(object):
             )
 
         @param swap_xy whether to force X/Y coordinate swapping
+        @param serialized whether to yield the feature serialized by ET.tostring too, \
+            after xml_tree. Features sent to the workers are only serialized once
         """
-        i = 1
-        for feature in self.features:
-            if self.logger is not None:
-                self.logger.set_text("Feature {}/{}".format(i, len(self.features)))
-                self.logger.set_progress(i, len(self.features))
-
-            # get the id from gml:identifier, then from the "id" attribute
-            fid = None
-            for child in feature:
-                f_ns, f_tag = split_tag(child.tag)
-                if f_tag == "identifier":
-                    fid = child.text
-                    break
-            if fid is None:
-                for k, v in feature.attrib.items():
-                    f_ns, f_tag = split_tag(k)
-                    if f_tag == "id":
-                        fid = v
-                        break
-            if fid is None:
-                fid = str(i)
-
-            # get the geometry
-            if self.geometry_mapping:
-                qgs_geoms = _extractGmlFromXPath(
-                    feature, self.geometry_mapping, swap_xy, default_srs=self.bbox_srs
-                )
-            else:
-                qgs_geoms = _extractGmlGeometries(
-                    feature, swap_xy, default_srs=self.bbox_srs
-                )
+        context = _worker_context() if self.workers > 1 else None
+        if context is None:
+            extracted = self._extract_features(swap_xy)
+        else:
+            extracted = self._extract_features_in_pool(swap_xy, context)
 
-            # get attribute values
-            attrvalues = {}
-            feature2 = copy.deepcopy(feature)
-            remove_prefix(feature2)
-            for attr, xpath_t in self.xpath_mapping.items():
-                xpath, value_type = xpath_t
-                # resolve xpath
-                r = resolve_xpath(feature2, xpath)
-                v = None
-                value = None
-                if isinstance(r, str):
-                    v = r
-                elif isinstance(r, list):
-                    v = "[" + ";".join([n.text for n in r]) + "]"
-                elif isinstance(r, ET.Element):
-                    v = r.text
+        for i, feature, xml, (fid, qgs_geoms, attrvalues) in extracted:
+            if self.logger is not None:
+                if self.features is None:
+                    # total number of features unknown while streaming
+                    self.logger.set_text("Feature {}".format(i))
                 else:
-                    v = None
-                    value = None
-                if v is not None:
-                    try:
-                        if value_type == QVariant.Int:
-                            value = int(v)
-                        elif value_type == QVariant.String:
-                            value = v
-                        elif value_type == QVariant.Double:
-                            value = float(v)
-                        elif value_type == QVariant.DateTime:
-                            value = v
-                        else:
-                            value = None
-                    except ValueError:
-                        value = None
-                attrvalues[attr] = value
-
-            yield i, fid, qgs_geoms, feature, attrvalues
-            i += 1
+                    self.logger.set_text("Feature {}/{}".format(i, len(self.features)))
+                    self.logger.set_progress(i, len(self.features))
+
+            if not serialized:
+                yield i, fid, qgs_geoms, feature, attrvalues
+                continue
+            if xml is None:
+                xml = ET.tostring(feature)
+            yield i, fid, qgs_geoms, feature, xml, attrvalues
+
+
+def _stream_size(stream):
+    # size of a seekable stream, None if unknown
+    try:
+        pos = stream.tell()
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(pos)
+    except (AttributeError, OSError):
+        return None
+    return size
 
 
 class ComplexFeatureLoader(object):
@@ -359,10 +394,113 @@ class ComplexFeatureLoader(object):
     def properties_from_layer(layer):
         raise RuntimeError("No default implementation, use a derived class")
 
+    def _xml_value(self, xml):
+        """Returns the value of the _xml_ column for a feature node serialized by
+        ET.tostring"""
+        return xml.decode("utf8")
+
+    @staticmethod
+    def _write_features(layer, features):
+        """Write features directly to the layer data provider.
+        The provider writes them in one transaction (one for each call)."""
+        layer.dataProvider().addFeatures(features)
+
     @staticmethod
     def is_layer_complex(layer):
         raise RuntimeError("No default implementation, use a derived class")
 
+    @staticmethod
+    def _open_source(xml_uri: str, is_remote: bool):
+        if is_remote:
+            xml_src = remote_open_from_qgis(xml_uri, resumable=True)
+            if xml_src is None:
+                raise RuntimeError("Cannot download {}".format(xml_uri))
+            return xml_src
+        # Open the file in binary mode, this means returning bytes
+        # instead of a string whose encoding would have to be interpreted
+        # it is up to the XML parser to determine which encoding it is
+        return open(xml_uri, "rb")
+
+    @staticmethod
+    def _close_source(xml_src, is_remote: bool):
+        xml_src.close()
+        if is_remote:
+            # the downloaded document is not needed anymore
+            try:
+                os.remove(xml_src.name)
+            except OSError as err:
+                PlgLogger.log(
+                    message=f"Cannot remove {xml_src.name}: {err}", log_level=1
+                )
+
+    @staticmethod
+    def _is_canceled(feedback, src, feat_id, xml_src, src_size) -> bool:
+        """Report the progress, returns True if the loading is canceled"""
+        if feedback is None:
+            return False
+        if feedback.isCanceled():
+            return True
+        if src.features is not None:
+            feedback.setProgress(100 * feat_id / len(src.features))
+        elif src_size:
+            # position of the parser in the document
+            feedback.setProgress(100 * xml_src.tell() / src_size)
+        return False
+
+    def _add_layers(self, layers, qgsgeoms, title, attr_list, properties):
+        """Create the layers of the geometries of a feature, if not created yet
+
+        :param properties: arguments of _add_properties_to_layer, after the layer
+        :returns: the last created layer, None if all the layers exist
+        """
+        layer = None
+        if qgsgeoms == []:
+            if "" not in layers:
+                layer = self._create_layer("none", None, attr_list, title, "nogeom")
+
+                self._add_properties_to_layer(layer, *properties)
+                layers["nogeom"] = layer
+            return layer
+
+        for (qgsgeom, srid), tag in qgsgeoms:
+            if tag in layers:
+                continue
+            type2d = QgsWkbTypes.flatType(qgsgeom.wkbType())
+            if not qgsgeom or type2d not in _LAYER_GEOMETRY_TYPES:
+                raise RuntimeError(
+                    "Unsupported geometry type {}".format(qgsgeom.wkbType())
+                )
+            layer = self._create_layer(
+                _LAYER_GEOMETRY_TYPES[QgsWkbTypes.multiType(type2d)],
+                srid,
+                attr_list,
+                "{} ({})".format(title, no_prefix(tag)),
+                no_prefix(tag),
+            )
+            self._add_properties_to_layer(layer, *properties)
+            layers[tag] = layer
+        return layer
+
+    def _collect_features(self, features, f, qgsgeoms, layers, chunk_size):
+        """Add a copy of a feature for each of its geometries, and write the \
+        chunks of features that are full"""
+        for g, tag in qgsgeoms:
+            if tag not in features:
+                features[tag] = []
+            fcopy = QgsFeature(f)
+            if g:
+                qgsgeom, _ = g
+                if QgsWkbTypes.isMultiType(
+                    layers[tag].wkbType()
+                ) and QgsWkbTypes.isSingleType(qgsgeom.wkbType()):
+                    # force multi
+                    qgsgeom.convertToMultiType()
+                fcopy.setGeometry(qgsgeom)
+            features[tag].append(fcopy)
+            if chunk_size and len(features[tag]) >= chunk_size:
+                self._write_features(layers[tag], features[tag])
+                features[tag] = []
+
     def load_complex_gml(
         self,
         xml_uri: str,
@@ -371,6 +509,10 @@ class ComplexFeatureLoader(object):
         geometry_mapping=None,
         logger=None,
         swap_xy: bool = False,
+        streaming: bool = False,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        workers: int = 1,
+        feedback=None,
     ) -> dict:
         """
         :param xml_uri: the XML URI
@@ -378,70 +520,39 @@ class ComplexFeatureLoader(object):
         :param attributes: { 'attr1' : ( '//xpath/expression', QVariant.Int ) }
         :param geometry_mapping: XPath expression to a gml geometry node
         :param swap_xy: True if X/Y coordinates must be swapped
+        :param streaming: True to parse features one by one instead of the whole document
+        :param chunk_size: number of features written at once in each layer. \
+            Each chunk is written in its own transaction. \
+            None or 0 to write all the features at the end
+        :param workers: number of processes used to extract geometries and attributes
+        :param feedback: optional QgsFeedback, for progress report and cancellation. \
+            When canceled, the features read so far are written
         :returns: the created layer
         """
-        try:
-            if is_remote:
-                xml_src = remote_open_from_qgis(xml_uri)
-            else:
-                # Open the file in binary mode, this means returning bytes
-                # instead of a string whose encoding would have to be interpreted
-                # it is up to the XML parser to determine which encoding it is
-                xml_src = open(xml_uri, "rb")
+        xml_src = self._open_source(xml_uri, is_remote)
 
-            src = ComplexFeatureSource(xml_src, attributes, geometry_mapping, logger)
+        try:
+            src = ComplexFeatureSource(
+                xml_src, attributes, geometry_mapping, logger, streaming, workers
+            )
 
             attr_list = [(k, v[1]) for k, v in attributes.items()]
+            properties = (xml_uri, is_remote, attributes, geometry_mapping)
+            src_size = _stream_size(xml_src)
 
             layers = {}
             features = {}
-            for feat_id, fid, qgsgeoms, xml, attrs in src.getFeatures(swap_xy):
+            layer = None
+            for feat_id, fid, qgsgeoms, _, xml, attrs in src.getFeatures(
+                swap_xy, serialized=True
+            ):
+                if self._is_canceled(feedback, src, feat_id, xml_src, src_size):
+                    break
                 # layer creation
-                if qgsgeoms == []:
-                    if "" not in layers:
-                        layer = self._create_layer(
-                            "none", None, attr_list, src.title, "nogeom"
-                        )
-
-                        self._add_properties_to_layer(
-                            layer, xml_uri, is_remote, attributes, geometry_mapping
-                        )
-                        layers["nogeom"] = layer
-                else:
-                    for (qgsgeom, srid), tag in qgsgeoms:
-                        if tag in layers:
-                            continue
-                        type2d = QgsWkbTypes.flatType(qgsgeom.wkbType())
-                        typemap = {
-                            QgsWkbTypes.Point: "point",
-                            QgsWkbTypes.MultiPoint: "multipoint",
-                            QgsWkbTypes.LineString: "linestring",
-                            QgsWkbTypes.MultiLineString: "multilinestring",
-                            QgsWkbTypes.Polygon: "polygon",
-                            QgsWkbTypes.MultiPolygon: "multipolygon",
-                            QgsWkbTypes.CompoundCurve: "compoundcurve",
-                            QgsWkbTypes.CircularString: "compoundcurve",
-                            QgsWkbTypes.MultiCurve: "multicurve",
-                            QgsWkbTypes.CurvePolygon: "curvepolygon",
-                            QgsWkbTypes.MultiSurface: "multisurface",
-                        }
-                        if qgsgeom and type2d in typemap:
-                            title = "{} ({})".format(src.title, no_prefix(tag))
-                            layer = self._create_layer(
-                                typemap[QgsWkbTypes.multiType(type2d)],
-                                srid,
-                                attr_list,
-                                title,
-                                no_prefix(tag),
-                            )
-                        else:
-                            raise RuntimeError(
-                                "Unsupported geometry type {}".format(qgsgeom.wkbType())
-                            )
-                        self._add_properties_to_layer(
-                            layer, xml_uri, is_remote, attributes, geometry_mapping
-                        )
-                        layers[tag] = layer
+                layer = (
+                    self._add_layers(layers, qgsgeoms, src.title, attr_list, properties)
+                    or layer
+                )
 
                 # collect features
                 f = QgsFeature(layer.dataProvider().fields(), feat_id)
@@ -449,30 +560,18 @@ class ComplexFeatureLoader(object):
                 f.setAttribute("fid", fid)
                 for k, v in attrs.items():
                     f.setAttribute(k, v)
-                for g, tag in qgsgeoms:
-                    if tag not in features:
-                        features[tag] = []
-                    fcopy = QgsFeature(f)
-                    fcopy.setAttribute("_xml_", ET.tostring(xml).decode("utf8"))
-                    if g:
-                        qgsgeom, _ = g
-                        if QgsWkbTypes.isMultiType(
-                            layers[tag].wkbType()
-                        ) and QgsWkbTypes.isSingleType(qgsgeom.wkbType()):
-                            # force multi
-                            qgsgeom.convertToMultiType()
-                        fcopy.setGeometry(qgsgeom)
-                    features[tag].append(fcopy)
-
-            # write features
+                # serialized once, shared by the features of each geometry
+                f.setAttribute("_xml_", self._xml_value(xml))
+                self._collect_features(features, f, qgsgeoms, layers, chunk_size)
+
+            # write remaining features
             for tag, f in features.items():
                 if len(f) > 0:
-                    layer = layers[tag]
-                    layer.startEditing()
-                    layer.addFeatures(f)
-                    layer.commitChanges()
+                    self._write_features(layers[tag], f)
+            for layer in layers.values():
+                layer.updateExtents()
         finally:
-            xml_src.close()
+            self._close_source(xml_src, is_remote)
 
         # Set the styl for polygons coming from boundedBy
         for tag_name, layer in layers.items():
@@ -538,11 +637,19 @@ class ComplexFeatureLoaderInMemory(ComplexFeatureLoader):
 
 
 class ComplexFeatureLoaderInGpkg(ComplexFeatureLoader):
-    def __init__(self, output_local_file: str):
+    def __init__(self, output_local_file: str, compress_xml: bool = False):
         """
         :param output_local_file: name of the local sqlite file
+        :param compress_xml: True to store the _xml_ column as a zlib compressed blob. \
+            Use xml_from_attribute() to read it back
         """
         self.output_local_file = output_local_file
+        self.compress_xml = compress_xml
+
+    def _xml_value(self, xml):
+        if not self.compress_xml:
+            return super()._xml_value(xml)
+        return QByteArray(zlib.compress(xml))
 
     def _create_layer(self, geom_type: str, srid, attributes, title, tag):
         """Creates an empty spatialite layer.
@@ -580,7 +687,11 @@ class ComplexFeatureLoaderInGpkg(ComplexFeatureLoader):
         layer = ds.CreateLayer("data", srs, wkbType, ["FID=id"])
         layer.CreateField(ogr.FieldDefn("id", ogr.OFTInteger64))
         layer.CreateField(ogr.FieldDefn("fid", ogr.OFTString))
-        layer.CreateField(ogr.FieldDefn("_xml_", ogr.OFTString))
+        layer.CreateField(
+            ogr.FieldDefn(
+                "_xml_", ogr.OFTBinary if self.compress_xml else ogr.OFTString
+            )
+        )
 
         att_type_map = {
             QVariant.String: ogr.OFTString,
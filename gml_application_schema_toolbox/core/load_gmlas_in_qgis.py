@@ -13,15 +13,22 @@
 #   You should have received a copy of the GNU Library General Public
 #   License along with this library; if not, see <http://www.gnu.org/licenses/>.
 
+import hashlib
+import json
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
 from typing import Union
 
 from qgis.core import (
+    QgsApplication,
     QgsAttributeEditorContainer,
     QgsAttributeEditorField,
     QgsAttributeEditorRelation,
     QgsCoordinateReferenceSystem,
     QgsEditFormConfig,
     QgsEditorWidgetSetup,
+    QgsMapLayer,
     QgsMapLayerLegend,
     QgsProject,
     QgsProviderConnectionException,
@@ -31,8 +38,10 @@ from qgis.core import (
     QgsSimpleLegendNode,
     QgsVectorLayer,
 )
+from qgis.utils import iface
 
-from gml_application_schema_toolbox.__about__ import DIR_PLUGIN_ROOT
+from gml_application_schema_toolbox.__about__ import __title_clean__
+from gml_application_schema_toolbox.core.gmlas_xpath import sql_literal
 from gml_application_schema_toolbox.core.xml_utils import no_ns, no_prefix
 from gml_application_schema_toolbox.gui.custom_viewers import get_custom_viewers
 from gml_application_schema_toolbox.gui.qgis_form_custom_widget import (
@@ -89,6 +98,251 @@ def _qgis_layer(
     return couche
 
 
+def _execute_sql(conn, sql: str, description: str) -> list:
+    """Run a query on a provider connection, errors are logged"""
+    PlgLogger.log(message=f"DEBUG Get {description} with query : {sql}", log_level=4)
+    try:
+        return conn.executeSql(sql)
+    except QgsProviderConnectionException as err:
+        PlgLogger.log(message=err, log_level=2, push=True)
+        return []
+
+
+class GmlasMetadata:
+    """Snapshot of the GMLAS metadata tables of a database.
+
+    Each table is read with a single query, relations and xlink:href fields are
+    then derived in memory.
+    """
+
+    # categories of fields pointing to a child layer
+    CHILD_ELEMENT_CATEGORIES = (
+        "PATH_TO_CHILD_ELEMENT_WITH_LINK",
+        "PATH_TO_CHILD_ELEMENT_NO_LINK",
+    )
+
+    def __init__(self, conn, schema_s: str):
+        """
+        @param conn provider connection to the database
+        @param schema_s prefix of the metadata tables ("schema." or "")
+        """
+        # (layer_name, layer_xpath, layer_category, layer_pkid_name,
+        # layer_parent_pkid_name, f_geometry_column, srid)
+        self.layers = _execute_sql(
+            conn,
+            "select o.layer_name, o.layer_xpath, o.layer_category, o.layer_pkid_name, "
+            "o.layer_parent_pkid_name, g.f_geometry_column, g.srid "
+            f"from {schema_s}_ogr_layers_metadata o "
+            "left join geometry_columns g on g.f_table_name = o.layer_name",
+            "list of layers",
+        )
+        # (layer_name, field_name, field_xpath, field_category, field_max_occurs,
+        # field_related_layer, field_junction_layer)
+        self.fields = _execute_sql(
+            conn,
+            "select layer_name, field_name, field_xpath, field_category, "
+            "field_max_occurs, field_related_layer, field_junction_layer "
+            f"from {schema_s}_ogr_fields_metadata",
+            "fields",
+        )
+        # (parent_layer, parent_pkid, parent_element_name, child_layer, child_pkid)
+        self.relationships = _execute_sql(
+            conn,
+            "select parent_layer, parent_pkid, parent_element_name, child_layer, "
+            f"child_pkid from {schema_s}_ogr_layer_relationships",
+            "relationships",
+        )
+
+    def href_fields(self) -> dict:
+        """Return names of fields with a xlink:href, by layer name"""
+        href_fields = {}
+        for layer_name, field_name, field_xpath, *_ in self.fields:
+            if field_xpath and field_xpath.endswith("@xlink:href"):
+                href_fields.setdefault(layer_name, []).append(field_name)
+        return href_fields
+
+    def _fields_with_relationships(self, categories, by_element: bool):
+        # join fields and relationships on the parent layer and either the
+        # element name or the child layer
+        relationships = {}
+        for r in self.relationships:
+            key = (r[0], r[2] if by_element else r[3])
+            relationships.setdefault(key, []).append(r)
+        for f in self.fields:
+            if f[3] not in categories:
+                continue
+            for r in relationships.get((f[0], f[1] if by_element else f[5]), []):
+                yield f, r
+
+    def relations_1_1(self) -> list:
+        """Return 1:1 relations, as (layer_name, field_name, field_related_layer, \
+        child_pkid)"""
+        return [
+            (f[0], f[1], f[5], r[4])
+            for f, r in self._fields_with_relationships(
+                self.CHILD_ELEMENT_CATEGORIES, True
+            )
+            if f[4] is not None and int(f[4]) == 1
+        ]
+
+    def relations_1_n(self) -> list:
+        """Return 1:N relations, as (layer_name, parent_pkid, child_layer, \
+        child_pkid)"""
+        relations = [
+            (f[0], r[1], f[5], r[4])
+            for f, r in self._fields_with_relationships(
+                self.CHILD_ELEMENT_CATEGORIES, False
+            )
+            if f[4] is not None and int(f[4]) > 1
+        ]
+        junctions = list(
+            self._fields_with_relationships(
+                ("PATH_TO_CHILD_ELEMENT_WITH_JUNCTION_TABLE",), False
+            )
+        )
+        # junctions - 1st way
+        relations += [(f[0], r[1], f[6], "parent_pkid") for f, r in junctions]
+        # junctions - 2nd way
+        relations += [(f[5], r[4], f[6], "child_pkid") for f, r in junctions]
+        return relations
+
+    def skeleton(self) -> dict:
+        """Return the project skeleton: layers, relations and xlink:href fields
+        derived from the metadata. It is JSON serializable, so that it can be
+        cached"""
+        # get list of layers
+        layers_attrs = {
+            "layer_name": 0,
+            "layer_xpath": 1,
+            "layer_category": 2,
+            "layer_pkid_name": 3,
+            "layer_parent_pkid_name": 4,
+            "f_geometry_column": 5,
+            "srid": 6,
+        }
+
+        layers = {}
+        for f in self.layers:
+            ln = f[layers_attrs["layer_name"]]
+            if ln not in layers:
+                layers[ln] = {
+                    "uid": f[layers_attrs["layer_pkid_name"]],
+                    "category": f[layers_attrs["layer_category"]],
+                    "xpath": f[layers_attrs["layer_xpath"]],
+                    "parent_pkid": f[layers_attrs["layer_parent_pkid_name"]],
+                    "srid": f[layers_attrs["srid"]],
+                    "geometry_column": f[layers_attrs["f_geometry_column"]],
+                    "layer_name": ln,
+                }
+            else:
+                # additional geometry columns
+                g = f[layers_attrs["f_geometry_column"]]
+                k = "{} ({})".format(ln, g)
+                layers[k] = dict(layers[ln])
+                layers[k]["geometry_column"] = g
+
+        relations_1_1 = self.relations_1_1()
+        PlgLogger.log(message=f"DEBUG Relations 1:1 : {relations_1_1}", log_level=4)
+        relations_1_n = self.relations_1_n()
+        PlgLogger.log(message=f"DEBUG Relations 1:N : {relations_1_n}", log_level=4)
+
+        return {
+            "layers": layers,
+            "relations_1_1": relations_1_1,
+            "relations_1_n": relations_1_n,
+            # collect fields with xlink:href
+            "href_fields": self.href_fields(),
+        }
+
+
+class SkeletonCache:
+    """Cache of the project skeleton of a GMLAS database, so that loading it again
+    does not read its metadata tables.
+
+    There is one file per database and schema, in the plugin folder of the QGIS
+    profile. The cached skeleton is used as long as the database signature does
+    not change: modification time and size of a SQLite file, identifiers of the
+    tables of a PostgreSQL schema, which change when the tables are created again.
+    """
+
+    def __init__(self, conn, gmlas_uri: str, provider: str, schema: Union[str, None]):
+        """
+        @param conn provider connection to the database
+        @param gmlas_uri connection parameters
+        @param provider name of the QGIS provider that handles gmlas_uri parameters
+        @param schema name of the PostgreSQL schema where metadata tables are
+        """
+        self.conn = conn
+        self.gmlas_uri = gmlas_uri
+        self.provider = provider
+        self.schema = schema
+        key = hashlib.sha256(
+            "\n".join((provider, gmlas_uri, schema or "")).encode("utf-8")
+        ).hexdigest()
+        self.path = skeleton_cache_folder() / (key + ".json")
+
+    def signature(self) -> Union[list, None]:
+        """Return the database signature, None if it cannot be computed"""
+        if self.provider in ("ogr", "spatialite"):
+            path = QgsProviderRegistry.instance().decodeUri(
+                self.provider, self.gmlas_uri
+            )
+            try:
+                stat = Path(path.get("path") or self.gmlas_uri).stat()
+            except OSError:
+                return None
+            return [stat.st_mtime_ns, stat.st_size]
+
+        if self.provider == "postgres":
+            try:
+                rows = self.conn.executeSql(
+                    "select c.oid::text, c.relname from pg_class c "
+                    "join pg_namespace n on n.oid = c.relnamespace "
+                    "where n.nspname = {} and c.relkind in ('r', 'v') "
+                    "order by c.relname".format(sql_literal(self.schema or "public"))
+                )
+            except QgsProviderConnectionException:
+                return None
+            return [list(r) for r in rows]
+
+        return None
+
+    def get(self, signature: list) -> Union[dict, None]:
+        """Return the cached skeleton, None if there is none for the signature"""
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get("signature") != signature:
+            return None
+        return cached.get("skeleton")
+
+    def put(self, signature: list, skeleton: dict):
+        """Store the skeleton for the signature, replacing the previous one"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(
+                json.dumps({"signature": signature, "skeleton": skeleton}),
+                encoding="utf-8",
+            )
+        except OSError as err:
+            PlgLogger.log(
+                message=f"Cannot write skeleton cache {self.path}: {err}",
+                log_level=1,
+            )
+
+
+def skeleton_cache_folder() -> Path:
+    """Return the folder of the skeleton cache, in the QGIS profile folder"""
+    return (
+        Path(QgsApplication.qgisSettingsDirPath())
+        / "cache"
+        / __title_clean__
+        / "skeletons"
+    )
+
+
 class CustomViewerLegend(QgsMapLayerLegend):
     def __init__(self, text, icon, parent=None):
         QgsMapLayerLegend.__init__(self, parent)
@@ -99,280 +353,297 @@ class CustomViewerLegend(QgsMapLayerLegend):
         return [QgsSimpleLegendNode(layer_tree_layer, self.text, self.icon, self)]
 
 
-def import_in_qgis(
-    gmlas_uri: str, provider: str, add_form_code: bool, schema: Union[str, None] = None
-):
-    """Imports layers from a GMLAS file in QGIS with relations and editor widgets
-
-    @param gmlas_uri connection parameters
-    @param provider name of the QGIS provider that handles gmlas_uri parameters
-    @param add_form_code set this to true to load the custom form code
-    @param schema name of the PostgreSQL schema where tables and metadata tables are
-    """
-    PlgLogger.log(
-        message=f"Start importing {gmlas_uri} (provider: {provider}) into QGIS",
-        log_level=4,
-    )
-
-    # set provider to ogr only for SQLite
-    if provider in ("sqlite", "SQLite"):
-        provider = "ogr"
+class PendingChildrenLegend(QgsMapLayerLegend):
+    """Placeholder legend listing the child layers not loaded yet"""
 
-    if schema is not None:
-        schema_s = schema + "."
-    else:
-        schema_s = ""
-
-    md = QgsProviderRegistry.instance().providerMetadata(provider)
-    conn = md.createConnection(gmlas_uri, {})
-    PlgLogger.log(message=f"DEBUG Connect to {conn.uri()}", log_level=4)
-
-    # get list of layers
-    layers_attrs = {
-        "layer_name": 0,
-        "layer_xpath": 1,
-        "layer_category": 2,
-        "layer_pkid_name": 3,
-        "layer_parent_pkid_name": 4,
-        "f_geometry_column": 5,
-        "srid": 6,
-    }
-    sql = f"select o.layer_name, o.layer_xpath, o.layer_category, o.layer_pkid_name, o.layer_parent_pkid_name, g.f_geometry_column, g.srid from {schema_s}_ogr_layers_metadata o left join geometry_columns g on g.f_table_name = o.layer_name"
-    PlgLogger.log(message=f"DEBUG Get list of layers with query : {sql}", log_level=4)
-
-    result = []
-    try:
-        result = conn.executeSql(sql)
-        PlgLogger.log(message=f"DEBUG List of layers : {result}", log_level=4)
-    except QgsProviderConnectionException as err:
-        PlgLogger.log(message=err, log_level=2, push=True)
+    def __init__(self, child_names, parent=None):
+        QgsMapLayerLegend.__init__(self, parent)
+        self.child_names = child_names
 
-    layers = {}
-    for f in result:
-        ln = f[layers_attrs["layer_name"]]
-        if ln not in layers:
-            layers[ln] = {
-                "uid": f[layers_attrs["layer_pkid_name"]],
-                "category": f[layers_attrs["layer_category"]],
-                "xpath": f[layers_attrs["layer_xpath"]],
-                "parent_pkid": f[layers_attrs["layer_parent_pkid_name"]],
-                "srid": f[layers_attrs["srid"]],
-                "geometry_column": f[layers_attrs["f_geometry_column"]],
-                "1_n": [],  # 1:N relations
-                "layer_id": None,
-                "layer_name": ln,
-                "layer": None,
-                "fields": [],
-            }
-        else:
-            # additional geometry columns
-            g = f[layers_attrs["f_geometry_column"]]
-            k = "{} ({})".format(ln, g)
-            layers[k] = dict(layers[ln])
-            layers[k]["geometry_column"] = g
-
-    # collect fields with xlink:href
-    fields_attrs = {"field_name": 0, "field_xpath": 1}
-    href_fields = {}
-    for ln, layer in layers.items():
-        layer_name = layer["layer_name"]
-        sql = f"select field_name, field_xpath from {schema_s}_ogr_fields_metadata where layer_name='{layer_name}'"
-        PlgLogger.log(
-            message=f"DEBUG Get fields of layer {layer_name} with query : {sql}",
-            log_level=4,
-        )
-        try:
-            result = conn.executeSql(sql)
-        except QgsProviderConnectionException as err:
-            PlgLogger.log(message=err, log_level=2, push=True)
-        PlgLogger.log(message=f"DEBUG List of fields : {result}", log_level=4)
-        for f in result:
-            field_name, field_xpath = (
-                f[fields_attrs["field_name"]],
-                f[fields_attrs["field_xpath"]],
+    def createLayerTreeModelLegendNodes(self, layer_tree_layer):
+        return [
+            QgsSimpleLegendNode(
+                layer_tree_layer, "{} (not loaded)".format(name), parent=self
             )
-            if field_xpath and field_xpath.endswith("@xlink:href"):
-                if ln not in href_fields:
-                    href_fields[ln] = []
-                href_fields[ln].append(field_name)
+            for name in self.child_names
+        ]
+
 
+@contextmanager
+def _default_crs_settings():
     # with unknown srid, don't ask for each layer, set to a default
     settings = QgsSettings()
     projection_behavior = settings.value("Projections/defaultBehavior")
     projection_default = settings.value("Projections/layerDefaultCrs")
     settings.setValue("Projections/defaultBehavior", "useGlobal")
     settings.setValue("Projections/layerDefaultCrs", "EPSG:4326")
+    try:
+        yield
+    finally:
+        # restore settings
+        settings.setValue("Projections/defaultBehavior", projection_behavior)
+        settings.setValue("Projections/layerDefaultCrs", projection_default)
+
+
+def _in_project(relations: dict, rel: QgsRelation) -> bool:
+    # the relation is already in the project, between the same layers
+    other = relations.get(rel.id())
+    return (
+        other is not None
+        and other.referencedLayerId() == rel.referencedLayerId()
+        and other.referencingLayerId() == rel.referencingLayerId()
+    )
+
+
+@contextmanager
+def _frozen_canvas():
+    # the map canvas is refreshed once, when all the layers are added
+    canvas = iface.mapCanvas() if iface is not None else None
+    if canvas is None or canvas.isFrozen():
+        yield
+        return
+    canvas.freeze(True)
+    try:
+        yield
+    finally:
+        canvas.freeze(False)
+        canvas.refresh()
+
+
+class GmlasImport:
+    """Layers, relations and forms of a GMLAS database in the QGIS project.
+
+    Either all layers are added at once (load_all), or only top-level layers are
+    (load_top_level). In the latter case, child layers are added along with their
+    relations the first time their parent layer is expanded or selected in the
+    layers panel.
+    """
+
+    def __init__(
+        self,
+        gmlas_uri: str,
+        provider: str,
+        add_form_code: bool,
+        schema: Union[str, None],
+        skeleton: dict,
+    ):
+        """
+        @param gmlas_uri connection parameters
+        @param provider name of the QGIS provider that handles gmlas_uri parameters
+        @param add_form_code set this to true to load the custom form code
+        @param schema name of the PostgreSQL schema where tables are
+        @param skeleton project skeleton, see GmlasMetadata.skeleton
+        """
+        self.gmlas_uri = gmlas_uri
+        self.provider = provider
+        self.add_form_code = add_form_code
+        self.schema = schema
+
+        # additional geometry columns share the 1:N relations of their layer
+        relations_1_n = {}
+        self.layers = {}
+        for ln, lyr in skeleton["layers"].items():
+            self.layers[ln] = dict(
+                lyr,
+                layer_id=None,
+                layer=None,
+                fields=[],
+            )
+            self.layers[ln]["1_n"] = relations_1_n.setdefault(lyr["layer_name"], [])
+
+        self.href_fields = skeleton["href_fields"]
+        # (layer_name, field_name, field_related_layer, child_pkid)
+        self.relations_1_1 = skeleton["relations_1_1"]
+        # (layer_name, parent_pkid, child_layer, child_pkid)
+        self.relations_1_n = skeleton["relations_1_n"]
+
+        # GMLAS layer names, by QGIS layer id
+        self._layer_names = {}
+        # names of the layers whose child layers and relations are loaded
+        self._loaded = set()
+
+    # -- Layers -----------------------------------------------------------------
 
-    # add layers
-    crs = QgsCoordinateReferenceSystem("EPSG:4326")
-    for ln in sorted(layers.keys()):
-        lyr = layers[ln]
+    def _create_layer(self, ln: str) -> QgsVectorLayer:
+        lyr = self.layers[ln]
         g_column = lyr["geometry_column"] or None
         PlgLogger.log(
-            message=f"DEBUG Load layer with uri={gmlas_uri}, schema={schema}, layer={lyr['layer_name']}, geometry={g_column}, \
-            provider={provider}, ln={ln}, xpath={lyr['xpath']}, uid={lyr['uid']}"
+            message=f"DEBUG Load layer with uri={self.gmlas_uri}, schema={self.schema}, "
+            f"layer={lyr['layer_name']}, geometry={g_column}, provider={self.provider}, "
+            f"ln={ln}, xpath={lyr['xpath']}, uid={lyr['uid']}"
         )
         couches = _qgis_layer(
-            gmlas_uri,
-            schema,
+            self.gmlas_uri,
+            self.schema,
             lyr["layer_name"],
             g_column,
-            provider,
+            self.provider,
             ln,
             lyr["xpath"],
             lyr["uid"],
         )
-        # if not couches.isValid():
-        #     raise RuntimeError(
-        #         "Problem loading layer {} with {}".format(ln, couches.source())
-        #     )
         if g_column is not None:
-            if lyr["srid"]:
-                crs = QgsCoordinateReferenceSystem("EPSG:{}".format(lyr["srid"]))
-            couches.setCrs(crs)
-        QgsProject.instance().addMapLayer(couches)
-        layers[ln]["layer_id"] = couches.id()
-        layers[ln]["layer"] = couches
+            couches.setCrs(
+                QgsCoordinateReferenceSystem(
+                    "EPSG:{}".format(lyr["srid"]) if lyr["srid"] else "EPSG:4326"
+                )
+            )
+        lyr["layer_id"] = couches.id()
+        lyr["layer"] = couches
+        self._layer_names[couches.id()] = lyr["layer_name"]
         # save fields which represent a xlink:href
-        if ln in href_fields:
-            couches.setCustomProperty("href_fields", href_fields[ln])
+        if lyr["layer_name"] in self.href_fields:
+            couches.setCustomProperty(
+                "href_fields", self.href_fields[lyr["layer_name"]]
+            )
         # save gmlas_uri
-        couches.setCustomProperty("ogr_uri", gmlas_uri)
-        couches.setCustomProperty("ogr_schema", schema)
+        couches.setCustomProperty("ogr_uri", self.gmlas_uri)
+        couches.setCustomProperty("ogr_schema", self.schema)
 
         # change icon the layer has a custom viewer
-        xpath = no_ns(couches.customProperty("xpath", ""))
+        legend = self._viewer_legend(couches)
+        if legend is not None:
+            couches.setLegend(legend)
+        return couches
+
+    @staticmethod
+    def _viewer_legend(couche: QgsVectorLayer) -> Union[CustomViewerLegend, None]:
+        xpath = no_ns(couche.customProperty("xpath", ""))
+        legend = None
         for viewer_cls, _ in get_custom_viewers().values():
             tag = no_prefix(viewer_cls.xml_tag())
             if tag == xpath:
-                lg = CustomViewerLegend(viewer_cls.name(), viewer_cls.icon())
-                couches.setLegend(lg)
-
-    # restore settings
-    settings.setValue("Projections/defaultBehavior", projection_behavior)
-    settings.setValue("Projections/layerDefaultCrs", projection_default)
-
-    # add 1:1 relations
-    relations_1_1_attrs = {
-        "layer_name": 0,
-        "field_name": 1,
-        "field_related_layer": 2,
-        "child_pkid": 3,
-    }
-    relations_1_1 = []
-    with open(DIR_PLUGIN_ROOT / "sql/get_1_1_relations.sql", "r") as f:
-        sql = f.read().format(schema=schema_s)
-
-    PlgLogger.log(message=f"DEBUG Add relations 1:1 with query : {sql}", log_level=4)
-    try:
-        result = conn.executeSql(sql)
-    except QgsProviderConnectionException as err:
-        PlgLogger.log(message=err, log_level=2, push=True)
-    PlgLogger.log(message=f"DEBUG Relations 1:1 : {result}", log_level=4)
-    if result is not None:
-        for f in result:
+                legend = CustomViewerLegend(viewer_cls.name(), viewer_cls.icon())
+        return legend
+
+    def _add_layers(self, names: list, lazy: bool):
+        with _default_crs_settings():
+            couches = [self._create_layer(ln) for ln in names]
+        # a single call, so that the layer tree is updated once
+        QgsProject.instance().addMapLayers(couches)
+
+        if lazy:
+            for ln in names:
+                self._set_pending(ln)
+            # forms of layers with loaded relations are already set up
+            for ln in names:
+                if self.layers[ln]["layer_name"] not in self._loaded:
+                    self._setup_form(ln)
+
+    def _child_layers(self, layer_name: str) -> list:
+        return sorted(
+            {
+                f[2]
+                for f in self.relations_1_1 + self.relations_1_n
+                if f[0] == layer_name and f[2] in self.layers
+            }
+        )
+
+    def _parent_layers(self, layer_name: str) -> list:
+        # names of the layers, loaded ones first
+        parents = {
+            f[0] for f in self.relations_1_1 + self.relations_1_n if f[2] == layer_name
+        }
+        return sorted(
+            (ln for ln, lyr in self.layers.items() if lyr["layer_name"] in parents),
+            key=lambda ln: (self.layers[ln]["layer"] is None, ln),
+        )
+
+    def _set_pending(self, ln: str):
+        # placeholder legend, child layers are loaded on expansion
+        couche = self.layers[ln]["layer"]
+        pending = [
+            c
+            for c in self._child_layers(self.layers[ln]["layer_name"])
+            if self.layers[c]["layer"] is None
+        ]
+        if not pending:
+            # nothing to wait for, relations to loaded layers are added now
+            self.load_children(couche)
+            return
+        couche.setLegend(PendingChildrenLegend(pending))
+        node = QgsProject.instance().layerTreeRoot().findLayer(couche.id())
+        if node is not None:
+            node.setExpanded(False)
+            node.expandedChanged.connect(partial(self._on_expanded, couche.id()))
+
+    # -- Relations and forms ----------------------------------------------------
+
+    def _add_relations(self, parent_names: Union[list, None] = None):
+        """Add the relations of parent_names layers (all when None) to the project.
+        Relations already added, when child layers are loaded again, are kept."""
+        manager = QgsProject.instance().relationManager()
+        existing = manager.relations()
+        relations_1_1 = []
+        for layer_name, field_name, related_layer, child_pkid in self.relations_1_1:
+            if parent_names is not None and layer_name not in parent_names:
+                continue
+            if layer_name not in self.layers or related_layer not in self.layers:
+                continue
             rel = QgsRelation()
-            rel.setId(
-                "1_1_"
-                + f[relations_1_1_attrs["layer_name"]]
-                + "_"
-                + f[relations_1_1_attrs["field_name"]]
-            )
-            rel.setName(
-                "1_1_"
-                + f[relations_1_1_attrs["layer_name"]]
-                + "_"
-                + f[relations_1_1_attrs["field_name"]]
-            )
+            rel.setId("1_1_" + layer_name + "_" + field_name)
+            rel.setName("1_1_" + layer_name + "_" + field_name)
             # parent layer
-            rel.setReferencingLayer(
-                layers[f[relations_1_1_attrs["layer_name"]]]["layer_id"]
-            )
+            rel.setReferencingLayer(self.layers[layer_name]["layer_id"])
             # child layer
-            rel.setReferencedLayer(
-                layers[f[relations_1_1_attrs["field_related_layer"]]]["layer_id"]
-            )
+            rel.setReferencedLayer(self.layers[related_layer]["layer_id"])
             # parent, child
-            rel.addFieldPair(
-                f[relations_1_1_attrs["field_name"]],
-                f[relations_1_1_attrs["child_pkid"]],
-            )
-            if rel.isValid():
+            rel.addFieldPair(field_name, child_pkid)
+            if rel.isValid() and not _in_project(existing, rel):
                 relations_1_1.append(rel)
 
-    # add 1:N relations
-    relations_1_n_attrs = {
-        "layer_name": 0,
-        "parent_pkid": 1,
-        "child_layer": 2,
-        "child_pkid": 3,
-    }
-    relations_1_n = []
-    with open(DIR_PLUGIN_ROOT / "sql/get_1_n_relations.sql", "r") as f:
-        sql = f.read().format(schema=schema_s)
-
-    PlgLogger.log(message=f"DEBUG Add relations 1:N with query : {sql}", log_level=4)
-    try:
-        result = conn.executeSql(sql)
-    except QgsProviderConnectionException as err:
-        PlgLogger.log(message=err, log_level=2, push=True)
-    PlgLogger.log(message=f"DEBUG Relations 1:N : {result}", log_level=4)
-
-    if result is not None:
-        for f in result:
-            parent_layer = f[relations_1_n_attrs["layer_name"]]
-            child_layer = f[relations_1_n_attrs["child_layer"]]
-            if parent_layer not in layers or child_layer not in layers:
+        relations_1_n = []
+        for parent_layer, parent_pkid, child_layer, child_pkid in self.relations_1_n:
+            if parent_names is not None and parent_layer not in parent_names:
+                continue
+            if parent_layer not in self.layers or child_layer not in self.layers:
                 continue
             rel = QgsRelation()
             rel.setId(
                 "1_n_"
-                + f[relations_1_n_attrs["layer_name"]]
+                + parent_layer
                 + "_"
-                + f[relations_1_n_attrs["child_layer"]]
+                + child_layer
                 + "_"
-                + f[relations_1_n_attrs["parent_pkid"]]
+                + parent_pkid
                 + "_"
-                + f[relations_1_n_attrs["child_pkid"]]
+                + child_pkid
             )
-            rel.setName(f[relations_1_n_attrs["child_layer"]])
+            rel.setName(child_layer)
             # parent layer
-            rel.setReferencedLayer(layers[parent_layer]["layer_id"])
+            rel.setReferencedLayer(self.layers[parent_layer]["layer_id"])
             # child layer
-            rel.setReferencingLayer(layers[child_layer]["layer_id"])
+            rel.setReferencingLayer(self.layers[child_layer]["layer_id"])
             # parent, child
-            rel.addFieldPair(
-                f[relations_1_n_attrs["child_pkid"]],
-                f[relations_1_n_attrs["parent_pkid"]],
-            )
-            if rel.isValid():
+            rel.addFieldPair(child_pkid, parent_pkid)
+            if rel.isValid() and not _in_project(existing, rel):
                 relations_1_n.append(rel)
                 # add relation to layer
-                layers[f[relations_1_n_attrs["layer_name"]]]["1_n"].append(rel)
-
-    for rel in relations_1_1 + relations_1_n:
-        QgsProject.instance().relationManager().addRelation(rel)
-
-    # add "show form" option to 1:1 relations
-    for rel in relations_1_1:
-        couches = rel.referencingLayer()
-        idx = rel.referencingFields()[0]
-        s = QgsEditorWidgetSetup(
-            "RelationReference",
-            {
-                "AllowNULL": False,
-                "ReadOnly": True,
-                "Relation": rel.id(),
-                "OrderByValue": False,
-                "MapIdentification": False,
-                "AllowAddFeatures": False,
-                "ShowForm": True,
-            },
-        )
-        couches.setEditorWidgetSetup(idx, s)
+                self.layers[parent_layer]["1_n"].append(rel)
+
+        # relations are set at once, so that listeners are notified once
+        manager.setRelations(list(existing.values()) + relations_1_1 + relations_1_n)
+
+        # add "show form" option to 1:1 relations
+        for rel in relations_1_1:
+            couches = rel.referencingLayer()
+            idx = rel.referencingFields()[0]
+            s = QgsEditorWidgetSetup(
+                "RelationReference",
+                {
+                    "AllowNULL": False,
+                    "ReadOnly": True,
+                    "Relation": rel.id(),
+                    "OrderByValue": False,
+                    "MapIdentification": False,
+                    "AllowAddFeatures": False,
+                    "ShowForm": True,
+                },
+            )
+            couches.setEditorWidgetSetup(idx, s)
 
-    # setup form for layers
-    for layer, lyr in layers.items():
+    def _setup_form(self, ln: str):
+        lyr = self.layers[ln]
         couche = lyr["layer"]
         fc = couche.editFormConfig()
         fc.clearTabs()
@@ -394,5 +665,201 @@ def import_in_qgis(
 
         couche.setEditFormConfig(fc)
 
-        if add_form_code:
+        if self.add_form_code:
             install_viewer_on_feature_form(couche)
+
+    # -- Loading ----------------------------------------------------------------
+
+    def load_all(self):
+        """Add all the layers and relations to the project"""
+        with _frozen_canvas():
+            self._add_layers(sorted(self.layers.keys()), lazy=False)
+            self._add_relations()
+            # forms are set up once relations are known
+            for ln in self.layers:
+                self._setup_form(ln)
+
+    def load_top_level(self):
+        """Add the top-level layers to the project, other layers being added on
+        demand by load_children"""
+        children = {f[2] for f in self.relations_1_1 + self.relations_1_n}
+        top_level = [
+            ln
+            for ln, lyr in sorted(self.layers.items())
+            if lyr["category"] == "TOP_LEVEL_ELEMENT"
+            or lyr["layer_name"] not in children
+        ]
+        with _frozen_canvas():
+            self._add_layers(top_level, lazy=True)
+
+        if iface is not None:
+            iface.layerTreeView().currentLayerChanged.connect(self.load_children)
+        QgsProject.instance().layersRemoved.connect(self._on_layers_removed)
+        QgsProject.instance().cleared.connect(self._disconnect)
+
+    def load_children(self, layer: QgsMapLayer):
+        """Add the child layers of a layer and its relations to the project, if not
+        already done.
+
+        @param layer QGIS layer of this import, other layers are ignored
+        """
+        if layer is None or layer.id() not in self._layer_names:
+            return
+        layer_name = self._layer_names[layer.id()]
+        if layer_name in self._loaded:
+            return
+        self._loaded.add(layer_name)
+        PlgLogger.log(message=f"DEBUG Load child layers of {layer_name}", log_level=4)
+
+        children = self._child_layers(layer_name)
+        with _frozen_canvas():
+            self._add_layers(
+                [
+                    ln
+                    for ln, lyr in sorted(self.layers.items())
+                    if lyr["layer_name"] in children and lyr["layer"] is None
+                ],
+                lazy=True,
+            )
+            self._add_relations([layer_name])
+
+            # the layer form and legend now show its relations
+            for ln, lyr in self.layers.items():
+                if lyr["layer_name"] == layer_name and lyr["layer"] is not None:
+                    self._setup_form(ln)
+                    lyr["layer"].setLegend(
+                        self._viewer_legend(lyr["layer"])
+                        or QgsMapLayerLegend.defaultVectorLegend(lyr["layer"])
+                    )
+
+    def load_layer(self, ln: str, _visited: frozenset = frozenset()):
+        """Return the QGIS layer of a GMLAS layer. If it is not loaded yet, it is
+        added to the project with the layers it is a child of.
+
+        @param ln name of the layer in the layers dict
+        @returns the QGIS layer, None if it cannot be reached from a loaded layer
+        """
+        lyr = self.layers[ln]
+        if lyr["layer"] is None:
+            # relations may form cycles
+            visited = _visited | {ln}
+            for parent_ln in self._parent_layers(lyr["layer_name"]):
+                if parent_ln in visited:
+                    continue
+                parent = self.load_layer(parent_ln, visited)
+                if parent is not None:
+                    self.load_children(parent)
+                    break
+        return lyr["layer"]
+
+    def layer_by_xpath(self, xpath: str):
+        """Return the QGIS layer of the GMLAS layer of an element, loading it if
+        needed, see load_layer.
+
+        @param xpath XPath of the element, without namespaces
+        @returns the QGIS layer, or None
+        """
+        for ln, lyr in sorted(self.layers.items()):
+            if no_ns(lyr["xpath"]) == xpath:
+                return self.load_layer(ln)
+        return None
+
+    def _on_expanded(self, layer_id: str, node, expanded: bool):
+        if expanded:
+            self.load_children(QgsProject.instance().mapLayer(layer_id))
+
+    def _on_layers_removed(self, layer_ids: list):
+        # forget the layers removed from the project, they are loaded again
+        # if needed
+        for layer_id in layer_ids:
+            layer_name = self._layer_names.pop(layer_id, None)
+            if layer_name is None:
+                continue
+            for lyr in self.layers.values():
+                if lyr["layer_id"] == layer_id:
+                    lyr["layer_id"] = None
+                    lyr["layer"] = None
+            if layer_name not in self._layer_names.values():
+                self._loaded.discard(layer_name)
+                # its parent layers load it again
+                for parent_ln in self._parent_layers(layer_name):
+                    self._loaded.discard(self.layers[parent_ln]["layer_name"])
+        # QGIS removes the relations of removed layers
+        for lyr in self.layers.values():
+            lyr["1_n"][:] = [
+                rel
+                for rel in lyr["1_n"]
+                if rel.referencedLayerId() in self._layer_names
+                and rel.referencingLayerId() in self._layer_names
+            ]
+
+    def _disconnect(self):
+        # the project is closed, no more layers to load
+        if iface is not None:
+            iface.layerTreeView().currentLayerChanged.disconnect(self.load_children)
+        QgsProject.instance().layersRemoved.disconnect(self._on_layers_removed)
+        QgsProject.instance().cleared.disconnect(self._disconnect)
+
+
+def import_in_qgis(
+    gmlas_uri: str,
+    provider: str,
+    add_form_code: bool,
+    schema: Union[str, None] = None,
+    lazy: bool = False,
+    use_cache: bool = False,
+) -> GmlasImport:
+    """Imports layers from a GMLAS file in QGIS with relations and editor widgets
+
+    @param gmlas_uri connection parameters
+    @param provider name of the QGIS provider that handles gmlas_uri parameters
+    @param add_form_code set this to true to load the custom form code
+    @param schema name of the PostgreSQL schema where tables and metadata tables are
+    @param lazy set this to true to only load top-level layers, child layers being
+    loaded when their parent layer is expanded or selected in the layers panel.
+    This only lasts for the session: pending child layers are not saved in the project
+    @param use_cache set this to true to cache the project skeleton in the QGIS
+    profile folder, so that loading the same database again is faster
+    @returns the import, child layers can be loaded with its load_children method
+    """
+    PlgLogger.log(
+        message=f"Start importing {gmlas_uri} (provider: {provider}) into QGIS",
+        log_level=4,
+    )
+
+    # set provider to ogr only for SQLite
+    if provider in ("sqlite", "SQLite"):
+        provider = "ogr"
+
+    if schema is not None:
+        schema_s = schema + "."
+    else:
+        schema_s = ""
+
+    md = QgsProviderRegistry.instance().providerMetadata(provider)
+    conn = md.createConnection(gmlas_uri, {})
+    PlgLogger.log(message=f"DEBUG Connect to {conn.uri()}", log_level=4)
+
+    # layers and relations are read again only if the database changed
+    skeleton = None
+    if use_cache:
+        cache = SkeletonCache(conn, gmlas_uri, provider, schema)
+        signature = cache.signature()
+        if signature is not None:
+            skeleton = cache.get(signature)
+        if skeleton is not None:
+            PlgLogger.log(message="DEBUG Project skeleton read from cache", log_level=4)
+    if skeleton is None:
+        # read all the metadata at once
+        metadata = GmlasMetadata(conn, schema_s)
+        PlgLogger.log(message=f"DEBUG List of layers : {metadata.layers}", log_level=4)
+        skeleton = metadata.skeleton()
+        if use_cache and signature is not None:
+            cache.put(signature, skeleton)
+
+    gmlas_import = GmlasImport(gmlas_uri, provider, add_form_code, schema, skeleton)
+    if lazy:
+        gmlas_import.load_top_level()
+    else:
+        gmlas_import.load_all()
+    return gmlas_import
@@ -5,12 +5,17 @@
 # ##################################
 
 # Standard library
+import hashlib
 import logging
+import os
+import tempfile
 from io import BytesIO
-from typing import Dict
+from typing import BinaryIO, Dict, Union
 
 # project
+from gml_application_schema_toolbox.__about__ import __title_clean__
 from gml_application_schema_toolbox.toolbelt import PlgLogger, PlgOptionsManager
+from gml_application_schema_toolbox.toolbelt.file_downloader import get_from_http
 from gml_application_schema_toolbox.toolbelt.network_manager import (
     NetworkAccessManager,
     RequestsException,
@@ -37,9 +42,16 @@ def remote_open_from_qgis(
         b"Accept-Language": bytes(plg_settings.network_language, "utf8"),
         b"User-Agent": bytes(plg_settings.network_http_user_agent, "utf8"),
     },
-) -> BytesIO:
+    resumable: bool = False,
+    use_cache: bool = True,
+) -> Union[BytesIO, BinaryIO]:
     """Opens a remote URL using Network Acess Manager. In fact, just a shortcut.
 
+    Large documents should be opened with resumable set: the response is then
+    downloaded to a file of the temporary folder, named after the URI, and an
+    interrupted download is resumed by the next call with the same URI. The caller
+    removes the file once read.
+
     :param uri: URI to request
     :type uri: str
     :param headers: HTTP headers. Defaults to: \
@@ -51,13 +63,28 @@ def remote_open_from_qgis(
             b"User-Agent": bytes(settings.value("http_user_agent", __title__), "utf8")
             }
     :type headers: Dict[bytes, bytes], optional
+    :param resumable: download to a file, resumed if interrupted, defaults to False
+    :type resumable: bool, optional
+    :param use_cache: False to bypass the HTTP cache, defaults to True
+    :type use_cache: bool, optional
 
-    :return: response content as bytesarray or None if something went wrong
-    :rtype: BytesIO
+    :return: response content as bytesarray (or opened file if resumable) or None \
+    if something went wrong
+    :rtype: Union[BytesIO, BinaryIO]
     """
+    if resumable:
+        output_dir = os.path.join(tempfile.gettempdir(), __title_clean__)
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(
+            output_dir, hashlib.sha1(uri.encode("utf8")).hexdigest() + ".xml"
+        )
+        if get_from_http(uri, output_path, headers) is None:
+            return None
+        return open(output_path, "rb")
+
     nam = NetworkAccessManager()
     try:
-        response, content = nam.request(url=uri, headers=headers)
+        response, content = nam.request(url=uri, headers=headers, use_cache=use_cache)
         plg_logger.log(response.status_code)
         return BytesIO(content)
     except RequestsException as err:
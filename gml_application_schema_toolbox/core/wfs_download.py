@@ -0,0 +1,650 @@
+#! python3  # noqa: E265
+
+"""
+    Download of WFS GetFeature responses by pages or by tiles, merged into a
+    single FeatureCollection.
+"""
+
+# ############################################################################
+# ########## Imports ###############
+# ##################################
+
+# Standard library
+import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Tuple, Union
+
+# 3rd party
+import requests
+from owslib.util import ServiceException
+
+# project
+import gml_application_schema_toolbox.extlibs.owslib_hacks  # noqa: F401
+from gml_application_schema_toolbox.core.xml_utils import no_prefix, prefix
+from gml_application_schema_toolbox.toolbelt import PlgLogger
+from gml_application_schema_toolbox.toolbelt.file_downloader import DownloadManifest
+
+# ############################################################################
+# ########## Globals ###############
+# ##################################
+
+# children of a FeatureCollection holding features
+MEMBER_TAGS = ("member", "featureMember", "featureMembers")
+# attributes of a FeatureCollection counting its features
+COUNT_ATTRIBUTES = ("numberReturned", "numberOfFeatures")
+# root elements of error responses (OWS and WFS 1.0)
+EXCEPTION_TAGS = ("ExceptionReport", "ServiceExceptionReport")
+# elements holding an error message
+EXCEPTION_TEXT_TAGS = ("ExceptionText", "ServiceException")
+
+# maximum number of splits of the extent, in each direction, for tiled downloads
+MAX_TILE_DEPTH = 8
+# capabilities constraints giving the maximum number of features of a response
+LIMIT_CONSTRAINTS = ("CountDefault", "DefaultMaxFeatures")
+
+CHUNK_SIZE = 64 * 1024
+# size of the first bytes read to find the root element of a response
+SNIFF_SIZE = 4 * 1024
+TIMEOUT = 120
+
+plg_logger = PlgLogger()
+
+# ############################################################################
+# ########## Functions #############
+# ##################################
+
+
+def _gml_id(elem: ET.Element) -> Union[str, None]:
+    for name, value in elem.attrib.items():
+        if no_prefix(name) == "id" and "opengis.net/gml" in prefix(name):
+            return value
+    return None
+
+
+def _iterparse(path: str, events: tuple = ("end",)):
+    # a response cut by the server is reported as a service error
+    try:
+        yield from ET.iterparse(path, events)
+    except ET.ParseError as e:
+        raise ServiceException(
+            "Invalid XML response {}: {}".format(os.path.basename(path), e)
+        )
+
+
+def _exception_text(path: str) -> str:
+    texts = []
+    for _, elem in _iterparse(path):
+        if no_prefix(elem.tag) in EXCEPTION_TEXT_TAGS and elem.text:
+            texts.append(elem.text.strip())
+    return "\n".join(texts) or "ows:Exception"
+
+
+def check_exception(path: str):
+    """Raise an exception if a response is an exception report.
+
+    Only the root element is parsed, from the first bytes of the response, so
+    that large responses are not read.
+
+    :param path: path of the response
+    :type path: str
+
+    :raises ServiceException: if the response is an exception report or is not XML
+    """
+    parser = ET.XMLPullParser(("start",))
+    root = None
+    with open(path, "rb") as f:
+        while root is None:
+            chunk = f.read(SNIFF_SIZE)
+            if not chunk:
+                raise ServiceException("Empty response")
+            try:
+                parser.feed(chunk)
+                for _, root in parser.read_events():
+                    break
+            except ET.ParseError as e:
+                raise ServiceException("Invalid XML response: {}".format(e))
+
+    if no_prefix(root.tag) in EXCEPTION_TAGS:
+        raise ServiceException(_exception_text(path))
+
+
+def fetch_page(url: str, path: str) -> str:
+    """Download a GetFeature response to a file, by chunks.
+
+    :param url: GetFeature request
+    :type url: str
+    :param path: path of the output file
+    :type path: str
+
+    :raises ServiceException: if the request fails, or if the server returns an \
+    error or an exception report
+
+    :return: output path
+    :rtype: str
+    """
+    try:
+        with requests.get(url, stream=True, timeout=TIMEOUT) as response:
+            if response.status_code >= 400:
+                raise ServiceException(
+                    "HTTP error {}: {}".format(response.status_code, response.text)
+                )
+            with open(path, "wb") as out:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    out.write(chunk)
+    except requests.RequestException as e:
+        raise ServiceException("Request failed: {}".format(e))
+
+    check_exception(path)
+    return path
+
+
+def page_summary(path: str) -> Tuple[int, Union[str, None], Union[int, None]]:
+    """Return the number of features of a GetFeature response, the gml:id of its
+    first feature and the number of features matching the request.
+
+    The count is read from the root element when the server gives it, features
+    are counted otherwise.
+
+    :param path: path of the response
+    :type path: str
+
+    :raises ServiceException: if the response is an exception report or is not \
+    valid XML
+
+    :return: (number of features, first gml:id, number of matching features or \
+    None if unknown)
+    :rtype: Tuple[int, Union[str, None], Union[int, None]]
+    """
+    count = None
+    counted = 0
+    matched = None
+    first_id = None
+    root = None
+    depth = 0
+    for event, elem in _iterparse(path, ("start", "end")):
+        if event == "start":
+            depth += 1
+            if depth == 1:
+                root = elem
+                if no_prefix(elem.tag) in EXCEPTION_TAGS:
+                    raise ServiceException(_exception_text(path))
+                for attribute in COUNT_ATTRIBUTES:
+                    if elem.get(attribute, "").isdigit():
+                        count = int(elem.get(attribute))
+                if elem.get("numberMatched", "").isdigit():
+                    matched = int(elem.get("numberMatched"))
+            elif depth == 3 and first_id is None:
+                first_id = _gml_id(elem)
+                if count is not None:
+                    break
+        else:
+            depth -= 1
+            if depth == 1:
+                if no_prefix(elem.tag) == "featureMembers":
+                    counted += len(elem)
+                elif no_prefix(elem.tag) in MEMBER_TAGS:
+                    counted += 1
+                root.clear()
+
+    return (count if count is not None else counted), first_id, matched
+
+
+def _write_member(
+    member: ET.Element, out, seen_ids: set, max_features: Union[int, None] = None
+) -> int:
+    if no_prefix(member.tag) == "featureMembers":
+        features = list(member)
+    else:
+        features = list(member)[:1]
+
+    written = 0
+    for feature in features:
+        gml_id = _gml_id(feature)
+        if (gml_id is not None and gml_id in seen_ids) or written == max_features:
+            member.remove(feature)
+            continue
+        seen_ids.add(gml_id)
+        written += 1
+
+    if written:
+        out.write(ET.tostring(member, encoding="utf-8"))
+    return written
+
+
+def _merge_page(
+    path: str, out, seen_ids: set, max_features: Union[int, None] = None
+) -> Tuple[Union[ET.Element, None], int]:
+    """Write the members of a GetFeature response, skipping already seen features.
+
+    :param path: path of the response
+    :type path: str
+    :param out: binary file the members are written to
+    :type out: file object
+    :param seen_ids: gml:id of the features already written, updated
+    :type seen_ids: set
+    :param max_features: maximum number of features to write, defaults to None
+    :type max_features: Union[int, None], optional
+
+    :raises ServiceException: if the response is not valid XML
+
+    :return: root element of the response, without children, and number of \
+    features written
+    :rtype: Tuple[Union[ET.Element, None], int]
+    """
+    root = None
+    collection = None
+    depth = 0
+    written = 0
+    for event, elem in _iterparse(path, ("start-ns", "start", "end")):
+        if event == "start-ns":
+            try:
+                ET.register_namespace(*elem)
+            except ValueError:
+                # reserved prefix
+                pass
+        elif event == "start":
+            depth += 1
+            if depth == 1:
+                root = elem
+                collection = ET.Element(elem.tag, dict(elem.attrib))
+        else:
+            depth -= 1
+            if depth == 1:
+                if no_prefix(elem.tag) in MEMBER_TAGS:
+                    remaining = None
+                    if max_features is not None:
+                        remaining = max_features - written
+                    written += _write_member(elem, out, seen_ids, remaining)
+                # features are written, free memory
+                root.clear()
+    return collection, written
+
+
+def merge_feature_collections(
+    page_paths: List[str], output_path: str, max_features: Union[int, None] = None
+) -> int:
+    """Merge GetFeature responses into a single FeatureCollection.
+
+    The root element of the first response is kept, with its feature count
+    updated. Members are copied from all the responses, skipping features
+    with an already seen gml:id. Other children of the root element, like
+    gml:boundedBy, are dropped.
+
+    :param page_paths: paths of the responses
+    :type page_paths: List[str]
+    :param output_path: path of the merged FeatureCollection
+    :type output_path: str
+    :param max_features: maximum number of features, defaults to None
+    :type max_features: Union[int, None], optional
+
+    :raises ServiceException: if a response is not valid XML
+
+    :return: number of features written
+    :rtype: int
+    """
+    seen_ids = set()
+    count = 0
+    collection = None
+    matched = set()
+
+    with tempfile.TemporaryFile(dir=os.path.dirname(output_path) or None) as body:
+        for path in page_paths:
+            remaining = None
+            if max_features is not None:
+                remaining = max_features - count
+            page_root, written = _merge_page(path, body, seen_ids, remaining)
+            count += written
+            if page_root is None:
+                continue
+            matched.add(page_root.get("numberMatched"))
+            if collection is None:
+                collection = page_root
+
+        if collection is None:
+            raise ServiceException("Empty response")
+        for attribute in COUNT_ATTRIBUTES:
+            if attribute in collection.attrib:
+                collection.set(attribute, str(count))
+        if len(matched) > 1:
+            # responses of different queries (tiles)
+            collection.set("numberMatched", "unknown")
+
+        # the root element is written around the members
+        collection.text = "\0"
+        start, end = ET.tostring(collection, encoding="unicode").split("\0")
+        body.seek(0)
+        with open(output_path, "wb") as out:
+            out.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+            out.write(start.encode("utf-8"))
+            while True:
+                chunk = body.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+            out.write(end.encode("utf-8"))
+
+    return count
+
+
+def download_features(wfs, params: dict, output_path: str):
+    """Download the features of a WFS server with a single GetFeature request.
+
+    The response is written to the output file by chunks. The output file is
+    removed if the server returns an error.
+
+    :param wfs: WFS service
+    :type wfs: WebFeatureService
+    :param params: GetFeature parameters (typename, bbox, maxfeatures, etc.)
+    :type params: dict
+    :param output_path: path of the output file
+    :type output_path: str
+
+    :raises ServiceException: if the server returns an error
+    """
+    url = wfs.getGETGetFeatureRequest(**params)
+    plg_logger.log(message=f"DEBUG Download features: {url}", log_level=4)
+    try:
+        fetch_page(url, output_path)
+    except ServiceException:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+
+
+def _page_count(
+    start: int,
+    page_size: int,
+    matched: Union[int, None],
+    max_features: Union[int, None],
+) -> int:
+    """Return the number of features to request in the page starting at start, 0
+    if there is nothing left to download."""
+    if matched is not None and start >= matched:
+        return 0
+    if max_features is not None:
+        return max(0, min(page_size, max_features - start))
+    return page_size
+
+
+def download_features_paged(
+    wfs,
+    params: dict,
+    output_path: str,
+    page_size: int,
+    workers: int,
+    max_features: Union[int, None] = None,
+) -> int:
+    """Download the features of a WFS 2.0 server by pages, using count and
+    startindex, and merge them into a single FeatureCollection.
+
+    The first page gives the number of features per page, which may be limited by
+    the server. Then up to workers pages are requested at the same time, until
+    numberMatched features (or a page that is not full, if the server does not
+    tell the number of matched features), or max_features features are
+    downloaded.
+
+    Downloaded pages are recorded in a manifest next to the output file, so that
+    an interrupted download of the same request only requests the missing pages.
+
+    :param wfs: WFS 2.0 service
+    :type wfs: WebFeatureService_2_0_0
+    :param params: GetFeature parameters (typename, bbox, etc.)
+    :type params: dict
+    :param output_path: path of the merged FeatureCollection
+    :type output_path: str
+    :param page_size: number of features per page
+    :type page_size: int
+    :param workers: number of concurrent requests
+    :type workers: int
+    :param max_features: maximum number of features, defaults to None
+    :type max_features: Union[int, None], optional
+
+    :raises ServiceException: if the server returns an error
+
+    :return: number of downloaded features
+    :rtype: int
+    """
+    # completed pages are kept until the merge, to resume an interrupted download
+    pages_dir = output_path + ".pages"
+    os.makedirs(pages_dir, exist_ok=True)
+    manifest = DownloadManifest(
+        output_path, wfs.getGETGetFeatureRequest(maxfeatures=page_size, **params)
+    )
+    # page start index -> [requested count, count, first gml:id, matched]
+    done_pages = dict(manifest.state.get("pages", {}))
+
+    def download_page(start: int, count: int) -> tuple:
+        path = os.path.join(pages_dir, "page_{}.xml".format(start))
+        done = done_pages.get(str(start))
+        if done is not None and done[0] == count and os.path.exists(path):
+            plg_logger.log(
+                message=f"DEBUG Page at {start} already downloaded", log_level=4
+            )
+            return (path,) + tuple(done)
+        url = wfs.getGETGetFeatureRequest(startindex=start, maxfeatures=count, **params)
+        plg_logger.log(message=f"DEBUG Download page at {start}: {url}", log_level=4)
+        return (fetch_page(url, path), count) + page_summary(path)
+
+    pages = []
+    first_id = None
+    matched = None
+    # features per page, known once the first page is downloaded: the server may
+    # return less features than requested
+    step = None
+    running = {}
+    next_start = 0
+    finished = False
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            # keep workers busy until the last page, once the first page gives
+            # the page size
+            while not finished and len(running) < workers and (step or not running):
+                count = _page_count(
+                    next_start, step or page_size, matched, max_features
+                )
+                if count == 0:
+                    break
+                running[next_start] = executor.submit(download_page, next_start, count)
+                next_start += count
+
+            if not running:
+                break
+
+            # pages are merged in order
+            start = min(running)
+            path, count, page_count, page_first_id, page_matched = running.pop(
+                start
+            ).result()
+            done_pages[str(start)] = [count, page_count, page_first_id, page_matched]
+            manifest.save(pages=done_pages)
+            if page_matched is not None:
+                matched = page_matched
+            if start > 0 and page_first_id is not None and page_first_id == first_id:
+                # the server ignores startindex
+                plg_logger.log(
+                    message="The server does not support paging", log_level=1
+                )
+                finished = True
+            else:
+                pages.append(path)
+                if start == 0:
+                    first_id = page_first_id
+                    # a partial first page may be a limit of the server
+                    step = page_count or count
+                    next_start = step
+                if page_count == 0:
+                    finished = True
+                elif matched is not None:
+                    finished = finished or start + page_count >= matched
+                elif start > 0:
+                    finished = finished or page_count < count
+
+            if finished:
+                # pages after the last one are empty
+                for future in running.values():
+                    future.cancel()
+                running.clear()
+
+    count = merge_feature_collections(pages, output_path)
+    shutil.rmtree(pages_dir)
+    manifest.remove()
+    return count
+
+
+def server_limit(wfs) -> Union[int, None]:
+    """Return the maximum number of features returned by a GetFeature request, as
+    given by the CountDefault (WFS 2.0) or DefaultMaxFeatures (WFS 1.1)
+    constraint of the capabilities.
+
+    :param wfs: WFS service
+    :type wfs: WebFeatureService
+
+    :return: maximum number of features, None if the server does not tell
+    :rtype: Union[int, None]
+    """
+    capabilities = getattr(wfs, "_capabilities", None)
+    if capabilities is None:
+        return None
+    limits = []
+    for elem in capabilities.iter():
+        if not isinstance(elem.tag, str) or no_prefix(elem.tag) != "Constraint":
+            continue
+        if elem.get("name") not in LIMIT_CONSTRAINTS:
+            continue
+        for value in elem.iter():
+            if isinstance(value.tag, str) and no_prefix(value.tag) in (
+                "Value",
+                "DefaultValue",
+            ):
+                try:
+                    limits.append(int(value.text))
+                except (TypeError, ValueError):
+                    pass
+    return min(limits) if limits else None
+
+
+def split_bbox(bbox: list) -> List[list]:
+    """Split a bbox in four tiles.
+
+    :param bbox: [xmin, ymin, xmax, ymax] followed by an optional CRS
+    :type bbox: list
+
+    :return: the four tiles, with the same CRS
+    :rtype: List[list]
+    """
+    xmin, ymin, xmax, ymax = bbox[:4]
+    x, y = (xmin + xmax) / 2, (ymin + ymax) / 2
+    return [
+        [xmin, ymin, x, y] + bbox[4:],
+        [x, ymin, xmax, y] + bbox[4:],
+        [xmin, y, x, ymax] + bbox[4:],
+        [x, y, xmax, ymax] + bbox[4:],
+    ]
+
+
+def download_features_tiled(
+    wfs,
+    params: dict,
+    output_path: str,
+    tile_size: int,
+    workers: int,
+    max_features: Union[int, None] = None,
+) -> int:
+    """Download the features of a bbox by tiles, and merge them into a single
+    FeatureCollection.
+
+    The bbox is split as a quadtree: a tile holding more than tile_size features,
+    or more than the server returns, is split in four tiles. The server limit is
+    read from the capabilities, or from numberMatched. When neither is known,
+    tiles limited by the server cannot be detected, a warning is shown. Up to
+    workers tiles are requested at the same time. Features crossing tiles are
+    written once.
+
+    :param wfs: WFS service
+    :type wfs: WebFeatureService
+    :param params: GetFeature parameters, with a bbox
+    :type params: dict
+    :param output_path: path of the merged FeatureCollection
+    :type output_path: str
+    :param tile_size: maximum number of features requested per tile
+    :type tile_size: int
+    :param workers: number of concurrent requests
+    :type workers: int
+    :param max_features: maximum number of features, defaults to None
+    :type max_features: Union[int, None], optional
+
+    :raises ServiceException: if the server returns an error
+
+    :return: number of downloaded features
+    :rtype: int
+    """
+    params = dict(params)
+    bbox = params.pop("bbox")
+    params.pop("maxfeatures", None)
+    limit = server_limit(wfs)
+    if limit:
+        tile_size = min(tile_size, limit)
+
+    with tempfile.TemporaryDirectory(
+        dir=os.path.dirname(output_path) or None
+    ) as tmp_dir:
+
+        def download_tile(key: str, tile: list) -> tuple:
+            url = wfs.getGETGetFeatureRequest(
+                bbox=tile, maxfeatures=tile_size, **params
+            )
+            plg_logger.log(message=f"DEBUG Download tile {key}: {url}", log_level=4)
+            path = fetch_page(url, os.path.join(tmp_dir, "tile_{}.xml".format(key)))
+            return path, page_summary(path)
+
+        # tiles are named after their position in the quadtree
+        tiles = {}
+        truncated = False
+        # tiles without numberMatched
+        unmatched = False
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            running = {executor.submit(download_tile, "0", bbox): ("0", bbox)}
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, tile = running.pop(future)
+                    path, (count, _, matched) = future.result()
+                    unmatched = unmatched or matched is None
+                    full = count >= tile_size or (
+                        matched is not None and matched > count
+                    )
+                    if not full:
+                        tiles[key] = path
+                    elif len(key) > MAX_TILE_DEPTH:
+                        tiles[key] = path
+                        truncated = True
+                    else:
+                        os.remove(path)
+                        for i, sub_tile in enumerate(split_bbox(tile)):
+                            sub_key = key + str(i)
+                            running[
+                                executor.submit(download_tile, sub_key, sub_tile)
+                            ] = (sub_key, sub_tile)
+
+        if truncated:
+            plg_logger.log(
+                message="Some tiles still hold too many features, "
+                "the download is incomplete",
+                log_level=1,
+                push=True,
+            )
+        elif unmatched and not limit:
+            plg_logger.log(
+                message="The server tells neither its maximum number of features "
+                "nor the number of matching features, the download may be "
+                "incomplete",
+                log_level=1,
+                push=True,
+            )
+
+        return merge_feature_collections(
+            [tiles[key] for key in sorted(tiles)], output_path, max_features
+        )
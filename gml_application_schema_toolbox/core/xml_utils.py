@@ -22,17 +22,21 @@
 # standard
 import io
 import logging
+import re
+import sys
+import xml.etree.ElementPath as ElementPath
 import xml.etree.ElementTree as ET
 
-# project
-from gml_application_schema_toolbox.toolbelt.log_handler import PlgLogger
+# no QGIS module is imported, this module is used by worker processes
 
 # ############################################################################
 # ########## Globals ###############
 # ##################################
 
 logger = logging.getLogger(__name__)
-plg_logger = PlgLogger()
+
+# an unprefixed element name in an XPath expression
+_XPATH_NAME_RE = re.compile(r"^[A-Za-z_][\w.\-]*$")
 
 # ############################################################################
 # ########## Functions #############
@@ -79,6 +83,35 @@ def remove_prefix(node):
         remove_prefix(child)
 
 
+def ns_agnostic_xpath(xpath):
+    """Rewrite an XPath expression so that its unprefixed element names match
+    whatever their namespace is ('a/b/text()' becomes '{*}a/{*}b/text()').
+
+    The rewritten expression gives on the original tree the same results as the
+    original expression on a tree processed by remove_prefix.
+
+    :param xpath: the XPath expression
+    :returns: the rewritten expression, or None if it cannot be rewritten \
+        (attribute predicates, or no wildcard support in ElementTree)
+    """
+    if sys.version_info < (3, 8):
+        return None
+    tokens = [
+        (m.group(0), m.group(1), m.group(2))
+        for m in ElementPath.xpath_tokenizer_re.finditer(xpath)
+    ]
+    rewritten = []
+    for i, (text, op, tag) in enumerate(tokens):
+        if op == "@":
+            # attribute names would still be prefixed
+            return None
+        next_op = tokens[i + 1][1] if i + 1 < len(tokens) else None
+        if tag and _XPATH_NAME_RE.match(tag) and next_op != "()":
+            text = "{*}" + tag
+        rewritten.append(text)
+    return "".join(rewritten)
+
+
 def resolve_xpath(node, xpath, ns_map=None):
     get_text = xpath.endswith("/text()")
     if get_text:
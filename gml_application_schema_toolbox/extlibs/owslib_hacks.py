@@ -3,10 +3,18 @@ try:
 except ImportError:
     from urllib.parse import urlencode
 
+from owslib.feature.wfs100 import WebFeatureService_1_0_0
 from owslib.feature.wfs200 import WebFeatureService_2_0_0
 
 
-def getGETGetFeatureRequest_2_0_0(
+def _bbox_kvp(wfs, bbox, typename) -> str:
+    if hasattr(wfs, "getBBOXKVP"):
+        return wfs.getBBOXKVP(bbox, typename)
+    # WFS 1.0.0: no CRS in the bbox
+    return ",".join(str(c) for c in bbox[:4])
+
+
+def getGETGetFeatureRequest(
     self,
     typename=None,
     filter=None,
@@ -39,7 +47,7 @@ def getGETGetFeatureRequest_2_0_0(
     if featureid:
         request["featureid"] = ",".join(featureid)
     elif bbox:
-        request["bbox"] = self.getBBOXKVP(bbox, typename)
+        request["bbox"] = _bbox_kvp(self, bbox, typename)
     elif filter:
         request["query"] = str(filter)
     if typename:
@@ -73,4 +81,6 @@ def getGETGetFeatureRequest_2_0_0(
     return base_url + data
 
 
-WebFeatureService_2_0_0.getGETGetFeatureRequest = getGETGetFeatureRequest_2_0_0
+# OWSLib only builds GetFeature URLs of WFS 1.1.0 services, without startindex
+WebFeatureService_1_0_0.getGETGetFeatureRequest = getGETGetFeatureRequest
+WebFeatureService_2_0_0.getGETGetFeatureRequest = getGETGetFeatureRequest
@@ -3,8 +3,10 @@
 """Database connection picker."""
 
 # standard library
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Union
+from typing import Dict, List, Set, Tuple, Union
 
 # PyQGIS
 from qgis.core import (
@@ -28,6 +30,27 @@ from gml_application_schema_toolbox.toolbelt import PlgLogger
 
 WIDGET, BASE = uic.loadUiType(DIR_PLUGIN_ROOT / "ui/{}.ui".format(Path(__file__).stem))
 
+# number of connections validating constraints in parallel
+VALIDATE_WORKERS = 4
+
+# ############################################################################
+# ########## Functions #############
+# ##################################
+
+
+@lru_cache(maxsize=None)
+def sql_template(name: str) -> str:
+    """Return the content of a SQL template of the plugin, read once.
+
+    :param name: template name, without the .sql extension
+    :type name: str
+    :return: SQL template, to be formatted
+    :rtype: str
+    """
+    with open(DIR_PLUGIN_ROOT / "sql/{}.sql".format(name), "r") as f:
+        return f.read()
+
+
 # ############################################################################
 # ########## Classes ###############
 # ##################################
@@ -69,6 +92,218 @@ class ForeignKey:
         )
 
 
+class ConstraintManager:
+    """Add or drop the constraints of many foreign keys at once.
+
+    Existing constraints of the schema are read with a single query, then the
+    missing statements are run in a single transaction.
+    """
+
+    def __init__(
+        self, conn: QgsAbstractDatabaseProviderConnection, schema: str
+    ) -> None:
+        """Constraint manager initialization
+
+        :param conn: database connection
+        :type conn: QgsAbstractDatabaseProviderConnection
+        :param schema: schema name
+        :type schema: str
+        """
+        self.log = PlgLogger().log
+        self.conn = conn
+        self.schema = schema
+        self.existing = self._existing_constraints()
+
+    @staticmethod
+    def unique_constraint_name(table: str, column: str) -> str:
+        """Returns the name of the unique constraint of a referenced column.
+
+        :param table: table name
+        :type table: str
+        :param column: column name
+        :type column: str
+        :return: constraint name
+        :rtype: str
+        """
+        return "{table}_{column}_unique".format(table=table, column=column)
+
+    def _existing_constraints(self) -> Set[Tuple[str, str]]:
+        """Return (table, constraint) of the constraints of the schema."""
+        sql = sql_template("schema_constraints").format(schema=self.schema)
+        self.log(message=f"{sql}", log_level=4)
+        try:
+            results = self.conn.executeSql(sql)
+        except QgsProviderConnectionException as err:
+            self.log(message=err, log_level=2, push=True)
+            results = []
+        return {(table, constraint) for table, constraint in results}
+
+    def _execute(self, statements: List[str]) -> None:
+        """Run statements in a single transaction.
+
+        If the transaction fails, statements are run one by one, so that a
+        failing statement does not prevent the others.
+
+        :param statements: SQL statements
+        :type statements: List[str]
+        """
+        if not statements:
+            return
+
+        # statements sent at once run in a single transaction
+        sql = "\n".join(statements)
+        self.log(message=f"{sql}", log_level=4)
+        try:
+            self.conn.executeSql(sql)
+            return
+        except QgsProviderConnectionException as err:
+            self.log(
+                message=f"Transaction failed, running statements one by one: {err}",
+                log_level=1,
+            )
+
+        for statement in statements:
+            try:
+                self.conn.executeSql(statement)
+            except QgsProviderConnectionException as err:
+                self.log(message=err, log_level=2, push=True)
+
+    def add_constraints(
+        self,
+        foreign_keys: List[ForeignKey],
+        not_valid: bool = False,
+        workers: int = VALIDATE_WORKERS,
+    ) -> None:
+        """Add the missing unique and foreign key constraints.
+
+        :param foreign_keys: foreign keys
+        :type foreign_keys: List[ForeignKey]
+        :param not_valid: add foreign keys without checking existing rows, then \
+        validate them in parallel, defaults to False
+        :type not_valid: bool, optional
+        :param workers: number of connections validating constraints, \
+        defaults to VALIDATE_WORKERS
+        :type workers: int, optional
+        """
+        statements = []
+        # constraints to validate, by table
+        validations = {}
+        for foreign_key in foreign_keys:
+            self.log(message=f"{foreign_key}", log_level=4)
+            unique = self.unique_constraint_name(
+                foreign_key.referenced_table, foreign_key.referenced_column
+            )
+            if (foreign_key.referenced_table, unique) not in self.existing:
+                self.existing.add((foreign_key.referenced_table, unique))
+                statements.append(
+                    sql_template("add_unique_constraint").format(
+                        schema=self.schema,
+                        table=foreign_key.referenced_table,
+                        constraint=unique,
+                        column=foreign_key.referenced_column,
+                    )
+                )
+
+            if (foreign_key.table, foreign_key.name) not in self.existing:
+                self.existing.add((foreign_key.table, foreign_key.name))
+                statements.append(
+                    sql_template("add_foreign_key_constraint").format(
+                        schema=self.schema,
+                        foreign_key=foreign_key,
+                        not_valid=" NOT VALID" if not_valid else "",
+                    )
+                )
+                if not_valid:
+                    validations.setdefault(foreign_key.table, []).append(
+                        foreign_key.name
+                    )
+
+        self.log(
+            message=f"DEBUG Add {len(statements)} constraints to {self.schema}",
+            log_level=4,
+        )
+        self._execute(statements)
+        if validations:
+            self._validate(validations, workers)
+
+    def _validate(self, validations: Dict[str, List[str]], workers: int) -> None:
+        """Validate constraints added NOT VALID.
+
+        Validating locks the table, so constraints of a table are validated one
+        after the other, tables in parallel, each with its own connection.
+
+        :param validations: constraint names, by table name
+        :type validations: Dict[str, List[str]]
+        :param workers: number of connections validating constraints
+        :type workers: int
+        """
+        uri = self.conn.uri()
+        metadata = QgsProviderRegistry.instance().providerMetadata(
+            self.conn.providerKey()
+        )
+
+        def validate_table(table: str, constraints: List[str]) -> None:
+            conn = metadata.createConnection(uri, {})
+            for constraint in constraints:
+                conn.executeSql(
+                    sql_template("validate_constraint").format(
+                        schema=self.schema, table=table, constraint=constraint
+                    )
+                )
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(validate_table, table, constraints): table
+                for table, constraints in validations.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except QgsProviderConnectionException as err:
+                    self.log(
+                        message=f"Validation of {futures[future]} constraints "
+                        f"failed: {err}",
+                        log_level=2,
+                        push=True,
+                    )
+
+    def drop_constraints(self, foreign_keys: List[ForeignKey]) -> None:
+        """Drop the existing foreign key constraints, then the unique constraints
+        they rely on.
+
+        :param foreign_keys: foreign keys
+        :type foreign_keys: List[ForeignKey]
+        """
+        constraints = [
+            (foreign_key.table, foreign_key.name) for foreign_key in foreign_keys
+        ] + [
+            (
+                foreign_key.referenced_table,
+                self.unique_constraint_name(
+                    foreign_key.referenced_table, foreign_key.referenced_column
+                ),
+            )
+            for foreign_key in foreign_keys
+        ]
+
+        statements = []
+        for table, constraint in constraints:
+            if (table, constraint) not in self.existing:
+                continue
+            self.existing.discard((table, constraint))
+            statements.append(
+                sql_template("drop_constraint").format(
+                    schema=self.schema, table=table, constraint=constraint
+                )
+            )
+
+        self.log(
+            message=f"DEBUG Drop {len(statements)} constraints in {self.schema}",
+            log_level=4,
+        )
+        self._execute(statements)
+
+
 class DatabaseWidget(BASE, WIDGET):
     """Form allowing the end-user picks the database connection to use.
 
@@ -118,14 +353,13 @@ class DatabaseWidget(BASE, WIDGET):
     def btn_add_foreign_key_constraints(self) -> None:
         """Add constraints to the selected schema."""
         try:
-            for foreign_key in self.get_foreign_keys:
-                self.log(message=f"{foreign_key}", log_level=4)
-                self._add_unique_constraint(
-                    self.selected_schema,
-                    foreign_key.referenced_table,
-                    foreign_key.referenced_column,
-                )
-                self._add_foreign_key_constraint(self.selected_schema, foreign_key)
+            manager = ConstraintManager(
+                self.get_database_connection, self.selected_schema
+            )
+            manager.add_constraints(
+                self.get_foreign_keys,
+                not_valid=self.chk_foreign_keys_not_valid.isChecked(),
+            )
         except Exception as err:
             self.log(message=err, log_level=2, push=True)
             raise
@@ -133,140 +367,14 @@ class DatabaseWidget(BASE, WIDGET):
     def btn_drop_foreign_key_constraints(self) -> None:
         """Delete constraints in the selected schema."""
         try:
-            for foreign_key in self.get_foreign_keys:
-                self._drop_constraint(
-                    self.selected_schema,
-                    table=foreign_key.table,
-                    constraint=foreign_key.name,
-                )
-                self._drop_constraint(
-                    self.selected_schema,
-                    table=foreign_key.referenced_table,
-                    constraint=(
-                        "{table}_{column}_unique".format(
-                            table=foreign_key.referenced_table,
-                            column=foreign_key.referenced_column,
-                        )
-                    ),
-                )
+            manager = ConstraintManager(
+                self.get_database_connection, self.selected_schema
+            )
+            manager.drop_constraints(self.get_foreign_keys)
         except Exception as err:
             self.log(message=err, log_level=2, push=True)
             raise
 
-    def _add_foreign_key_constraint(self, schema: str, foreign_key: ForeignKey) -> None:
-        """Add a foreign key constraint to a table.
-
-        :param schema: schema name
-        :type schema: str
-        :param foreign_key: foreign key
-        :type foreign_key: ForeignKey
-        """
-        if self._constraint_exists(
-            schema=schema, table=foreign_key.table, constraint=foreign_key.name
-        ):
-            return
-
-        conn = self.get_database_connection
-        with open(DIR_PLUGIN_ROOT / "sql/add_foreign_key_constraint.sql", "r") as f:
-            sql = f.read().format(schema=schema, foreign_key=foreign_key)
-
-        self.log(
-            message=f"DEBUG Add foreign key constraint to {foreign_key.table}",
-            log_level=4,
-        )
-        self.log(message=f"{sql}", log_level=4)
-        try:
-            conn.executeSql(sql)
-        except QgsProviderConnectionException as err:
-            self.log(message=err, log_level=2, push=True)
-
-    def _add_unique_constraint(self, schema: str, table: str, column: str) -> None:
-        """Add a unique constraint to a table.
-
-        :param schema: schema name
-        :type schema: str
-        :param table: table name
-        :type table: str
-        :param column: column name
-        :type column: str
-        """
-        constraint = "{table}_{column}_unique".format(table=table, column=column)
-
-        if self._constraint_exists(schema=schema, table=table, constraint=constraint):
-            return
-
-        conn = self.get_database_connection
-        with open(DIR_PLUGIN_ROOT / "sql/add_unique_constraint.sql", "r") as f:
-            sql = f.read().format(
-                schema=schema, table=table, constraint=constraint, column=column
-            )
-
-        self.log(
-            message=f"DEBUG Add unique constraint to {table} ({column})",
-            log_level=4,
-        )
-        self.log(message=f"{sql}", log_level=4)
-        try:
-            conn.executeSql(sql)
-        except QgsProviderConnectionException as err:
-            self.log(message=err, log_level=2, push=True)
-
-    def _constraint_exists(self, schema: str, table: str, constraint: str) -> bool:
-        """Check if constraint already exists in a table.
-
-        :param schema: [description]
-        :type schema: str
-        :param table: [description]
-        :type table: str
-        :param constraint: [description]
-        :type constraint: str
-        :return: [description]
-        :rtype: bool
-        """
-        conn = self.get_database_connection
-
-        with open(DIR_PLUGIN_ROOT / "sql/constraint_exists.sql", "r") as f:
-            sql = f.read().format(schema=schema, table=table, constraint=constraint)
-
-        self.log(
-            message=f"DEBUG Check if constraint already exists in {table} ({constraint})",
-            log_level=4,
-        )
-        self.log(message=f"{sql}", log_level=4)
-        try:
-            result = conn.executeSql(sql)
-        except QgsProviderConnectionException as err:
-            self.log(message=err, log_level=2, push=True)
-        self.log(message=f"DEBUG {result}", log_level=4)
-        return result[0][0] == 1
-
-    def _drop_constraint(self, schema: str, table: str, constraint: str) -> None:
-        """Drop constraint in a table.
-
-        :param schema: schema name
-        :type schema: str
-        :param table: table name
-        :type table: str
-        :param constraint: constraint name
-        :type constraint: str
-        """
-        if not self._constraint_exists(schema, table, constraint):
-            return
-
-        conn = self.get_database_connection
-        with open(DIR_PLUGIN_ROOT / "sql/drop_constraint.sql", "r") as f:
-            sql = f.read().format(schema=schema, table=table, constraint=constraint)
-
-        self.log(
-            message=f"DEBUG Drop constraint in {table} ({constraint})",
-            log_level=4,
-        )
-        self.log(message=f"{sql}", log_level=4)
-        try:
-            conn.executeSql(sql)
-        except QgsProviderConnectionException as err:
-            self.log(message=err, log_level=2, push=True)
-
     def populate_connections_combobox(self) -> None:
         """List existing database connections into the combobox."""
         # clear and add a placeholder to avoid select item before user does by himself
@@ -404,8 +512,9 @@ class DatabaseWidget(BASE, WIDGET):
         )
         conn = self.get_database_connection
         # one to many
-        with open(DIR_PLUGIN_ROOT / "sql/foreign_key_one_to_many.sql", "r") as f:
-            sql = f.read().format(schema=self.selected_schema)
+        sql = sql_template("foreign_key_one_to_many").format(
+            schema=self.selected_schema
+        )
 
         self.log(message=f"{sql}", log_level=4)
         try:
@@ -423,8 +532,9 @@ class DatabaseWidget(BASE, WIDGET):
             )
 
         # many to many
-        with open(DIR_PLUGIN_ROOT / "sql/foreign_key_many_to_many.sql", "r") as f:
-            sql = f.read().format(schema=self.selected_schema)
+        sql = sql_template("foreign_key_many_to_many").format(
+            schema=self.selected_schema
+        )
 
         self.log(message=f"DEBUG {sql}", log_level=4)
         try:
@@ -26,12 +26,11 @@ import processing
 
 # 3rd party
 from osgeo import gdal
-from qgis.core import Qgis, QgsApplication, QgsProcessingFeedback
-from qgis.PyQt.QtCore import QEventLoop, Qt, pyqtSlot
-from qgis.PyQt.QtWidgets import QFileDialog, QProgressDialog
+from qgis.core import Qgis, QgsFeedback, QgsProcessingFeedback
+from qgis.PyQt.QtCore import pyqtSlot
+from qgis.PyQt.QtWidgets import QFileDialog
 
 # project package
-from gml_application_schema_toolbox.__about__ import __title__
 from gml_application_schema_toolbox.core.proxy import qgis_proxy_settings
 from gml_application_schema_toolbox.toolbelt.log_handler import PlgLogger
 
@@ -56,46 +55,45 @@ class GmlasPanelMixin:
         if filepath:
             self.gmlasConfigLineEdit.setText(filepath)
 
-    def translate(self, params):
+    def translate(self, params, feedback: QgsFeedback = None):
+        """Convert with gdal.VectorTranslate. Meant to be run in a background task.
+
+        :param params: Parameters for gdal.VectorTranslate
+        :type params: dict
+        :param feedback: receives the progress and cancels the conversion
+        :type feedback: QgsFeedback, optional
+        """
         if params is None:
             return
-        params["callback"] = self.translate_callback
+        if feedback is not None:
+            params["callback"] = self.translate_callback
+            params["callback_data"] = feedback
 
-        dlg = QProgressDialog(self)
-        dlg.setWindowTitle(__title__)
-        dlg.setLabelText("Operation in progress")
-        dlg.setMinimum(0)
-        dlg.setMaximum(100)
-        dlg.setWindowModality(Qt.WindowModal)
-        self.progress_dlg = dlg
-
-        self.setCursor(Qt.WaitCursor)
+        self.plg_logger.log("gdal.VectorTranslate({})".format(str(params)))
+        gdal.PushErrorHandler(self.plg_logger.gdal_error_handler)
         try:
-            self.plg_logger.log("gdal.VectorTranslate({})".format(str(params)))
-            gdal.PushErrorHandler(self.plg_logger.gdal_error_handler)
             with qgis_proxy_settings():
                 res = gdal.VectorTranslate(**params)
-            gdal.PopErrorHandler()
-            self.plg_logger.log(str(res))
         finally:
-            self.unsetCursor()
-            self.progress_dlg.reset()
-            self.progress_dlg = None
+            gdal.PopErrorHandler()
+        self.plg_logger.log(str(res))
 
-    def translate_callback(self, pct, msg, user_data):
-        self.progress_dlg.setValue(int(100 * pct))
-        QgsApplication.processEvents(QEventLoop.ExcludeUserInputEvents)
-        if self.progress_dlg.wasCanceled():
+    @staticmethod
+    def translate_callback(pct, msg, feedback):
+        feedback.setProgress(100 * pct)
+        if feedback.isCanceled():
             return 0
         return 1
 
-    def translate_processing(self, params):
+    def translate_processing(self, params, feedback: QgsProcessingFeedback = None):
         """Use GDAL processing to convert GMLAS to database and vice versa.
 
         :param params: Parameters for GDAL processing
         :type params: dict
+        :param feedback: receives the progress and cancels the conversion
+        :type feedback: QgsProcessingFeedback, optional
         """
-        feedback = QgsProcessingFeedback()
+        feedback = QgsProcessingFeedback() if feedback is None else feedback
         if Qgis.versionInt() < 32400:
             self.log(
                 message=f"gmlas:convertformat_gmlas with params = {params}", log_level=4
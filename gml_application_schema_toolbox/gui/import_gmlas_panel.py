@@ -26,17 +26,16 @@ from io import BytesIO
 
 from osgeo import gdal, osr
 from owslib.etree import etree
-from qgis.core import QgsMessageLog
 from qgis.PyQt import uic
 from qgis.PyQt.QtCore import Qt, pyqtSlot
-from qgis.PyQt.QtWidgets import QApplication, QListWidgetItem, QMessageBox
+from qgis.PyQt.QtWidgets import QListWidgetItem, QMessageBox
 from qgis.utils import iface
 
 from gml_application_schema_toolbox.__about__ import __title__
-from gml_application_schema_toolbox.core.load_gmlas_in_qgis import import_in_qgis
 from gml_application_schema_toolbox.core.proxy import qgis_proxy_settings
 from gml_application_schema_toolbox.gui import InputError
 from gml_application_schema_toolbox.gui.gmlas_panel_mixin import GmlasPanelMixin
+from gml_application_schema_toolbox.gui.load_tasks import ImportGmlasTask, start_task
 from gml_application_schema_toolbox.toolbelt import PlgLogger, PlgOptionsManager
 
 WIDGET, BASE = uic.loadUiType(
@@ -350,14 +349,28 @@ class ImportGmlasPanel(BASE, WIDGET, GmlasPanelMixin):
         #     assert srs.Validate() == 0
         #     params["spatSRS"] = srs
 
-    def do_load(self, append_to_db: str = None, append_to_schema: str = None):
+    def do_load(
+        self,
+        append_to_db: str = None,
+        append_to_schema: str = None,
+        on_finished=None,
+    ) -> ImportGmlasTask:
         """Load selected GMLAS into a database. If no database is selected \
         (placeholder), a temporary SQLite database is created.
 
+        The conversion runs in a background task, layers are added to the project \
+        once it is finished.
+
         :param append_to_db: [description], defaults to None
         :type append_to_db: str, optional
         :param append_to_schema: [description], defaults to None
         :type append_to_schema: str, optional
+        :param on_finished: function called with the task once layers are loaded, \
+            defaults to None
+        :type on_finished: callable, optional
+
+        :return: the started task
+        :rtype: ImportGmlasTask
         """
         gdal.SetConfigOption("OGR_SQLITE_SYNCHRONOUS", "OFF")
         gdal.SetConfigOption("GDAL_HTTP_UNSAFESSL", "YES")
@@ -365,12 +378,6 @@ class ImportGmlasPanel(BASE, WIDGET, GmlasPanelMixin):
             "GDAL_HTTP_USERAGENT", self.plg_settings.network_http_user_agent
         )
 
-        def error_handler(err, err_no, msg):
-            if err >= gdal.CE_Warning:
-                QgsMessageLog.logMessage(
-                    "{} {}: {}".format(err, err_no, msg), __title__
-                )
-
         schema = None
         if self.databaseWidget.get_database_connection is None:
             db_format = None
@@ -392,27 +399,29 @@ class ImportGmlasPanel(BASE, WIDGET, GmlasPanelMixin):
                 provider = "SQLite"
                 self.plg_logger.log(f"Temp SQLite: {dest_db_name}", log_level=4)
 
-        params = self.import_params(dest_db_name, provider)
-
-        # TODO Handle append_to_db, accessMode, append_to_schema
-
         try:
-            QApplication.setOverrideCursor(Qt.WaitCursor)
-            gdal.PushErrorHandler(error_handler)
-            self.translate_processing(params)
-            self.plg_logger.log("Dataset translated", log_level=3)
-            if append_to_db is None:
-                import_in_qgis(
-                    gmlas_uri=dest_db_name,
-                    provider=provider,
-                    add_form_code=self.addCodeToForm.isChecked(),
-                    schema=schema,
-                )
-
+            params = self.import_params(dest_db_name, provider)
         except InputError as e:
             e.show()
-        except RuntimeError as e:
-            QMessageBox.warning(None, __title__, e.args[0])
-        finally:
-            QApplication.restoreOverrideCursor()
-            gdal.PopErrorHandler()
+            return None
+
+        # TODO Handle append_to_db, accessMode, append_to_schema
+        import_args = None
+        if append_to_db is None:
+            import_args = dict(
+                gmlas_uri=dest_db_name,
+                provider=provider,
+                add_form_code=self.addCodeToForm.isChecked(),
+                lazy=self.lazyLoadCheckbox.isChecked(),
+                schema=schema,
+                use_cache=PlgOptionsManager().get_plg_settings().impex_skeleton_cache,
+            )
+
+        return start_task(
+            ImportGmlasTask(
+                self.translate_processing,
+                params,
+                import_args=import_args,
+                on_finished=on_finished,
+            )
+        )
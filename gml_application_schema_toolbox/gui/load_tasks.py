@@ -0,0 +1,195 @@
+#! python3  # noqa: E265
+
+"""
+    Background tasks loading GML documents, so that the QGIS interface stays
+    usable during long imports.
+"""
+
+# ############################################################################
+# ########## Imports ###############
+# ##################################
+
+from osgeo import gdal
+from qgis.core import QgsApplication, QgsMessageLog, QgsProcessingFeedback, QgsTask
+from qgis.PyQt.QtWidgets import QMessageBox
+
+from gml_application_schema_toolbox.__about__ import __title__
+from gml_application_schema_toolbox.core.gmlas_xpath import datasource_pool
+from gml_application_schema_toolbox.core.load_gml_as_xml import load_as_xml_layer
+from gml_application_schema_toolbox.core.load_gmlas_in_qgis import import_in_qgis
+from gml_application_schema_toolbox.gui import InputError
+from gml_application_schema_toolbox.toolbelt.log_handler import PlgLogger
+
+# ############################################################################
+# ########## Globals ###############
+# ##################################
+
+# tasks must stay referenced while they are running,
+# otherwise Python garbage collects them
+_running_tasks = set()
+
+
+# ############################################################################
+# ########## Functions #############
+# ##################################
+
+
+def start_task(task: QgsTask) -> QgsTask:
+    """Add a task to the QGIS task manager and keep it alive until it ends.
+
+    :param task: task to run
+    :type task: QgsTask
+
+    :return: the started task
+    :rtype: QgsTask
+    """
+    _running_tasks.add(task)
+    task.taskCompleted.connect(lambda: _running_tasks.discard(task))
+    task.taskTerminated.connect(lambda: _running_tasks.discard(task))
+    QgsApplication.taskManager().addTask(task)
+    return task
+
+
+def _gdal_error_handler(err, err_no, msg):
+    if err >= gdal.CE_Warning:
+        QgsMessageLog.logMessage("{} {}: {}".format(err, err_no, msg), __title__)
+
+
+# ############################################################################
+# ########## Classes ###############
+# ##################################
+
+
+class GmlLoadTask(QgsTask):
+    """Base class of loading tasks.
+
+    load() runs in a background thread and reports its progress through
+    self.feedback, which is also canceled with the task. add_to_project() then
+    runs in the main thread, once load() succeeded.
+    """
+
+    def __init__(self, description: str, on_finished=None):
+        """
+        :param description: task description, displayed in the task manager
+        :param on_finished: optional function called with the task, in the main \
+            thread, once the task succeeded
+        """
+        super().__init__(description, QgsTask.CanCancel)
+        self.log = PlgLogger().log
+        # a processing feedback, so that it can be given to processing algorithms
+        self.feedback = QgsProcessingFeedback()
+        self.feedback.progressChanged.connect(self.setProgress)
+        self.on_finished = on_finished
+        self.exception = None
+
+    def load(self):
+        raise RuntimeError("No default implementation, use a derived class")
+
+    def add_to_project(self):
+        pass
+
+    def cancel(self):
+        self.feedback.cancel()
+        super().cancel()
+
+    def run(self) -> bool:
+        try:
+            self.load()
+        except Exception as e:
+            self.exception = e
+            return False
+        return not self.isCanceled()
+
+    def finished(self, result: bool):
+        if result:
+            try:
+                self.add_to_project()
+                if self.on_finished is not None:
+                    self.on_finished(self)
+            except Exception as e:
+                self.exception = e
+
+        if isinstance(self.exception, InputError):
+            self.exception.show()
+        elif self.exception is not None:
+            self.log(
+                message="{} failed: {}".format(self.description(), self.exception),
+                log_level=2,
+            )
+            QMessageBox.warning(None, __title__, str(self.exception))
+        elif self.isCanceled():
+            self.log(message="{} canceled".format(self.description()), log_level=1)
+
+
+class LoadXmlTask(GmlLoadTask):
+    """Load a GML document as "GML as XML" layers.
+
+    The loaded layers are available in self.layers once the task is finished.
+    """
+
+    def __init__(self, gml_path: str, load_options: dict, on_finished=None):
+        """
+        :param gml_path: path or URL of the GML document
+        :param load_options: keyword arguments of load_as_xml_layer
+        :param on_finished: optional function called with the task, once the task \
+            succeeded. It is responsible for adding self.layers to the project
+        """
+        super().__init__("Load {} as XML".format(gml_path), on_finished)
+        self.gml_path = gml_path
+        self.load_options = load_options
+        self.layers = {}
+
+    def load(self):
+        self.layers = load_as_xml_layer(
+            self.gml_path,
+            is_remote=self.gml_path.startswith("http://")
+            or self.gml_path.startswith("https://"),
+            feedback=self.feedback,
+            **self.load_options,
+        )
+        # layers are created in this thread, but used by the main thread
+        main_thread = QgsApplication.instance().thread()
+        for layer in self.layers.values():
+            layer.moveToThread(main_thread)
+
+
+class ImportGmlasTask(GmlLoadTask):
+    """Convert a GML document to a database with the GMLAS driver, then load the
+    database layers in the project.
+
+    The GmlasImport of the loaded layers is available in self.gmlas_import once
+    the task is finished.
+    """
+
+    def __init__(
+        self, translate, params: dict, import_args: dict = None, on_finished=None
+    ):
+        """
+        :param translate: function running the conversion, called with the \
+            parameters and a QgsProcessingFeedback
+        :param params: conversion parameters
+        :param import_args: keyword arguments of import_in_qgis, None to only \
+            convert the document
+        :param on_finished: optional function called with the task, once the task \
+            succeeded
+        """
+        super().__init__("Import GMLAS", on_finished)
+        self.translate = translate
+        self.params = params
+        self.import_args = import_args
+        self.gmlas_import = None
+
+    def load(self):
+        # error handlers are local to the thread
+        gdal.PushErrorHandler(_gdal_error_handler)
+        try:
+            self.translate(self.params, self.feedback)
+        finally:
+            gdal.PopErrorHandler()
+        self.log(message="Dataset translated", log_level=3)
+
+    def add_to_project(self):
+        # the database may have been replaced, forget what was read from it
+        datasource_pool.clear()
+        if self.import_args is not None:
+            self.gmlas_import = import_in_qgis(**self.import_args)
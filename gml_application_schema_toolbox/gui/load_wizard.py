@@ -11,7 +11,13 @@ from tempfile import NamedTemporaryFile
 # PyQGIS
 from qgis.PyQt import uic
 from qgis.PyQt.QtCore import pyqtSlot
-from qgis.PyQt.QtWidgets import QFileDialog, QVBoxLayout, QWizard, QWizardPage
+from qgis.PyQt.QtWidgets import (
+    QFileDialog,
+    QMessageBox,
+    QVBoxLayout,
+    QWizard,
+    QWizardPage,
+)
 
 # project
 from gml_application_schema_toolbox.gui.import_gmlas_panel import ImportGmlasPanel
@@ -99,21 +105,33 @@ class LoadWizardDataSource(QWizardPage, PAGE_1_W):
                 message=f"GMLAS configuration file selected: {filepath}", log_level=4
             )
 
-    def download(self, output_path: str):
+    def download(self, output_path: str) -> bool:
         """Download (if gmlPath is a HTTP URL) or copy a local file to tha output path.
 
         :param output_path: output filepath
         :type output_path: str
+
+        :return: False if the download failed
+        :rtype: bool
         """
         input_path = self.gmlPathLineEdit.text()
         if input_path.startswith("http://") or input_path.startswith("https://"):
             # URL
-            get_from_http(uri=input_path, output_path=output_path)
+            if get_from_http(uri=input_path, output_path=output_path) is None:
+                QMessageBox.warning(
+                    self,
+                    self.windowTitle(),
+                    "Cannot download {}, see the log panel for details".format(
+                        input_path
+                    ),
+                )
+                return False
         else:
             # copy file
             with open(input_path, "rb") as inp:
                 with open(output_path, "wb") as out:
                     out.write(inp.read())
+        return True
 
 
 class LoadWizardLoading(QWizardPage, PAGE_2_W):
@@ -236,10 +254,14 @@ class LoadWizard(QWizard):
         if self._gml_path is None:
             if self._data_source_page.nextId() == PAGE_ID_WFS:
                 with WaitCursor():
-                    # if WFS features, download them first
-                    with NamedTemporaryFile(suffix=".gml") as out:
-                        gml_path = out.name
-                    self._wfs_page.download(gml_path)
+                    # if WFS features, download them first, to a file named after
+                    # the request: a retry resumes an interrupted download
+                    request = self._wfs_page.feature_request()
+                    if request is None:
+                        return ""
+                    gml_path = self._wfs_page.download_path(request)
+                    if not self._wfs_page.download(gml_path, request):
+                        return gml_path
 
                 self._gml_path = gml_path
             elif self._data_source_page.nextId() == PAGE_ID_LOADING:
@@ -248,8 +270,10 @@ class LoadWizard(QWizard):
 
     def download_to(self, output_path):
         if self._data_source_page.nextId() == PAGE_ID_WFS:
-            self._wfs_page.download(output_path)
+            if not self._wfs_page.download(output_path):
+                return
         elif self._data_source_page.nextId() == PAGE_ID_LOADING:
-            self._data_source_page.download(output_path)
+            if not self._data_source_page.download(output_path):
+                return
         # use the downloaded file as source
         self._gml_path = output_path
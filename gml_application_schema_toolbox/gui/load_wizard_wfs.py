@@ -5,7 +5,10 @@
 # ##################################
 
 # Standard library
+import hashlib
 import os
+import tempfile
+from typing import Tuple, Union
 
 from lxml.etree import XMLSyntaxError
 from owslib.util import ServiceException
@@ -22,11 +25,16 @@ from qgis.gui import QgsNewHttpConnection
 from qgis.PyQt import uic
 from qgis.PyQt.QtCore import Qt, QUrl, QUrlQuery, pyqtSlot
 from qgis.PyQt.QtWidgets import QDialog, QMessageBox, QTableWidgetItem, QWizardPage
-from qgis.PyQt.QtXml import QDomDocument
 
 # project
+from gml_application_schema_toolbox.__about__ import __title_clean__
 from gml_application_schema_toolbox.core.proxy import qgis_proxy_settings
 from gml_application_schema_toolbox.core.qgis_urlopener import remote_open_from_qgis
+from gml_application_schema_toolbox.core.wfs_download import (
+    download_features,
+    download_features_paged,
+    download_features_tiled,
+)
 from gml_application_schema_toolbox.core.xml_utils import xml_parse
 from gml_application_schema_toolbox.gui.wait_cursor_context import WaitCursor
 from gml_application_schema_toolbox.gui.xml_dialog import XmlDialog
@@ -281,19 +289,17 @@ class LoadWizardWFS(QWizardPage, PAGE_1A_W):
             str(default_crs_name),
         ]
 
-    def download(self, output_path):
-        with WaitCursor():
-            if self.datasetsTabWidget.currentIndex() == 0:
-                self.download_features(output_path)
-            if self.datasetsTabWidget.currentIndex() == 1:
-                self.download_stored_query(output_path)
-
-    def download_features(self, output_path):
-        wfs = self.wfs()
+    def feature_request(self) -> Union[Tuple[WebFeatureService, dict], None]:
+        """Return the service and the GetFeature parameters set in the page.
 
+        :return: service and parameters, None if no feature type is selected or if \
+        the extent is invalid
+        :rtype: Union[Tuple[WebFeatureService, dict], None]
+        """
         typenames = self.selected_typenames()
         if len(typenames) == 0:
-            return
+            return None
+        wfs = self.wfs()
 
         params = {
             "typename": typenames,
@@ -304,34 +310,97 @@ class LoadWizardWFS(QWizardPage, PAGE_1A_W):
         if self.bbox_group.isChecked():
             if self.bboxWidget.value() == "":
                 QMessageBox.warning(self, self.windowTitle(), "Extent is empty")
-                return
+                return None
             if not self.bboxWidget.isValid():
                 QMessageBox.warning(self, self.windowTitle(), "Extent is invalid")
-                return
+                return None
             params["bbox"] = self._get_bbox(wfs)
+        return wfs, params
+
+    def download_path(self, request: Tuple[WebFeatureService, dict]) -> str:
+        """Return a path of the temporary folder named after the GetFeature URL, so \
+        that a retry of the same request resumes an interrupted download.
+
+        :param request: service and parameters, as returned by feature_request
+        :type request: Tuple[WebFeatureService, dict]
+
+        :return: path of the downloaded features
+        :rtype: str
+        """
+        wfs, params = request
+        url = wfs.getGETGetFeatureRequest(**params)
+        output_dir = os.path.join(tempfile.gettempdir(), __title_clean__)
+        os.makedirs(output_dir, exist_ok=True)
+        return os.path.join(
+            output_dir, hashlib.sha1(url.encode("utf8")).hexdigest() + ".gml"
+        )
+
+    def download(self, output_path, request=None) -> bool:
+        with WaitCursor():
+            if self.datasetsTabWidget.currentIndex() == 0:
+                return self.download_features(output_path, request)
+            if self.datasetsTabWidget.currentIndex() == 1:
+                self.download_stored_query(output_path)
+        return False
+
+    def download_features(self, output_path, request=None) -> bool:
+        request = request or self.feature_request()
+        if request is None:
+            return False
+        wfs, params = request
+
+        if "bbox" in params and self.tiledChkBox.isChecked():
+            return self.download_features_tiled(wfs, params, output_path)
+
+        if int(wfs.version.split(".")[0]) >= 2:
+            return self.download_features_paged(wfs, params, output_path)
+
+        try:
+            with qgis_proxy_settings():
+                download_features(wfs, params, output_path)
+        except ServiceException as e:
+            QMessageBox.critical(self, "ServiceException", str(e))
+            return False
+        return True
 
+    def download_features_paged(self, wfs, params, output_path):
+        """Download features by pages, requested in parallel (WFS 2.0 only)."""
+        plg_settings = PlgOptionsManager().get_plg_settings()
+        max_features = params.pop("maxfeatures", None)
         try:
             with qgis_proxy_settings():
-                response = wfs.getfeature(**params)
+                count = download_features_paged(
+                    wfs,
+                    params,
+                    output_path,
+                    page_size=plg_settings.network_page_size,
+                    workers=plg_settings.network_download_workers,
+                    max_features=max_features,
+                )
+        except ServiceException as e:
+            QMessageBox.critical(self, "ServiceException", str(e))
+            return False
+        self.log(message=f"{count} features downloaded to {output_path}", log_level=3)
+        return True
+
+    def download_features_tiled(self, wfs, params, output_path):
+        """Download features of the extent by tiles, requested in parallel."""
+        plg_settings = PlgOptionsManager().get_plg_settings()
+        try:
+            with qgis_proxy_settings():
+                count = download_features_tiled(
+                    wfs,
+                    params,
+                    output_path,
+                    tile_size=plg_settings.network_page_size,
+                    workers=plg_settings.network_download_workers,
+                    max_features=params.get("maxfeatures"),
+                )
         except ServiceException as e:
             QMessageBox.critical(self, "ServiceException", str(e))
-            return
-        xml = response.read()
-
-        doc = QDomDocument()
-        if not doc.setContent(xml):
-            return
-        root = doc.documentElement()
-        exception = root.firstChildElement("ows:Exception")
-        if not exception.isNull():
-            QMessageBox.critical(self, "ows:Exception", exception.text())
-            return
-
-        # depending on WFS versions, we get either a str or bytes
-        if isinstance(xml, str):
-            xml = xml.encode("utf8")
-        with open(output_path, "wb") as out:
-            out.write(xml)
+            return False
+        self.log(message=f"{count} features downloaded to {output_path}", log_level=3)
+        return True
 
     def download_stored_query(self, output_path):
         pass
@@ -13,9 +13,8 @@ from qgis.PyQt.QtCore import QRegExp, QVariant, pyqtSlot
 from qgis.PyQt.QtGui import QRegExpValidator
 from qgis.PyQt.QtWidgets import QComboBox, QLineEdit, QTableWidgetItem, QWizardPage
 
-from gml_application_schema_toolbox.core.load_gml_as_xml import load_as_xml_layer
 from gml_application_schema_toolbox.gui import qgis_form_custom_widget
-from gml_application_schema_toolbox.gui.progress_bar import ProgressBarLogger
+from gml_application_schema_toolbox.gui.load_tasks import LoadXmlTask, start_task
 from gml_application_schema_toolbox.toolbelt.log_handler import PlgLogger
 
 # ############################################################################
@@ -68,30 +67,44 @@ class LoadWizardXML(QWizardPage, PAGE_3_W):
         if self.geometryColumnCheck.isChecked() and self.geometryColumnEdit.text():
             gmapping = self.geometryColumnEdit.text()
 
-        # add a progress bar during import
-        lyrs = load_as_xml_layer(
-            gml_path,
-            is_remote=gml_path.startswith("http://") or gml_path.startswith("https://"),
-            attributes=mapping,
-            geometry_mapping=gmapping,
-            logger=ProgressBarLogger("Importing features ..."),
-            swap_xy=self.swapXYCheck.isChecked(),
+        # load in the background, layers are added once loaded
+        start_task(
+            LoadXmlTask(
+                gml_path,
+                dict(
+                    attributes=mapping,
+                    geometry_mapping=gmapping,
+                    swap_xy=self.swapXYCheck.isChecked(),
+                    streaming=True,
+                    compress_xml=self.compressXMLCheck.isChecked(),
+                    workers=self.workersSpin.value(),
+                ),
+                on_finished=self.add_layers,
+            )
         )
 
+        return True
+
+    @staticmethod
+    def add_layers(task: LoadXmlTask):
+        """Configure the layers of a finished load task and add them to the project"""
+        lyrs = task.layers
+        compress_xml = task.load_options.get("compress_xml", False)
         for lyr in lyrs.values():
             # install an XML tree widget
             qgis_form_custom_widget.install_xml_tree_on_feature_form(lyr)
 
             # id column
             lyr.setEditorWidgetSetup(0, QgsEditorWidgetSetup("Hidden", {}))
-            # _xml_ column
-            lyr.setEditorWidgetSetup(2, QgsEditorWidgetSetup("XML", {}))
+            # _xml_ column, a zlib blob only readable through the XML tree widget
+            # when compressed
+            lyr.setEditorWidgetSetup(
+                2, QgsEditorWidgetSetup("Hidden" if compress_xml else "XML", {})
+            )
             lyr.setDisplayExpression("fid")
 
         QgsProject.instance().addMapLayers(lyrs.values())
 
-        return True
-
     @pyqtSlot()
     def on_addMappingBtn_clicked(self):
         lastRow = self.attributeTable.rowCount()
@@ -249,91 +249,106 @@ def on_resolve_href_(dialog, layer, feature, field):
         w = w.parent()
     w.close()
 
-    import_widget.do_load()
-    # Add a link between the current layer
-    # and the root layer of the newly loaded (complex) features
-
-    # 1. determine the root layer and pkid of all its features
-    root_layer = None
-    for l in QgsProject.instance().mapLayers().values():
-        if no_ns(l.customProperty("xpath", "")) == no_prefix(root_tag):
-            root_layer = l
-            break
-    if root_layer is None:
-        raise RuntimeError("Cannot determine the root layer")
-
-    pkid = layer.customProperty("pkid")
-    pkid_value = feature[pkid]
-    root_layer.startEditing()
-    # 2. add a href_origin_pkid field in the root layer
-    if "parent_href_pkid" not in [f.name() for f in root_layer.fields()]:
-        new_field = QgsField(layer.fields().field(pkid))
-        new_field.setName("parent_href_pkid")
-        root_layer.addAttribute(new_field)
-
-    # 3. set its value to the id of current feature
-    ids_to_change = []
-    for f in root_layer.getFeatures():
-        if f["parent_href_pkid"] is None:
-            ids_to_change.append(f.id())
-    idx = root_layer.fields().indexFromName("parent_href_pkid")
-    for fid in ids_to_change:
-        # sets the pkid_value
-        root_layer.changeAttributeValue(fid, idx, pkid_value)
-
-    root_layer.commitChanges()
-
-    # 4. declare a new QgsRelation
-    rel_name = "1_n_" + layer.name() + "_" + field
-    rel = QgsProject.instance().relationManager().relations().get(rel_name)
-    if rel is None:
-        rel = QgsRelation()
-        rel.setId(rel_name)
-        rel.setName(field)
-        rel.setReferencedLayer(layer.id())
-        rel.setReferencingLayer(root_layer.id())
-        rel.addFieldPair("parent_href_pkid", pkid)
-        QgsProject.instance().relationManager().addRelation(rel)
-
-    # 5. declare the new relation in the form widgets
-    # new 1:N in the current layer
-    fc = layer.editFormConfig()
-    rel_tab = fc.tabs()[1]
-    rel_tab.addChildElement(QgsAttributeEditorRelation(rel.name(), rel, rel_tab))
-    # new field in the root layer
-    fc = root_layer.editFormConfig()
-    main_tab = fc.tabs()[0]
-    main_tab.addChildElement(QgsAttributeEditorField("parent_href_pkid", idx, main_tab))
-    # declare as reference relation widget
-    s = QgsEditorWidgetSetup(
-        "RelationReference",
-        {
-            "AllowNULL": False,
-            "ReadOnly": True,
-            "Relation": rel.id(),
-            "OrderByValue": False,
-            "MapIdentification": False,
-            "AllowAddFeatures": False,
-            "ShowForm": True,
-        },
-    )
-    root_layer.setEditorWidgetSetup(idx, s)
-
-    # write metadata in layers
-    href_resolved = layer.customProperty("href_resolved", [])
-    if path not in href_resolved:
-        layer.setCustomProperty("href_resolved", href_resolved + [path])
-    href_linked_layers = layer.customProperty("href_linked_layers", {})
-    href_linked_layers[field] = root_layer.id()
-    layer.setCustomProperty("href_linked_layers", href_linked_layers)
-
-    # 6. reload the current form
-    from gml_application_schema_toolbox.main import get_iface
-
-    if is_feature_form:
-        get_iface().openFeatureForm(layer, feature)
+    def link_root_layer(task):
+        # Add a link between the current layer
+        # and the root layer of the newly loaded (complex) features
+
+        # 1. determine the root layer and pkid of all its features
+        root_layer = None
+        for l in QgsProject.instance().mapLayers().values():
+            if no_ns(l.customProperty("xpath", "")) == no_prefix(root_tag):
+                root_layer = l
+                break
+        if root_layer is None and task.gmlas_import is not None:
+            # with child layers loaded on demand, it may not be loaded yet
+            root_layer = task.gmlas_import.layer_by_xpath(no_prefix(root_tag))
+        if root_layer is None:
+            raise RuntimeError("Cannot determine the root layer")
+
+        pkid = layer.customProperty("pkid")
+        pkid_value = feature[pkid]
+        root_layer.startEditing()
+        # 2. add a href_origin_pkid field in the root layer
+        if "parent_href_pkid" not in [f.name() for f in root_layer.fields()]:
+            new_field = QgsField(layer.fields().field(pkid))
+            new_field.setName("parent_href_pkid")
+            root_layer.addAttribute(new_field)
+
+        # 3. set its value to the id of current feature
+        ids_to_change = []
+        for f in root_layer.getFeatures():
+            if f["parent_href_pkid"] is None:
+                ids_to_change.append(f.id())
+        idx = root_layer.fields().indexFromName("parent_href_pkid")
+        for fid in ids_to_change:
+            # sets the pkid_value
+            root_layer.changeAttributeValue(fid, idx, pkid_value)
+
+        root_layer.commitChanges()
+
+        # 4. declare a new QgsRelation
+        rel_name = "1_n_" + layer.name() + "_" + field
+        rel = QgsProject.instance().relationManager().relations().get(rel_name)
+        if rel is None:
+            rel = QgsRelation()
+            rel.setId(rel_name)
+            rel.setName(field)
+            rel.setReferencedLayer(layer.id())
+            rel.setReferencingLayer(root_layer.id())
+            rel.addFieldPair("parent_href_pkid", pkid)
+            QgsProject.instance().relationManager().addRelation(rel)
+
+        # 5. declare the new relation in the form widgets
+        # new 1:N in the current layer
+        fc = layer.editFormConfig()
+        rel_tab = fc.tabs()[1]
+        rel_tab.addChildElement(QgsAttributeEditorRelation(rel.name(), rel, rel_tab))
+        # new field in the root layer
+        fc = root_layer.editFormConfig()
+        main_tab = fc.tabs()[0]
+        main_tab.addChildElement(
+            QgsAttributeEditorField("parent_href_pkid", idx, main_tab)
+        )
+        # declare as reference relation widget
+        s = QgsEditorWidgetSetup(
+            "RelationReference",
+            {
+                "AllowNULL": False,
+                "ReadOnly": True,
+                "Relation": rel.id(),
+                "OrderByValue": False,
+                "MapIdentification": False,
+                "AllowAddFeatures": False,
+                "ShowForm": True,
+            },
+        )
+        root_layer.setEditorWidgetSetup(idx, s)
+
+        # write metadata in layers
+        href_resolved = layer.customProperty("href_resolved", [])
+        if path not in href_resolved:
+            layer.setCustomProperty("href_resolved", href_resolved + [path])
+        href_linked_layers = layer.customProperty("href_linked_layers", {})
+        href_linked_layers[field] = root_layer.id()
+        layer.setCustomProperty("href_linked_layers", href_linked_layers)
+
+        # 6. reload the current form
+        from gml_application_schema_toolbox.main import get_iface
+
+        if is_feature_form:
+            get_iface().openFeatureForm(layer, feature)
+        else:
+            get_iface().showAttributeTable(layer)
+
+    # layers are loaded in the background, they are linked once loaded
+    task = import_widget.do_load(on_finished=link_root_layer)
+    # the import dialog must be kept until the import is finished, successfully
+    # or not
+    if task is None:
+        dlg.deleteLater()
     else:
-        get_iface().showAttributeTable(layer)
+        task.taskCompleted.connect(dlg.deleteLater)
+        task.taskTerminated.connect(dlg.deleteLater)
 
 
 def inject_xml_tree_into_form(dialog, feature):
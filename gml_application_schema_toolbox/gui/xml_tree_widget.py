@@ -47,6 +47,7 @@ from qgis.PyQt.QtWidgets import (
 from gml_application_schema_toolbox.core.load_gml_as_xml import (
     is_layer_gml_xml,
     load_as_xml_layer,
+    xml_from_attribute,
 )
 from gml_application_schema_toolbox.core.qgis_urlopener import remote_open_from_qgis
 from gml_application_schema_toolbox.core.xml_utils import (
@@ -232,7 +233,7 @@ class XMLTreeWidget(QTreeWidget):
         except KeyError:
             pass
         if x:
-            fill_tree_with_xml(self, x)
+            fill_tree_with_xml(self, xml_from_attribute(x))
 
     def onContextMenu(self, pos):
         menu = QMenu(self)
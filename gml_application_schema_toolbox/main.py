@@ -40,6 +40,7 @@ from gml_application_schema_toolbox.__about__ import (
     __title__,
     __version__,
 )
+from gml_application_schema_toolbox.core.gmlas_xpath import datasource_pool
 from gml_application_schema_toolbox.core.load_gmlas_in_qgis import import_in_qgis
 from gml_application_schema_toolbox.gui import InputError
 from gml_application_schema_toolbox.gui.database_widget import DatabaseWidget
@@ -51,7 +52,7 @@ from gml_application_schema_toolbox.gui.xml_custom_widget import (
 )
 from gml_application_schema_toolbox.processing import GmlasProvider
 from gml_application_schema_toolbox.resources.gui.dlg_settings import PlgOptionsFactory
-from gml_application_schema_toolbox.toolbelt import PlgLogger
+from gml_application_schema_toolbox.toolbelt import PlgLogger, PlgOptionsManager
 
 # ############################################################################
 # ########## Globals ###############
@@ -180,6 +181,9 @@ class GmlasPlugin(object):
         # -- Unregister processing
         QgsApplication.processingRegistry().removeProvider(self.provider)
 
+        # -- Close the datasources kept opened to resolve XPaths
+        datasource_pool.clear()
+
         # remove actions
         del self.action_about
         del self.action_export
@@ -303,6 +307,7 @@ class GmlasPlugin(object):
                 gmlas_uri=db_widget.get_database_connection.uri(),
                 provider=db_widget.get_db_format,
                 schema=db_widget.selected_schema,
+                use_cache=PlgOptionsManager().get_plg_settings().impex_skeleton_cache,
             )
         except InputError as e:
             QMessageBox.warning(None, "Error during layer loading", e.args[0])
@@ -26,6 +26,10 @@ from gml_application_schema_toolbox.__about__ import (
     __version__,
 )
 from gml_application_schema_toolbox.toolbelt import PlgLogger, PlgOptionsManager
+from gml_application_schema_toolbox.toolbelt.http_cache import (
+    HttpCache,
+    http_cache_folder,
+)
 from gml_application_schema_toolbox.toolbelt.preferences import PlgSettingsStructure
 
 # ############################################################################
@@ -105,6 +109,9 @@ class DlgSettings(QWidget, FORM_CLASS):
         self.featureLimitBox.setValue(settings.network_max_features)
         self.httpUserAgentEdit.setText(settings.network_http_user_agent)
         self.languageLineEdit.setText(settings.network_language)
+        self.pageSizeBox.setValue(settings.network_page_size)
+        self.downloadWorkersBox.setValue(settings.network_download_workers)
+        self.cacheSizeBox.setValue(settings.network_cache_size)
 
         # import - export
         self.opt_group_access.button(abs(settings.impex_access_mode)).setChecked(True)
@@ -113,6 +120,7 @@ class DlgSettings(QWidget, FORM_CLASS):
             abs(settings.impex_import_method)
         ).setChecked(True)
         self.gmlasConfigLineEdit.setText(settings.impex_gmlas_config)
+        self.skeletonCacheCheckbox.setChecked(settings.impex_skeleton_cache)
 
         # global
         self.opt_debug.setChecked(settings.debug_mode)
@@ -129,10 +137,14 @@ class DlgSettings(QWidget, FORM_CLASS):
             last_file=None,
             last_path=None,
             last_source=None,
+            impex_skeleton_cache=self.skeletonCacheCheckbox.isChecked(),
             # network
             network_http_user_agent=self.httpUserAgentEdit.text(),
             network_language=self.languageLineEdit.text(),
             network_max_features=self.featureLimitBox.value(),
+            network_page_size=self.pageSizeBox.value(),
+            network_download_workers=self.downloadWorkersBox.value(),
+            network_cache_size=self.cacheSizeBox.value(),
             # misc
             debug_mode=self.opt_debug.isChecked(),
             version=__version__,
@@ -158,6 +170,11 @@ class DlgSettings(QWidget, FORM_CLASS):
         if path:
             self.gmlasConfigLineEdit.setText(path)
 
+    @pyqtSlot()
+    def on_clearCacheButton_clicked(self):
+        HttpCache(http_cache_folder(), 0).clear()
+        self.log(message="HTTP cache cleared", log_level=3, push=True)
+
     # -- Buttons box signals -----------------------------------------------------------
     def accept(self):
         self.save_settings()
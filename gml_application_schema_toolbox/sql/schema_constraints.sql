@@ -0,0 +1,3 @@
+SELECT table_name, constraint_name
+FROM information_schema.table_constraints
+WHERE table_schema = '{schema}';
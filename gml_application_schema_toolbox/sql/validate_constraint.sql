@@ -0,0 +1,2 @@
+ALTER TABLE "{schema}"."{table}"
+    VALIDATE CONSTRAINT "{constraint}";
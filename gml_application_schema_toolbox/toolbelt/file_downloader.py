@@ -5,11 +5,15 @@
 """
 
 # Standard library
+import json
 import logging
+import os
+from typing import Dict, Union
 
 # PyQGIS
-from qgis.core import QgsFileDownloader
+from qgis.core import QgsNetworkAccessManager
 from qgis.PyQt.QtCore import QEventLoop, QUrl
+from qgis.PyQt.QtNetwork import QNetworkReply, QNetworkRequest
 
 # project
 from gml_application_schema_toolbox.toolbelt.log_handler import PlgLogger
@@ -21,33 +25,174 @@ from gml_application_schema_toolbox.toolbelt.log_handler import PlgLogger
 logger = logging.getLogger(__name__)
 plg_logger = PlgLogger()
 
+# ############################################################################
+# ########## Classes ###############
+# ##################################
+
+
+class DownloadManifest:
+    """Sidecar JSON file recording the progress of a download, so that a retry
+    continues where the previous attempt stopped.
+
+    The recorded state is only reused by a download of the same request. The
+    manifest is removed once the download succeeded.
+
+    :param output_path: path of the downloaded file
+    :type output_path: str
+    :param request: request identifying the download (URL, etc.)
+    :type request: str
+    """
+
+    SUFFIX = ".download.json"
+
+    def __init__(self, output_path: str, request: str):
+        self.path = output_path + self.SUFFIX
+        self.request = request
+        self.state = self._read()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(state, dict) or state.get("request") != self.request:
+            return {}
+        return state
+
+    def save(self, **values):
+        """Update the state and write it, replacing the previous manifest at once."""
+        self.state.update(values, request=self.request)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        self.state = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
 # ############################################################################
 # ########## Functions #############
 # ##################################
 
 
-def get_from_http(uri: str, output_path: str) -> str:
+def _raw_header(reply: QNetworkReply, name: bytes) -> Union[str, None]:
+    value = bytes(reply.rawHeader(name)).decode("latin-1")
+    return value or None
+
+
+def _range_start(reply: QNetworkReply) -> Union[int, None]:
+    # Content-Range: bytes <start>-<end>/<size>
+    content_range = _raw_header(reply, b"Content-Range") or ""
+    try:
+        return int(content_range.split()[1].split("-")[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def get_from_http(
+    uri: str, output_path: str, headers: Dict[bytes, bytes] = None
+) -> Union[str, None]:
     """Download a file from a remote web server accessible through HTTP.
 
+    The file is written by chunks to a ".part" file, renamed once complete. If a
+    previous download of the same URL was interrupted, it is resumed with an HTTP
+    Range request, as long as the server still serves the same file (ETag or
+    Last-Modified checked with If-Range). Without any of these validators, the
+    download starts again.
+
     :param uri: web URL to the QGIS project
     :type uri: str
     :param output_path: path to the local file
     :type output_path: str
+    :param headers: HTTP headers, defaults to None
+    :type headers: Dict[bytes, bytes], optional
 
-    :return: output path
-    :rtype: str
+    :return: output path, or None if the download failed
+    :rtype: Union[str, None]
     """
     msg_log = f"Downloading file from {uri} to {output_path}"
     logger.debug(msg_log)
     plg_logger.log(msg_log)
-    # download it
+
+    part_path = output_path + ".part"
+    manifest = DownloadManifest(output_path, uri)
+    validator = manifest.state.get("etag") or manifest.state.get("last_modified")
+    offset = 0
+    if validator and os.path.exists(part_path):
+        offset = os.path.getsize(part_path)
+
+    request = QNetworkRequest(QUrl(uri))
+    request.setAttribute(QNetworkRequest.FollowRedirectsAttribute, True)
+    for key, value in (headers or {}).items():
+        request.setRawHeader(key, value)
+    if offset:
+        plg_logger.log(f"Resuming download of {uri} from byte {offset}")
+        request.setRawHeader(b"Range", "bytes={}-".format(offset).encode())
+        # the whole file is sent again if it changed
+        request.setRawHeader(b"If-Range", validator.encode("latin-1"))
+
+    reply = QgsNetworkAccessManager.instance().get(request)
+    output = {}
+
+    def write_chunk():
+        if "file" not in output:
+            status = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+            if status is None or status >= 400:
+                # handled once finished
+                return
+            resumed = status == 206
+            if resumed and _range_start(reply) != offset:
+                # not the end of the partial file, start again next time
+                output["bad_range"] = True
+                reply.abort()
+                return
+            output["file"] = open(part_path, "ab" if resumed else "wb")
+            manifest.save(
+                etag=_raw_header(reply, b"ETag"),
+                last_modified=_raw_header(reply, b"Last-Modified"),
+            )
+        output["file"].write(bytes(reply.readAll()))
+
     loop = QEventLoop()
-    project_download = QgsFileDownloader(
-        url=QUrl(uri), outputFileName=output_path, delayStart=True
-    )
-    project_download.downloadExited.connect(loop.quit)
-    project_download.startDownload()
+    reply.readyRead.connect(write_chunk)
+    reply.finished.connect(loop.quit)
     loop.exec_()
 
+    if reply.error() == QNetworkReply.NoError and "bad_range" not in output:
+        write_chunk()
+    if "file" in output:
+        output["file"].close()
+
+    status = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+    content_range = _raw_header(reply, b"Content-Range") or ""
+    if status == 416 and content_range == "bytes */{}".format(offset):
+        # the previous download was complete, only the rename was missing
+        plg_logger.log(f"Download of {uri} was already complete")
+    elif reply.error() != QNetworkReply.NoError or "bad_range" in output:
+        if status == 416 or "bad_range" in output:
+            # the partial file can not be resumed, start again next time
+            manifest.remove()
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        plg_logger.log(
+            message=f"Download of {uri} failed: {reply.errorString()}. "
+            "Retry to resume it.",
+            log_level=2,
+            push=True,
+        )
+        reply.deleteLater()
+        return None
+    reply.deleteLater()
+
+    if not os.path.exists(part_path):
+        # empty response
+        open(part_path, "wb").close()
+    os.replace(part_path, output_path)
+    manifest.remove()
+
     plg_logger.log(message=f"Download of {uri} succeedeed", log_level=3)
     return output_path
@@ -0,0 +1,336 @@
+#! python3  # noqa: E265
+
+"""
+    On-disk cache of HTTP responses, used by the network access manager.
+"""
+
+# ############################################################################
+# ########## Imports ###############
+# ##################################
+
+# Standard library
+import email.utils
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, Union
+
+# PyQGIS
+from qgis.core import QgsApplication
+
+# project
+from gml_application_schema_toolbox.__about__ import __title_clean__
+from gml_application_schema_toolbox.toolbelt.log_handler import PlgLogger
+from gml_application_schema_toolbox.toolbelt.preferences import PlgOptionsManager
+
+# ############################################################################
+# ########## Globals ###############
+# ##################################
+
+# request headers changing the response, part of the cache key
+KEY_HEADERS = ("accept", "accept-language")
+# response headers updated by a 304 Not Modified response
+REFRESHED_HEADERS = ("cache-control", "date", "etag", "expires", "last-modified")
+
+plg_logger = PlgLogger()
+
+# ############################################################################
+# ########## Functions #############
+# ##################################
+
+
+def _header_str(value: Union[str, bytes]) -> str:
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode("latin-1")
+    return str(value)
+
+
+def cache_control(headers: Dict[str, str]) -> Dict[str, Union[str, None]]:
+    """Parse the Cache-Control header of a response.
+
+    :param headers: response headers, with lower case names
+    :type headers: Dict[str, str]
+
+    :return: directive -> value, None for directives without value
+    :rtype: Dict[str, Union[str, None]]
+    """
+    directives = {}
+    for directive in headers.get("cache-control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+def freshness_lifetime(headers: Dict[str, str]) -> int:
+    """Return how long, in seconds, a response can be used without asking the
+    server, from its Cache-Control max-age or Expires header.
+
+    :param headers: response headers, with lower case names
+    :type headers: Dict[str, str]
+
+    :return: freshness lifetime, 0 if the response must be revalidated
+    :rtype: int
+    """
+    directives = cache_control(headers)
+    if "no-cache" in directives:
+        return 0
+    max_age = directives.get("max-age")
+    if max_age is not None and re.fullmatch(r"\d+", max_age):
+        return int(max_age)
+    if "expires" in headers:
+        try:
+            expires = email.utils.parsedate_to_datetime(headers["expires"])
+            date = email.utils.parsedate_to_datetime(headers["date"])
+        except (KeyError, TypeError, ValueError):
+            return 0
+        return max(0, int((expires - date).total_seconds()))
+    return 0
+
+
+# ############################################################################
+# ########## Classes ###############
+# ##################################
+
+
+class HttpCache:
+    """Size-bounded cache of HTTP responses, stored in a folder.
+
+    Each response is stored in two files named after its key: the body and a
+    JSON file with its headers. The least recently used responses are removed
+    when the cache grows over its maximal size. The size of the cache is only read
+    from the folder once, then kept up to date by the instances using the folder.
+
+    :param folder: cache folder
+    :type folder: Path
+    :param max_size: maximal size of the cached bodies, in bytes
+    :type max_size: int
+    """
+
+    # estimated size of the cached bodies, by cache folder
+    _sizes: Dict[Path, int] = {}
+
+    def __init__(self, folder: Path, max_size: int):
+        self.folder = Path(folder)
+        self.max_size = max_size
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(
+        method: str, url: str, headers: Dict[bytes, bytes] = None, authid: str = None
+    ) -> str:
+        """Return the cache key of a request.
+
+        :param method: HTTP verb
+        :type method: str
+        :param url: requested URL
+        :type url: str
+        :param headers: request headers, defaults to None
+        :type headers: Dict[bytes, bytes], optional
+        :param authid: authentication configuration, defaults to None
+        :type authid: str, optional
+
+        :return: key, usable as a file name
+        :rtype: str
+        """
+        headers = {
+            _header_str(name).lower(): _header_str(value)
+            for name, value in (headers or {}).items()
+        }
+        parts = [method.upper(), url, authid or ""]
+        parts += ["{}: {}".format(name, headers.get(name, "")) for name in KEY_HEADERS]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> tuple:
+        return self.folder / (key + ".json"), self.folder / (key + ".body")
+
+    def _bodies(self) -> list:
+        bodies = []
+        for body_path in self.folder.glob("*.body"):
+            try:
+                stat = body_path.stat()
+            except OSError:
+                continue
+            bodies.append((stat.st_mtime, stat.st_size, body_path))
+        return bodies
+
+    def size(self) -> int:
+        """Return the size of the cached bodies, read from the folder on first use.
+
+        :return: size in bytes
+        :rtype: int
+        """
+        if self.folder not in self._sizes:
+            self._sizes[self.folder] = sum(body[1] for body in self._bodies())
+        return self._sizes[self.folder]
+
+    def get(self, key: str) -> Union[dict, None]:
+        """Return a cached response.
+
+        :param key: request key
+        :type key: str
+
+        :return: dict with status, headers (as given to put), stored_at, \
+        lifetime and content, None if the request is not cached
+        :rtype: Union[dict, None]
+        """
+        meta_path, body_path = self._paths(key)
+        try:
+            with meta_path.open(encoding="utf-8") as f:
+                entry = json.load(f)
+            entry["content"] = body_path.read_bytes()
+            # most recently used
+            os.utime(body_path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    @staticmethod
+    def is_fresh(entry: dict) -> bool:
+        """Return True if a cached response can be used without asking the server."""
+        return time.time() - entry["stored_at"] < entry["lifetime"]
+
+    @staticmethod
+    def validators(entry: dict) -> Dict[bytes, bytes]:
+        """Return the headers of a conditional request revalidating a cached
+        response."""
+        headers = {}
+        if entry["headers"].get("etag"):
+            headers[b"If-None-Match"] = entry["headers"]["etag"].encode("latin-1")
+        if entry["headers"].get("last-modified"):
+            headers[b"If-Modified-Since"] = entry["headers"]["last-modified"].encode(
+                "latin-1"
+            )
+        return headers
+
+    def put(self, key: str, status: int, headers: Dict[str, str], content: bytes):
+        """Store a response, if its headers allow it.
+
+        Responses without freshness lifetime are only stored when they can be
+        revalidated (ETag or Last-Modified).
+
+        :param key: request key
+        :type key: str
+        :param status: HTTP status code
+        :type status: int
+        :param headers: response headers, stored as is, with lower case names \
+        among them
+        :type headers: Dict[str, str]
+        :param content: response body
+        :type content: bytes
+        """
+        directives = cache_control(headers)
+        lifetime = freshness_lifetime(headers)
+        if (
+            status != 200
+            or "no-store" in directives
+            or len(content) > self.max_size
+            or not (lifetime or "etag" in headers or "last-modified" in headers)
+        ):
+            return
+
+        meta_path, body_path = self._paths(key)
+        size = self.size()
+        try:
+            # replaced response
+            size -= body_path.stat().st_size
+        except OSError:
+            pass
+        entry = {
+            "status": status,
+            "headers": headers,
+            "stored_at": time.time(),
+            "lifetime": lifetime,
+        }
+        try:
+            # written to temporary files, so that readers never see partial files
+            for path, data in (
+                (body_path, content),
+                (meta_path, json.dumps(entry).encode("utf-8")),
+            ):
+                tmp_path = path.with_name(path.name + ".tmp")
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+        except OSError as err:
+            plg_logger.log(message=f"HTTP cache not written: {err}", log_level=1)
+            return
+        self._sizes[self.folder] = size + len(content)
+        if self._sizes[self.folder] > self.max_size:
+            self.prune()
+
+    def refresh(self, key: str, entry: dict, headers: Dict[str, str]) -> Dict[str, str]:
+        """Update a cached response revalidated by the server (304 Not Modified).
+
+        :param key: request key
+        :type key: str
+        :param entry: cached response
+        :type entry: dict
+        :param headers: headers of the 304 response, with lower case names \
+        among them
+        :type headers: Dict[str, str]
+
+        :return: headers of the cached response, updated by the 304 response
+        :rtype: Dict[str, str]
+        """
+        refreshed = {
+            name: value
+            for name, value in headers.items()
+            if name.lower() in REFRESHED_HEADERS
+        }
+        # whatever the case of their names
+        replaced = {name.lower() for name in refreshed}
+        entry_headers = {
+            name: value
+            for name, value in entry["headers"].items()
+            if name.lower() not in replaced
+        }
+        entry_headers.update(refreshed)
+        self.put(key, entry["status"], entry_headers, entry["content"])
+        return entry_headers
+
+    def prune(self):
+        """Remove the least recently used responses, until the cache fits in its
+        maximal size."""
+        bodies = self._bodies()
+        size = sum(body[1] for body in bodies)
+        for _, body_size, body_path in sorted(bodies):
+            if size <= self.max_size:
+                break
+            for path in (body_path.with_suffix(".json"), body_path):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            size -= body_size
+        self._sizes[self.folder] = size
+
+    def clear(self):
+        """Remove all the cached responses."""
+        for path in self.folder.iterdir():
+            if path.suffix in (".json", ".body", ".tmp"):
+                path.unlink()
+        self._sizes[self.folder] = 0
+
+
+def http_cache_folder() -> Path:
+    """Return the folder of the HTTP cache of the plugin, in the QGIS profile folder.
+
+    :return: cache folder
+    :rtype: Path
+    """
+    return Path(QgsApplication.qgisSettingsDirPath()) / "cache" / __title_clean__
+
+
+def get_http_cache() -> Union[HttpCache, None]:
+    """Return the HTTP cache of the plugin, sized from the plugin settings.
+
+    :return: cache, None if disabled (size set to 0)
+    :rtype: Union[HttpCache, None]
+    """
+    max_size = PlgOptionsManager().get_plg_settings().network_cache_size
+    if max_size <= 0:
+        return None
+    return HttpCache(http_cache_folder(), max_size * 1024 * 1024)
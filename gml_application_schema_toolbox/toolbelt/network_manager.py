@@ -31,6 +31,7 @@ from qgis.PyQt.QtCore import QEventLoop, QObject, QUrl, pyqtSignal
 from qgis.PyQt.QtNetwork import QNetworkReply, QNetworkRequest
 
 # project
+from gml_application_schema_toolbox.toolbelt.http_cache import get_http_cache
 from gml_application_schema_toolbox.toolbelt.log_handler import PlgLogger
 
 # ############################################################################
@@ -202,10 +203,15 @@ class NetworkAccessManager(QObject):
         redirections: int = DEFAULT_MAX_REDIRECTS,
         connection_type=None,
         blocking: bool = True,
+        use_cache: bool = True,
     ) -> Tuple[Response, bytearray]:
         """Make a network request by calling QgsNetworkAccessManager. \
         Redirections argument is ignored and is here only for httplib2 compatibility.
 
+        Blocking GET requests go through the HTTP cache of the plugin: fresh cached \
+        responses are returned without network access, others are revalidated with \
+        a conditional request (ETag, Last-Modified).
+
         :param url: URL to request.
         :type url: str
         :param method: HTTP verb as request type, defaults to "GET"
@@ -220,6 +226,8 @@ class NetworkAccessManager(QObject):
         :type connection_type: [type], optional
         :param blocking: sync (True) or async (False) , defaults to True
         :type blocking: bool, optional
+        :param use_cache: False to bypass the HTTP cache, defaults to True
+        :type use_cache: bool, optional
 
         :raises e: [description]
         :raises self.http_call_result.exception: [description]
@@ -233,16 +241,145 @@ class NetworkAccessManager(QObject):
         # store headers in case of redirections
         self.headers = headers
         self.http_call_result.url = url
+        self.http_call_result.headers = {}
         if self.debug:
             plg_logger.log(
                 message="DEBUG - http_call request: {0}".format(url), log_level=4
             )
 
         self.blocking_mode = blocking
+
+        # -- HTTP cache
+        cache = None
+        cached = None
+        if use_cache and blocking and method.upper() == "GET":
+            cache = get_http_cache()
+        if cache is not None:
+            cache_key = cache.key(method, url, headers, self.authid)
+            cached = cache.get(cache_key)
+            if cached is not None and cache.is_fresh(cached):
+                return self._from_cache(url, cached)
+            if cached is not None:
+                # revalidate, without changing the headers kept for redirections
+                headers = {**(headers or {}), **cache.validators(cached)}
+
+        url = urllib.parse.unquote(url)  # Avoid double quoting form QUrl
+        req = self._network_request(url, headers)
+        self._send(req, method, body)
+
+        # block if blocking mode otherwise return immediately
+        # it's up to the caller to manage listeners in case of no blocking mode
+        if not self.blocking_mode:
+            return None, None
+
+        # Call and block
+        self.el = QEventLoop()
+        self.reply.finished.connect(self.el.quit)
+
+        # Catch all exceptions (and clean up requests)
+        try:
+            self.el.exec_(QEventLoop.ExcludeUserInputEvents)
+        except Exception as err:
+            plg_logger.log(
+                message="Request to {} failed. Trace: {}".format(url, err),
+                log_level=2,
+                push=1,
+            )
+            raise err
+
+        if self.reply:
+            self.reply.finished.disconnect(self.el.quit)
+
+        # emit exception in case of error
+        if not self.http_call_result.ok:
+            self._raise_error()
+
+        if cache is not None:
+            self._to_cache(url, cache, cache_key, cached)
+
+        return self.http_call_result, self.http_call_result.content
+
+    def _from_cache(self, url: str, cached: dict) -> Tuple[Response, bytearray]:
+        """Answer a request with a fresh cached response, without network access.
+
+        :param url: requested URL
+        :type url: str
+        :param cached: cached response, as returned by HttpCache.get
+        :type cached: dict
+
+        :return: a tuple of (response, content), as request
+        :rtype: Tuple[Response, bytearray]
+        """
+        if self.debug:
+            plg_logger.log(
+                message="DEBUG - {} served from cache".format(url), log_level=4
+            )
+        self.http_call_result.status = cached["status"]
+        self.http_call_result.status_code = cached["status"]
+        self.http_call_result.headers = dict(cached["headers"])
+        self.http_call_result.content = cached["content"]
+        self.http_call_result.ok = True
+        self.finished.emit(self.http_call_result)
+        return self.http_call_result, self.http_call_result.content
+
+    def _to_cache(self, url: str, cache, cache_key: str, cached: dict = None):
+        """Store the received response in the HTTP cache, or refresh the cached \
+        one if the server tells it is not modified.
+
+        :param url: requested URL
+        :type url: str
+        :param cache: HTTP cache of the plugin
+        :type cache: HttpCache
+        :param cache_key: key of the request in the cache
+        :type cache_key: str
+        :param cached: cached response which was revalidated, defaults to None
+        :type cached: dict, optional
+        """
+        # headers are stored as received, with lower case names too, so that
+        # cached responses have the same headers as network ones
+        response_headers = dict(self.http_call_result.headers)
+        if self.http_call_result.status_code == 304 and cached is not None:
+            if self.debug:
+                plg_logger.log(
+                    message="DEBUG - {} not modified".format(url), log_level=4
+                )
+            self.http_call_result.headers = cache.refresh(
+                cache_key, cached, response_headers
+            )
+            self.http_call_result.status = cached["status"]
+            self.http_call_result.status_code = cached["status"]
+            self.http_call_result.content = cached["content"]
+        else:
+            cache.put(
+                cache_key,
+                self.http_call_result.status_code,
+                response_headers,
+                self.http_call_result.content,
+            )
+
+    def _raise_error(self):
+        """Raise the exception of a failed request."""
+        if self.http_call_result.exception and not self.exception_class:
+            raise self.http_call_result.exception
+        elif self.exception_class:
+            raise self.exception_class(self.http_call_result.reason)
+        else:
+            raise RequestsException("Unknown reason")
+
+    def _network_request(self, url: str, headers: dict = None) -> QNetworkRequest:
+        """Build the network request, with its headers and authentication.
+
+        :param url: URL to request, not quoted
+        :type url: str
+        :param headers: HTTP header key:value, defaults to None
+        :type headers: dict, optional
+
+        :return: request to send
+        :rtype: QNetworkRequest
+        """
         req = QNetworkRequest()
 
         # -- URL construction
-        url = urllib.parse.unquote(url)  # Avoid double quoting form QUrl
         req.setUrl(QUrl(url))
 
         # -- HEADERS
@@ -271,7 +408,18 @@ class NetworkAccessManager(QObject):
                     "DEBUG - Update request w/ authid: {0}".format(self.authid)
                 )
             QgsAuthManager.instance().updateNetworkRequest(req, self.authid)
+        return req
+
+    def _send(self, req: QNetworkRequest, method: str, body=None):
+        """Send the request and connect its reply.
 
+        :param req: request to send
+        :type req: QNetworkRequest
+        :param method: HTTP verb as request type
+        :type method: str
+        :param body: body of POST and PUT requests, defaults to None
+        :type body: [type], optional
+        """
         # -- Perform request
         if self.reply is not None and self.reply.isRunning():
             self.reply.close()
@@ -312,40 +460,6 @@ class NetworkAccessManager(QObject):
         self.reply.finished.connect(self.replyFinished)
         self.reply.downloadProgress.connect(self.downloadProgress)
 
-        # block if blocking mode otherwise return immediately
-        # it's up to the caller to manage listeners in case of no blocking mode
-        if not self.blocking_mode:
-            return None, None
-
-        # Call and block
-        self.el = QEventLoop()
-        self.reply.finished.connect(self.el.quit)
-
-        # Catch all exceptions (and clean up requests)
-        try:
-            self.el.exec_(QEventLoop.ExcludeUserInputEvents)
-        except Exception as err:
-            plg_logger.log(
-                message="Request to {} failed. Trace: {}".format(url, err),
-                log_level=2,
-                push=1,
-            )
-            raise err
-
-        if self.reply:
-            self.reply.finished.disconnect(self.el.quit)
-
-        # emit exception in case of error
-        if not self.http_call_result.ok:
-            if self.http_call_result.exception and not self.exception_class:
-                raise self.http_call_result.exception
-            elif self.exception_class:
-                raise self.exception_class(self.http_call_result.reason)
-            else:
-                raise RequestsException("Unknown reason")
-
-        return self.http_call_result, self.http_call_result.content
-
     def downloadProgress(self, bytesReceived: int, bytesTotal: int):
         """Keep track of the download progress"""
         # plg_logger.log("downloadProgress %s of %s ..." % (bytesReceived, bytesTotal))
@@ -367,8 +481,9 @@ class NetworkAccessManager(QObject):
         self.http_call_result.status = httpStatus
         self.http_call_result.status_message = httpStatusMessage
         for k, v in self.reply.rawHeaderPairs():
-            self.http_call_result.headers[str(k)] = str(v)
-            self.http_call_result.headers[str(k).lower()] = str(v)
+            k, v = bytes(k).decode("latin-1"), bytes(v).decode("latin-1")
+            self.http_call_result.headers[k] = v
+            self.http_call_result.headers[k.lower()] = v
 
         if err != QNetworkReply.NoError:
             # handle error
@@ -45,11 +45,15 @@ class PlgSettingsStructure(NamedTuple):
     last_path: str = None
     last_downloaded_path: str = None
     last_source: str = "file"
+    impex_skeleton_cache: bool = False
 
     # network
     network_http_user_agent: str = f"{__title__}/{__version__}"
     network_language: str = "en"
     network_max_features: int = 100
+    network_page_size: int = 1000
+    network_download_workers: int = 4
+    network_cache_size: int = 100
 
     defaults = [
         False,
@@ -160,6 +164,9 @@ class PlgOptionsManager:
                 defaultValue="file",
                 type=str,
             ),
+            impex_skeleton_cache=settings.value(
+                key="impex_skeleton_cache", defaultValue=False, type=bool
+            ),
             # network
             network_http_user_agent=settings.value(
                 key="network_http_user_agent",
@@ -172,6 +179,15 @@ class PlgOptionsManager:
             network_max_features=settings.value(
                 key="network_max_features", defaultValue=100, type=int
             ),
+            network_page_size=settings.value(
+                key="network_page_size", defaultValue=1000, type=int
+            ),
+            network_download_workers=settings.value(
+                key="network_download_workers", defaultValue=4, type=int
+            ),
+            network_cache_size=settings.value(
+                key="network_cache_size", defaultValue=100, type=int
+            ),
         )
 
         settings.endGroup()
@@ -81,24 +81,21 @@ class GeologyLogViewer(QWidget):
     def init_from_db(
         cls, db_uri, provider, schema, layer_name, pkid_name, pkid_value, parent
     ):
-        resolver = GmlAsXPathResolver(db_uri, provider, schema)
-
-        froms = resolver.resolve_xpath(
-            layer_name,
-            pkid_name,
-            pkid_value,
-            "element/LogValue/fromDepth/Quantity/value",
-        )
-        tos = resolver.resolve_xpath(
-            layer_name, pkid_name, pkid_value, "element/LogValue/toDepth/Quantity/value"
-        )
-        cats = resolver.resolve_xpath(
-            layer_name,
-            pkid_name,
-            pkid_value,
-            "element/LogValue/value/DataRecord/field/Category/value",
-        )
-        data = [(float(f), float(t), cat) for (f, t, cat) in zip(froms, tos, cats)]
+        with GmlAsXPathResolver(db_uri, provider, schema) as resolver:
+            rows = (
+                resolver.resolve_xpaths(
+                    layer_name,
+                    pkid_name,
+                    pkid_value,
+                    [
+                        "element/LogValue/fromDepth/Quantity/value",
+                        "element/LogValue/toDepth/Quantity/value",
+                        "element/LogValue/value/DataRecord/field/Category/value",
+                    ],
+                )
+                or []
+            )
+        data = [(float(f), float(t), cat) for (f, t, cat) in rows]
         return cls("GeologyLogCoverage", data, parent)
 
     def __init__(self, title, data, parent=None):
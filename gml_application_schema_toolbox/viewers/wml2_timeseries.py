@@ -80,27 +80,32 @@ class WML2TimeSeriesViewer(QWidget):
     def init_from_db(
         cls, db_uri, provider, schema, layer_name, pkid_name, pkid_value, parent
     ):
-        resolver = GmlAsXPathResolver(db_uri, provider, schema)
-
-        ytitle = resolver.resolve_xpath(
-            layer_name,
-            pkid_name,
-            pkid_value,
-            "defaultPointMetadata/DefaultTVPMeasurementMetadata/uom/@code",
-        ) or [""]
-        times = resolver.resolve_xpath(
-            layer_name, pkid_name, pkid_value, "point/MeasurementTVP/time/text()"
-        )
-        ys = resolver.resolve_xpath(
-            layer_name, pkid_name, pkid_value, "point/MeasurementTVP/value/text()"
-        )
+        with GmlAsXPathResolver(db_uri, provider, schema) as resolver:
+            ytitle = resolver.resolve_xpath(
+                layer_name,
+                pkid_name,
+                pkid_value,
+                "defaultPointMetadata/DefaultTVPMeasurementMetadata/uom/@code",
+            ) or [""]
+            rows = (
+                resolver.resolve_xpaths(
+                    layer_name,
+                    pkid_name,
+                    pkid_value,
+                    [
+                        "point/MeasurementTVP/time/text()",
+                        "point/MeasurementTVP/value/text()",
+                    ],
+                )
+                or []
+            )
         data = [
             (
                 time.mktime(datetime.strptime(t, "%Y-%m-%dT%H:%M:%S.000Z").timetuple()),
                 float(y),
                 t,
             )
-            for (t, y) in zip(times, ys)
+            for (t, y) in rows
         ]
         return cls(pkid_value, ytitle[0], data, parent)
 
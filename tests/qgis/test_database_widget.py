@@ -0,0 +1,121 @@
+#! python3  # noqa E265
+
+"""
+    Usage from the repo root folder:
+
+    .. code-block:: bash
+
+        # for whole tests
+        python -m unittest tests.qgis.test_database_widget
+        # for specific test
+        python -m unittest tests.qgis.test_database_widget.TestConstraintManager.test_add_constraints
+"""
+
+# standard library
+from unittest import mock
+
+# PyQGIS
+from qgis.testing import unittest
+
+# project
+from gml_application_schema_toolbox.gui import database_widget
+from gml_application_schema_toolbox.gui.database_widget import (
+    ConstraintManager,
+    ForeignKey,
+)
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+FOREIGN_KEYS = [
+    ForeignKey("station_name", "parent_id", "station", "id"),
+    ForeignKey("station_measure", "parent_id", "station", "id"),
+    ForeignKey("measure_unit", "parent_id", "station_measure", "ogr_pkid"),
+]
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class TestConstraintManager(unittest.TestCase):
+    def setUp(self):
+        self.conn = mock.Mock()
+        # existing constraints of the schema
+        self.conn.executeSql.return_value = [("station", "station_id_unique")]
+        self.manager = ConstraintManager(self.conn, "app")
+        self.conn.executeSql.reset_mock()
+
+    def test_add_constraints(self):
+        self.manager.add_constraints(FOREIGN_KEYS)
+
+        # missing constraints only, in a single transaction
+        self.conn.executeSql.assert_called_once()
+        sql = self.conn.executeSql.call_args[0][0]
+        self.assertNotIn('"station_id_unique"', sql)
+        self.assertEqual(sql.count("UNIQUE"), 1)
+        self.assertIn(
+            'ALTER TABLE "app"."station_measure"\n'
+            '    ADD CONSTRAINT "station_measure_ogr_pkid_unique"\n'
+            '    UNIQUE ("ogr_pkid");',
+            sql,
+        )
+        self.assertEqual(sql.count("FOREIGN KEY"), 3)
+        self.assertIn(
+            'ALTER TABLE "app"."station_name"\n'
+            '    ADD CONSTRAINT "parent_id_fkey"\n'
+            '    FOREIGN KEY ("parent_id")\n'
+            '    REFERENCES "app"."station" ("id");',
+            sql,
+        )
+        self.assertNotIn("NOT VALID", sql)
+        self.assertNotIn("VALIDATE", sql)
+        # unique constraints are added before the foreign keys using them
+        self.assertLess(
+            sql.index("station_measure_ogr_pkid_unique"),
+            sql.index('"app"."measure_unit"'),
+        )
+
+        # nothing left to add
+        self.conn.executeSql.reset_mock()
+        self.manager.add_constraints(FOREIGN_KEYS)
+        self.conn.executeSql.assert_not_called()
+
+    def test_add_constraints_not_valid(self):
+        validate_conn = mock.Mock()
+        with mock.patch.object(database_widget, "QgsProviderRegistry") as registry:
+            registry.instance().providerMetadata().createConnection.return_value = (
+                validate_conn
+            )
+            self.manager.add_constraints(FOREIGN_KEYS, not_valid=True, workers=2)
+
+        sql = self.conn.executeSql.call_args[0][0]
+        self.assertEqual(sql.count("FOREIGN KEY"), 3)
+        self.assertEqual(sql.count('("id") NOT VALID;'), 2)
+        self.assertEqual(sql.count('("ogr_pkid") NOT VALID;'), 1)
+        # unique constraints are always checked
+        self.assertNotIn("UNIQUE NOT VALID", sql)
+
+        # foreign keys validated afterwards, on other connections
+        validations = sorted(
+            call[0][0] for call in validate_conn.executeSql.call_args_list
+        )
+        self.assertEqual(
+            validations,
+            [
+                'ALTER TABLE "app"."measure_unit"\n'
+                '    VALIDATE CONSTRAINT "parent_id_fkey";\n',
+                'ALTER TABLE "app"."station_measure"\n'
+                '    VALIDATE CONSTRAINT "parent_id_fkey";\n',
+                'ALTER TABLE "app"."station_name"\n'
+                '    VALIDATE CONSTRAINT "parent_id_fkey";\n',
+            ],
+        )
+
+
+# ############################################################################
+# ####### Stand-alone run ########
+# ################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+#! python3  # noqa E265
+
+"""
+    Usage from the repo root folder:
+
+    .. code-block:: bash
+
+        # for whole tests
+        python -m unittest tests.qgis.test_file_downloader
+        # for specific test
+        python -m unittest tests.qgis.test_file_downloader.TestGetFromHttp.test_resume
+"""
+
+# standard library
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# PyQGIS
+from qgis.PyQt.QtNetwork import QNetworkReply
+
+# project
+from gml_application_schema_toolbox.toolbelt import file_downloader
+from gml_application_schema_toolbox.toolbelt.file_downloader import (
+    DownloadManifest,
+    get_from_http,
+)
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+URL = "https://example.com/doc.xml"
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class FakeReply:
+    """Reply of a server, received in a single chunk."""
+
+    def __init__(self, status: int, body: bytes = b"", headers: dict = None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+        self._error = QNetworkReply.NoError
+        if status >= 400:
+            self._error = QNetworkReply.ContentAccessDenied
+        self.readyRead = mock.Mock()
+        self.finished = mock.Mock()
+
+    def attribute(self, name):
+        return self.status
+
+    def rawHeader(self, name: bytes) -> bytes:
+        return self.headers.get(name, b"")
+
+    def readAll(self) -> bytes:
+        body, self.body = self.body, b""
+        return body
+
+    def error(self):
+        return self._error
+
+    def errorString(self) -> str:
+        return "HTTP {}".format(self.status)
+
+    def abort(self):
+        self._error = QNetworkReply.OperationCanceledError
+
+    def deleteLater(self):
+        pass
+
+
+class TestGetFromHttp(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.output = Path(self.tmp_dir.name) / "doc.xml"
+        self.part = Path(str(self.output) + ".part")
+
+    def get(self, reply: FakeReply):
+        """Download URL, answered with reply.
+
+        :return: result of get_from_http and the headers of the request
+        """
+        with mock.patch.object(
+            file_downloader, "QgsNetworkAccessManager"
+        ) as manager, mock.patch.object(
+            file_downloader, "QNetworkRequest"
+        ) as request, mock.patch.object(
+            file_downloader, "QEventLoop"
+        ) as loop, mock.patch.object(
+            file_downloader, "plg_logger"
+        ):
+            manager.instance().get.return_value = reply
+            # chunks received while the loop runs
+            loop().exec_.side_effect = lambda: reply.readyRead.connect.call_args[0][0]()
+            result = get_from_http(URL, str(self.output))
+
+        headers = {
+            call[0][0]: call[0][1] for call in request().setRawHeader.call_args_list
+        }
+        return result, headers
+
+    def interrupted(self, data: bytes, **state):
+        """Leave a partial download, as written by an interrupted attempt."""
+        self.part.write_bytes(data)
+        DownloadManifest(str(self.output), URL).save(**state)
+
+    def test_download(self):
+        result, headers = self.get(FakeReply(200, b"<doc/>", {b"ETag": b'"v1"'}))
+        self.assertEqual(result, str(self.output))
+        self.assertNotIn(b"Range", headers)
+        self.assertEqual(self.output.read_bytes(), b"<doc/>")
+        self.assertFalse(self.part.exists())
+        self.assertEqual(DownloadManifest(str(self.output), URL).state, {})
+
+    def test_resume(self):
+        self.interrupted(b"<do", etag='"v1"', last_modified=None)
+        result, headers = self.get(
+            FakeReply(206, b"c/>", {b"Content-Range": b"bytes 3-5/6"})
+        )
+        self.assertEqual(result, str(self.output))
+        self.assertEqual(headers[b"Range"], b"bytes=3-")
+        self.assertEqual(headers[b"If-Range"], b'"v1"')
+        self.assertEqual(self.output.read_bytes(), b"<doc/>")
+
+    def test_resume_changed(self):
+        # the file changed since: the server sends it again
+        self.interrupted(b"<do", etag=None, last_modified="Mon, 1 Jan 2024 00:00:00")
+        result, headers = self.get(FakeReply(200, b"<new/>"))
+        self.assertEqual(headers[b"If-Range"], b"Mon, 1 Jan 2024 00:00:00")
+        self.assertEqual(result, str(self.output))
+        self.assertEqual(self.output.read_bytes(), b"<new/>")
+
+    def test_resume_without_validator(self):
+        # the file can not be checked: start again
+        self.interrupted(b"<do", etag=None, last_modified=None)
+        result, headers = self.get(FakeReply(200, b"<doc/>"))
+        self.assertNotIn(b"Range", headers)
+        self.assertNotIn(b"If-Range", headers)
+        self.assertEqual(self.output.read_bytes(), b"<doc/>")
+
+    def test_resume_wrong_range(self):
+        self.interrupted(b"<do", etag='"v1"')
+        result, _ = self.get(
+            FakeReply(206, b"<doc/>", {b"Content-Range": b"bytes 0-5/6"})
+        )
+        self.assertIsNone(result)
+        self.assertFalse(self.output.exists())
+        # started again by the next attempt
+        self.assertFalse(self.part.exists())
+        self.assertEqual(DownloadManifest(str(self.output), URL).state, {})
+
+    def test_resume_not_satisfiable(self):
+        # the previous attempt was complete
+        self.interrupted(b"<doc/>", etag='"v1"')
+        result, _ = self.get(FakeReply(416, headers={b"Content-Range": b"bytes */6"}))
+        self.assertEqual(result, str(self.output))
+        self.assertEqual(self.output.read_bytes(), b"<doc/>")
+
+        # the file is now shorter than the partial download
+        self.interrupted(b"<doc/>", etag='"v1"')
+        result, _ = self.get(FakeReply(416, headers={b"Content-Range": b"bytes */4"}))
+        self.assertIsNone(result)
+        self.assertFalse(self.part.exists())
+        self.assertEqual(DownloadManifest(str(self.output), URL).state, {})
+
+
+# ############################################################################
+# ####### Stand-alone run ########
+# ################################
+if __name__ == "__main__":
+    unittest.main()
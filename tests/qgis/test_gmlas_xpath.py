@@ -13,9 +13,15 @@
 
 # standard library
 import unittest
+from unittest import mock
 
 # project
-from gml_application_schema_toolbox.core.gmlas_xpath import GmlAsXPathResolver
+from gml_application_schema_toolbox.core import gmlas_xpath
+from gml_application_schema_toolbox.core.gmlas_xpath import (
+    DatasourcePool,
+    GmlAsXPathResolver,
+    XPathPlan,
+)
 
 
 # ############################################################################
@@ -48,6 +54,28 @@ class TestGMLASXPath(unittest.TestCase):
         )
         self.assertEqual(sorted(v), [0.3, 4.27, 9.14, 11.58])
 
+    def test_geologylog_rows(self):
+        resolver = GmlAsXPathResolver(
+            "tests/fixtures/geology_log1.sqlite", "SQLite", ""
+        )
+        rows = resolver.resolve_xpaths(
+            "gw_geologylogcoverage",
+            "id",
+            "ab.ww.402557.log.1.coverage",
+            [
+                "element/LogValue/fromDepth/Quantity/value",
+                "element/LogValue/toDepth/Quantity/value",
+                "element/LogValue/value/DataRecord/field/Category/value/text()",
+            ],
+        )
+        self.assertEqual(
+            sorted((f, t) for f, t, _ in rows),
+            [(0.0, 0.3), (0.3, 4.27), (4.27, 9.14), (9.14, 11.58)],
+        )
+        self.assertEqual(
+            sorted(c for _, _, c in rows), ["Clay", "Gravel", "Soil", "Till"]
+        )
+
     def test_timeseries(self):
         resolver = GmlAsXPathResolver("tests/fixtures/timeseries1.sqlite", "SQLite", "")
         v = resolver.resolve_xpath(
@@ -72,6 +100,136 @@ class TestGMLASXPath(unittest.TestCase):
         )
         self.assertEqual(v, ["m"])
 
+    def test_timeseries_many(self):
+        resolver = GmlAsXPathResolver("tests/fixtures/timeseries1.sqlite", "SQLite", "")
+        pkid = "timeseries.927B7F661CE9CF9F3BF931A87E119E524A5B328F"
+        v = resolver.resolve_xpath_many(
+            "measurementtimeseries",
+            "id",
+            [pkid, "unknown"],
+            "defaultPointMetadata/DefaultTVPMeasurementMetadata/uom/@code",
+        )
+        self.assertEqual(v, {pkid: ["m"], "unknown": []})
+        v = resolver.resolve_xpath_many(
+            "measurementtimeseries", "id", [pkid], "point/MeasurementTVP/time/text()"
+        )
+        self.assertEqual(len(v[pkid]), 5000)
+
+    def test_plan_cache(self):
+        resolver = GmlAsXPathResolver("tests/fixtures/timeseries1.sqlite", "SQLite", "")
+        plan = resolver._plan(
+            "measurementtimeseries", "id", "point/MeasurementTVP/time/text()"
+        )
+        self.assertIsInstance(plan, XPathPlan)
+        self.assertIs(
+            resolver._plan(
+                "measurementtimeseries", "id", "point/MeasurementTVP/time/text()"
+            ),
+            plan,
+        )
+        self.assertIsNone(resolver._plan("measurementtimeseries", "id", "nothing"))
+
+    def test_plan_sql_literal(self):
+        plan = XPathPlan("t", "f", ["t"], [], "t.id")
+        self.assertEqual(plan.sql("a'b"), "select t.f from t where t.id = 'a''b'")
+
+
+class TestDatasourcePool(unittest.TestCase):
+    KEY = ("SQLite", "tests/fixtures/timeseries1.sqlite", "")
+
+    def setUp(self):
+        # a new object for each opened datasource
+        patcher = mock.patch.object(gmlas_xpath, "ogr")
+        ogr = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.open = ogr.GetDriverByName.return_value.Open
+        self.open.side_effect = lambda uri: mock.Mock(name=uri)
+
+    def test_reuse(self):
+        pool = DatasourcePool()
+        ds = pool.acquire(*self.KEY)
+        # a borrowed datasource is not shared
+        other = pool.acquire(*self.KEY)
+        self.assertIsNot(other, ds)
+        self.assertEqual(self.open.call_count, 2)
+
+        pool.release(*self.KEY, ds)
+        self.assertIs(pool.acquire(*self.KEY), ds)
+        self.assertIsNot(pool.acquire("SQLite", "other.sqlite", ""), ds)
+        self.assertEqual(self.open.call_count, 3)
+
+        pool.release(*self.KEY, ds)
+        pool.clear()
+        self.assertIsNot(pool.acquire(*self.KEY), ds)
+
+    def test_eviction(self):
+        pool = DatasourcePool(max_idle_time=10, max_idle_count=2)
+        with mock.patch.object(gmlas_xpath.time, "monotonic", return_value=100):
+            datasources = [pool.acquire(*self.KEY) for _ in range(3)]
+            for ds in datasources:
+                pool.release(*self.KEY, ds)
+            # the third one is closed
+            self.assertEqual(len(pool._idle[self.KEY]), 2)
+            self.assertEqual(
+                [pool.acquire(*self.KEY) for _ in range(2)], datasources[1::-1]
+            )
+
+        pool = DatasourcePool(max_idle_time=10)
+        with mock.patch.object(gmlas_xpath.time, "monotonic", return_value=100):
+            ds = pool.acquire(*self.KEY)
+            pool.release(*self.KEY, ds)
+        # idle for too long
+        with mock.patch.object(gmlas_xpath.time, "monotonic", return_value=111):
+            self.assertIsNot(pool.acquire(*self.KEY), ds)
+            self.assertEqual(pool._idle, {})
+
+    def test_release_result_sets(self):
+        ds = mock.Mock()
+        ds.ExecuteSQL.side_effect = lambda sql: []
+        pool = DatasourcePool()
+        pool.release(*self.KEY, ds)
+        with mock.patch.object(gmlas_xpath, "datasource_pool", pool):
+            provider, uri, schema = self.KEY
+            with GmlAsXPathResolver(uri, provider, schema) as resolver:
+                self.assertEqual(
+                    ds.ReleaseResultSet.call_count, ds.ExecuteSQL.call_count
+                )
+
+                # released on errors too
+                ds.ExecuteSQL.side_effect = None
+                ds.ExecuteSQL.return_value.__iter__ = mock.Mock(
+                    side_effect=RuntimeError("broken")
+                )
+                with self.assertRaises(RuntimeError):
+                    resolver._read_metadata()
+                ds.ReleaseResultSet.assert_called_with(ds.ExecuteSQL.return_value)
+            # back in the pool
+            self.assertIs(pool.acquire(*self.KEY), ds)
+
+    def test_metadata(self):
+        ds = mock.Mock()
+        ds.ExecuteSQL.side_effect = lambda sql: []
+        pool = DatasourcePool()
+        pool.release(*self.KEY, ds)
+        provider, uri, schema = self.KEY
+        with mock.patch.object(gmlas_xpath, "datasource_pool", pool):
+            with GmlAsXPathResolver(uri, provider, schema):
+                pass
+            read = ds.ExecuteSQL.call_count
+            self.assertEqual(read, 3)
+
+            # read once for all the resolvers of the database
+            with GmlAsXPathResolver(uri, provider, schema):
+                pass
+            self.assertEqual(ds.ExecuteSQL.call_count, read)
+
+            # read again once cleared
+            pool.clear()
+            pool.release(*self.KEY, ds)
+            with GmlAsXPathResolver(uri, provider, schema):
+                pass
+            self.assertEqual(ds.ExecuteSQL.call_count, 2 * read)
+
 
 # ############################################################################
 # ####### Stand-alone run ########
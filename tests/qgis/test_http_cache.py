@@ -0,0 +1,280 @@
+#! python3  # noqa E265
+
+"""
+    Usage from the repo root folder:
+
+    .. code-block:: bash
+
+        # for whole tests
+        python -m unittest tests.qgis.test_http_cache
+        # for specific test
+        python -m unittest tests.qgis.test_http_cache.TestHttpCache.test_prune
+"""
+
+# standard library
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+# project
+from gml_application_schema_toolbox.toolbelt import network_manager
+from gml_application_schema_toolbox.toolbelt.http_cache import (
+    HttpCache,
+    freshness_lifetime,
+)
+from gml_application_schema_toolbox.toolbelt.network_manager import NetworkAccessManager
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+URL = "https://example.com/wfs?request=GetCapabilities"
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class TestHttpCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.cache = HttpCache(self.tmp_dir.name, 100)
+
+    def test_key(self):
+        key = HttpCache.key("GET", URL, {b"Accept-Language": b"en"})
+        self.assertEqual(key, HttpCache.key("get", URL, {"accept-language": "en"}))
+        # headers not changing the response are ignored
+        self.assertEqual(
+            key,
+            HttpCache.key("GET", URL, {b"Accept-Language": b"en", b"User-Agent": b"a"}),
+        )
+        self.assertNotEqual(key, HttpCache.key("GET", URL, {b"Accept-Language": b"fr"}))
+        self.assertNotEqual(
+            key, HttpCache.key("HEAD", URL, {b"Accept-Language": b"en"})
+        )
+
+    def test_freshness_lifetime(self):
+        self.assertEqual(
+            freshness_lifetime({"cache-control": "public, max-age=60"}), 60
+        )
+        self.assertEqual(freshness_lifetime({"cache-control": "no-cache"}), 0)
+        self.assertEqual(
+            freshness_lifetime(
+                {
+                    "date": "Mon, 19 Oct 2026 10:00:00 GMT",
+                    "expires": "Mon, 19 Oct 2026 11:00:00 GMT",
+                }
+            ),
+            3600,
+        )
+        self.assertEqual(freshness_lifetime({}), 0)
+
+    def test_put_get(self):
+        self.cache.put("fresh", 200, {"cache-control": "max-age=60"}, b"<a/>")
+        entry = self.cache.get("fresh")
+        self.assertEqual(entry["content"], b"<a/>")
+        self.assertTrue(HttpCache.is_fresh(entry))
+
+        # stored to be revalidated, headers kept as received
+        headers = {
+            "ETag": '"v1"',
+            "etag": '"v1"',
+            "Content-Type": "text/xml",
+            "content-type": "text/xml",
+        }
+        self.cache.put("etag", 200, headers, b"<b/>")
+        entry = self.cache.get("etag")
+        self.assertEqual(entry["headers"], headers)
+        self.assertFalse(HttpCache.is_fresh(entry))
+        self.assertEqual(HttpCache.validators(entry), {b"If-None-Match": b'"v1"'})
+
+        # headers of the 304 response replace the cached ones
+        refreshed = self.cache.refresh(
+            "etag",
+            entry,
+            {
+                "Cache-Control": "max-age=60",
+                "cache-control": "max-age=60",
+                "Etag": '"v2"',
+                "etag": '"v2"',
+                "Content-Length": "0",
+                "content-length": "0",
+            },
+        )
+        self.assertEqual(
+            refreshed,
+            {
+                "Content-Type": "text/xml",
+                "content-type": "text/xml",
+                "Cache-Control": "max-age=60",
+                "cache-control": "max-age=60",
+                "Etag": '"v2"',
+                "etag": '"v2"',
+            },
+        )
+        entry = self.cache.get("etag")
+        self.assertEqual(entry["headers"], refreshed)
+        self.assertEqual(entry["content"], b"<b/>")
+        self.assertTrue(HttpCache.is_fresh(entry))
+
+        # not stored
+        self.cache.put("no-store", 200, {"cache-control": "no-store"}, b"<c/>")
+        self.cache.put("no-validator", 200, {}, b"<c/>")
+        self.cache.put("error", 404, {"cache-control": "max-age=60"}, b"<c/>")
+        self.cache.put("too-large", 200, {"cache-control": "max-age=60"}, b"c" * 101)
+        for key in ("no-store", "no-validator", "error", "too-large"):
+            self.assertIsNone(self.cache.get(key))
+
+    def test_prune(self):
+        self.cache.max_size = 130
+        headers = {"cache-control": "max-age=60"}
+        for i, key in enumerate(("a", "b", "c")):
+            self.cache.put(key, 200, headers, b"x" * 40)
+            # distinct modification times
+            os.utime(self.cache.folder / (key + ".body"), (i, time.time() - 10 + i))
+        # "a" is used, "b" is the least recently used
+        self.assertIsNotNone(self.cache.get("a"))
+
+        self.cache.put("d", 200, headers, b"x" * 40)
+        self.assertIsNone(self.cache.get("b"))
+        for key in ("a", "c", "d"):
+            self.assertIsNotNone(self.cache.get(key))
+
+        self.cache.clear()
+        self.assertEqual(list(self.cache.folder.iterdir()), [])
+        self.assertEqual(self.cache.size(), 0)
+
+    def test_size(self):
+        headers = {"cache-control": "max-age=60"}
+        with mock.patch.object(self.cache, "prune", wraps=self.cache.prune) as prune:
+            self.cache.put("a", 200, headers, b"x" * 40)
+            # replaced
+            self.cache.put("a", 200, headers, b"x" * 40)
+            self.cache.put("b", 200, headers, b"x" * 40)
+            # the folder is only read while under the maximal size
+            prune.assert_not_called()
+            self.assertEqual(self.cache.size(), 80)
+            # shared by the instances using the folder
+            self.assertEqual(HttpCache(self.tmp_dir.name, 100).size(), 80)
+
+            self.cache.put("c", 200, headers, b"x" * 40)
+            prune.assert_called_once_with()
+        self.assertEqual(self.cache.size(), 80)
+
+
+class FakeReply:
+    """Reply of a server, finished at once."""
+
+    def __init__(self, status: int, content: bytes = b"", headers: dict = None):
+        self.status = status
+        self.content = content
+        self.headers = headers or {}
+        self.finished = mock.Mock()
+        self.sslErrors = mock.Mock()
+        self.downloadProgress = mock.Mock()
+
+    def error(self):
+        return network_manager.QNetworkReply.NoError
+
+    def attribute(self, name):
+        if name == network_manager.QNetworkRequest.HttpStatusCodeAttribute:
+            return self.status
+        return None
+
+    def rawHeaderPairs(self) -> list:
+        return [(name.encode(), value.encode()) for name, value in self.headers.items()]
+
+    def readAll(self) -> bytes:
+        return self.content
+
+    def isRunning(self) -> bool:
+        return False
+
+    def deleteLater(self):
+        pass
+
+
+class TestNetworkAccessManagerCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.cache = HttpCache(self.tmp_dir.name, 1000)
+
+    def request(self, reply: FakeReply = None, **kwargs) -> tuple:
+        """Request URL, answered with reply by the server.
+
+        :return: response, content and the headers sent to the server
+        """
+        nam = NetworkAccessManager()
+        with mock.patch.object(
+            network_manager, "get_http_cache", return_value=self.cache
+        ), mock.patch.object(
+            network_manager, "QgsNetworkAccessManager"
+        ) as manager, mock.patch.object(
+            network_manager, "QNetworkRequest"
+        ) as request, mock.patch.object(
+            network_manager, "QEventLoop"
+        ) as loop:
+            manager.instance().get.return_value = reply
+            loop().exec_.side_effect = lambda *args: nam.replyFinished()
+            response, content = nam.request(URL, headers={}, **kwargs)
+
+        self.sent = manager.instance().get.call_count
+        headers = {
+            call[0][0]: call[0][1] for call in request().setRawHeader.call_args_list
+        }
+        return response, content, headers
+
+    def test_fresh(self):
+        reply = FakeReply(200, b"<a/>", {"Cache-Control": "max-age=60"})
+        _, content, _ = self.request(reply)
+        self.assertEqual(content, b"<a/>")
+
+        # served from the cache, with the same headers
+        response, content, _ = self.request()
+        self.assertEqual(self.sent, 0)
+        self.assertEqual(content, b"<a/>")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Cache-Control"], "max-age=60")
+        self.assertEqual(response.headers["cache-control"], "max-age=60")
+
+    def test_not_modified(self):
+        self.request(FakeReply(200, b"<a/>", {"ETag": '"v1"'}))
+
+        # revalidated by the server
+        reply = FakeReply(304, headers={"ETag": '"v1"', "Cache-Control": "max-age=60"})
+        response, content, headers = self.request(reply)
+        self.assertEqual(self.sent, 1)
+        self.assertEqual(headers[b"If-None-Match"], b'"v1"')
+        self.assertEqual(content, b"<a/>")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["cache-control"], "max-age=60")
+
+        # now fresh
+        _, content, _ = self.request()
+        self.assertEqual(self.sent, 0)
+        self.assertEqual(content, b"<a/>")
+
+    def test_bypass(self):
+        self.request(FakeReply(200, b"<a/>", {"Cache-Control": "max-age=60"}))
+
+        response, content, headers = self.request(
+            FakeReply(200, b"<b/>"), use_cache=False
+        )
+        self.assertEqual(self.sent, 1)
+        self.assertNotIn(b"If-None-Match", headers)
+        self.assertEqual(content, b"<b/>")
+        # the cached response is left as is
+        self.assertEqual(
+            self.cache.get(self.cache.key("GET", URL, {}))["content"], b"<a/>"
+        )
+
+
+# ############################################################################
+# ####### Stand-alone run ########
+# ################################
+if __name__ == "__main__":
+    unittest.main()
@@ -17,17 +17,162 @@
 
 
 # standard library
+import copy
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
 from pathlib import Path
+from unittest import mock
 
 # PyQGIS
-from qgis.core import QgsVectorLayer
+from osgeo import ogr
+from qgis.core import QgsGeometry, QgsOgcUtils, QgsVectorLayer
+from qgis.PyQt.QtCore import QVariant
 from qgis.testing import start_app, unittest
 
 # project
-from gml_application_schema_toolbox.core.load_gml_as_xml import load_as_xml_layer
+from gml_application_schema_toolbox.core import gml_extract, load_gml_as_xml
+from gml_application_schema_toolbox.core.gml_extract import _wkb_from_simple_gml
+from gml_application_schema_toolbox.core.load_gml_as_xml import (
+    ComplexFeatureLoaderInGpkg,
+    ComplexFeatureSource,
+    _attribute_matcher,
+    _swap_qgs_geometry,
+    load_as_xml_layer,
+    xml_from_attribute,
+)
+from gml_application_schema_toolbox.core.xml_utils import (
+    no_prefix,
+    remove_prefix,
+    resolve_xpath,
+)
 
 # start_app()
 
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+FEATURE = """<app:Station xmlns:app="urn:app" xmlns:xlink="http://www.w3.org/1999/xlink">
+  <app:name>Station 1</app:name>
+  <app:count>12</app:count>
+  <app:measure><app:value>1.5</app:value><app:unit>m</app:unit></app:measure>
+  <app:measure><app:value>2.5</app:value><app:unit>cm</app:unit></app:measure>
+  <app:link xlink:href="http://example.com/s1">S1</app:link>
+</app:Station>"""
+
+GML_NS = 'xmlns:gml="http://www.opengis.net/gml"'
+
+SIMPLE_GEOMETRIES = (
+    "<gml:Point {}><gml:pos>1 2</gml:pos></gml:Point>".format(GML_NS),
+    "<gml:Point {}><gml:coordinates>1,2</gml:coordinates></gml:Point>".format(GML_NS),
+    "<gml:LineString {}><gml:posList>0 0 1 1 2 0</gml:posList></gml:LineString>".format(
+        GML_NS
+    ),
+    "<gml:LineString {}><gml:name>l</gml:name>"
+    "<gml:coordinates>0,0 1,1 2,0</gml:coordinates></gml:LineString>".format(GML_NS),
+    "<gml:Polygon {}>"
+    "<gml:exterior><gml:LinearRing>"
+    "<gml:posList>0 0 10 0 10 10 0 10 0 0</gml:posList>"
+    "</gml:LinearRing></gml:exterior>"
+    "<gml:interior><gml:LinearRing>"
+    "<gml:posList>1 1 2 1 2 2 1 1</gml:posList>"
+    "</gml:LinearRing></gml:interior>"
+    "<gml:interior><gml:LinearRing>"
+    "<gml:pos>5 5</gml:pos><gml:pos>6 5</gml:pos><gml:pos>6 6</gml:pos>"
+    "<gml:pos>5 5</gml:pos>"
+    "</gml:LinearRing></gml:interior>"
+    "</gml:Polygon>".format(GML_NS),
+    # GML 2
+    "<gml:Polygon {}>"
+    "<gml:innerBoundaryIs><gml:LinearRing>"
+    "<gml:coordinates>1,1 2,1 2,2 1,1</gml:coordinates>"
+    "</gml:LinearRing></gml:innerBoundaryIs>"
+    "<gml:outerBoundaryIs><gml:LinearRing>"
+    "<gml:coordinates>0,0 10,0 10,10 0,10 0,0</gml:coordinates>"
+    "</gml:LinearRing></gml:outerBoundaryIs>"
+    "</gml:Polygon>".format(GML_NS),
+)
+
+GEOMETRIES_3D = (
+    '<gml:Point {} srsDimension="3"><gml:pos>1 2 3</gml:pos></gml:Point>'.format(
+        GML_NS
+    ),
+    "<gml:LineString {}>"
+    '<gml:posList srsDimension="3">0 0 1 1 1 2 2 0 3</gml:posList>'
+    "</gml:LineString>".format(GML_NS),
+    "<gml:LineString {}><gml:coordinates>0,0,1 1,1,2</gml:coordinates>"
+    "</gml:LineString>".format(GML_NS),
+    '<gml:Polygon {} srsDimension="3">'
+    "<gml:exterior><gml:LinearRing>"
+    "<gml:posList>0 0 1 10 0 1 10 10 1 0 0 1</gml:posList>"
+    "</gml:LinearRing></gml:exterior>"
+    "<gml:interior><gml:LinearRing>"
+    "<gml:posList>1 1 1 2 1 1 2 2 1 1 1 1</gml:posList>"
+    "</gml:LinearRing></gml:interior>"
+    "</gml:Polygon>".format(GML_NS),
+)
+
+# parsed by QGIS or OGR
+FALLBACK_GEOMETRIES = (
+    # custom separators
+    '<gml:Point {}><gml:coordinates cs=";" ts="|">1;2</gml:coordinates>'
+    "</gml:Point>".format(GML_NS),
+    '<gml:LineString {}><gml:coordinates cs=" " ts=";">0 0;1 1;2 0</gml:coordinates>'
+    "</gml:LineString>".format(GML_NS),
+    # not made of plain coordinates
+    "<gml:MultiPoint {}><gml:pointMember><gml:Point><gml:pos>1 2</gml:pos>"
+    "</gml:Point></gml:pointMember></gml:MultiPoint>".format(GML_NS),
+    "<gml:Curve {}><gml:segments><gml:LineStringSegment>"
+    "<gml:posList>0 0 1 1</gml:posList>"
+    "</gml:LineStringSegment></gml:segments></gml:Curve>".format(GML_NS),
+    "<gml:Polygon {}><gml:exterior><gml:Ring><gml:curveMember><gml:LineString>"
+    "<gml:posList>0 0 10 0 10 10 0 0</gml:posList>"
+    "</gml:LineString></gml:curveMember></gml:Ring></gml:exterior>"
+    "</gml:Polygon>".format(GML_NS),
+    # mixed dimensions
+    "<gml:LineString {}><gml:pos>0 0</gml:pos>"
+    '<gml:pos srsDimension="3">1 1 1</gml:pos></gml:LineString>'.format(GML_NS),
+    # not a point
+    "<gml:Point {}><gml:pos>1 2 3 4</gml:pos></gml:Point>".format(GML_NS),
+)
+
+
+def qgs_geometry_from_wkb(wkb):
+    geom = QgsGeometry()
+    geom.fromWkb(wkb)
+    return geom
+
+
+def resolve_xpath_value(feature, xpath, value_type):
+    """Attribute value computed as before XPathAttributeMatcher: resolve_xpath on
+    a copy of the feature without namespaces, then conversion."""
+    feature = copy.deepcopy(feature)
+    remove_prefix(feature)
+    r = resolve_xpath(feature, xpath)
+    if isinstance(r, str):
+        v = r
+    elif isinstance(r, list):
+        v = "[" + ";".join([n.text for n in r]) + "]"
+    elif isinstance(r, ET.Element):
+        v = r.text
+    else:
+        return None
+    if v is None:
+        return None
+    try:
+        if value_type == QVariant.Int:
+            return int(v)
+        elif value_type == QVariant.String:
+            return v
+        elif value_type == QVariant.Double:
+            return float(v)
+        elif value_type == QVariant.DateTime:
+            return v
+    except ValueError:
+        pass
+    return None
+
 
 # ############################################################################
 # ########## Classes #############
@@ -52,6 +197,314 @@ class TestLoadAsXML(unittest.TestCase):
             self.assertEqual(layer.isValid(), True)
             self.assertEqual(layer.featureCount(), 50)
 
+    def test_load_as_xml_layer_streaming(self):
+        sample_file = Path("tests/fixtures/brgm_ef_piezo_50_2.xml")
+
+        layer_gmloaded = load_as_xml_layer(
+            xml_uri=str(sample_file.resolve()),
+            is_remote=False,
+            output_local_file="/tmp/gmlas_test_load_gml_streaming.gpkg",
+            streaming=True,
+        )
+
+        self.assertIsInstance(layer_gmloaded, dict)
+        self.assertEqual(len(layer_gmloaded), 2)
+
+        for layer in layer_gmloaded.values():
+            self.assertIsInstance(layer, QgsVectorLayer)
+            self.assertEqual(layer.isValid(), True)
+            self.assertEqual(layer.featureCount(), 50)
+
+    def test_load_as_xml_layer_chunked(self):
+        sample_file = Path("tests/fixtures/brgm_ef_piezo_50_2.xml")
+
+        # chunk size which does not divide the number of features
+        layer_gmloaded = load_as_xml_layer(
+            xml_uri=str(sample_file.resolve()),
+            is_remote=False,
+            output_local_file="/tmp/gmlas_test_load_gml_chunked.gpkg",
+            chunk_size=7,
+        )
+
+        self.assertEqual(len(layer_gmloaded), 2)
+        for layer in layer_gmloaded.values():
+            self.assertEqual(layer.isValid(), True)
+            self.assertEqual(layer.featureCount(), 50)
+
+    def test_load_as_xml_layer_workers(self):
+        sample_file = Path("tests/fixtures/brgm_ef_piezo_50_2.xml")
+
+        layer_gmloaded = load_as_xml_layer(
+            xml_uri=str(sample_file.resolve()),
+            is_remote=False,
+            output_local_file="/tmp/gmlas_test_load_gml_workers.gpkg",
+            streaming=True,
+            workers=2,
+        )
+
+        self.assertEqual(len(layer_gmloaded), 2)
+        for layer in layer_gmloaded.values():
+            self.assertEqual(layer.isValid(), True)
+            self.assertEqual(layer.featureCount(), 50)
+
+    def test_load_as_xml_layer_remote(self):
+        sample_file = Path("tests/fixtures/brgm_ef_piezo_50_2.xml")
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        # document downloaded by remote_open_from_qgis
+        downloaded = Path(tmp_dir.name) / "downloaded.xml"
+        opened = []
+
+        def remote_open(uri, resumable):
+            self.assertTrue(resumable)
+            opened.append(downloaded.open("rb"))
+            return opened[-1]
+
+        def load():
+            return load_as_xml_layer(
+                xml_uri="https://example.com/wfs?request=GetFeature",
+                is_remote=True,
+                output_local_file="/tmp/gmlas_test_load_gml_remote.gpkg",
+            )
+
+        with mock.patch.object(
+            load_gml_as_xml, "remote_open_from_qgis", side_effect=remote_open
+        ):
+            shutil.copy(sample_file, downloaded)
+            self.assertEqual(len(load()), 2)
+            # the downloaded document is closed and removed once loaded
+            self.assertTrue(opened[-1].closed)
+            self.assertFalse(downloaded.exists())
+
+            # also when it cannot be loaded
+            downloaded.write_text("<not closed")
+            with self.assertRaises(ET.ParseError):
+                load()
+            self.assertTrue(opened[-1].closed)
+            self.assertFalse(downloaded.exists())
+
+        # failed download
+        with mock.patch.object(
+            load_gml_as_xml, "remote_open_from_qgis", return_value=None
+        ):
+            with self.assertRaises(RuntimeError):
+                load()
+
+    def test_complex_feature_source_workers(self):
+        sample_file = Path("tests/fixtures/brgm_ef_piezo_50_2.xml")
+        mapping = {
+            "local_id": ("inspireId/Identifier/localId/text()", QVariant.String),
+            "media": ("mediaMonitored[@title='water']", QVariant.String),
+            "resource": ("onlineResource", QVariant.String),
+        }
+
+        def features(streaming, workers):
+            with open(sample_file, "rb") as xml:
+                src = ComplexFeatureSource(
+                    xml, mapping, streaming=streaming, workers=workers
+                )
+                return [
+                    (
+                        i,
+                        fid,
+                        [((g.asWkt(), srid), tag) for (g, srid), tag in geoms],
+                        ET.tostring(feature),
+                        attrs,
+                    )
+                    for i, fid, geoms, feature, attrs in src.getFeatures()
+                ]
+
+        expected = features(streaming=False, workers=1)
+        self.assertEqual(len(expected), 50)
+        for streaming in (False, True):
+            with self.subTest(streaming=streaming):
+                # same features, in the same order, with or without workers
+                self.assertEqual(features(streaming, workers=2), expected)
+
+                # serialized features, as sent to the workers
+                for workers in (1, 2):
+                    with open(sample_file, "rb") as xml:
+                        src = ComplexFeatureSource(
+                            xml, mapping, streaming=streaming, workers=workers
+                        )
+                        serialized = [
+                            xml
+                            for _, _, _, _, xml, _ in src.getFeatures(serialized=True)
+                        ]
+                    self.assertEqual(serialized, [f[3] for f in expected])
+
+    def test_load_as_xml_layer_compressed(self):
+        sample_file = Path("tests/fixtures/brgm_ef_piezo_50_2.xml")
+
+        layer_gmloaded = load_as_xml_layer(
+            xml_uri=str(sample_file.resolve()),
+            is_remote=False,
+            output_local_file="/tmp/gmlas_test_load_gml_compressed.gpkg",
+            compress_xml=True,
+        )
+
+        self.assertEqual(len(layer_gmloaded), 2)
+        for layer in layer_gmloaded.values():
+            self.assertEqual(layer.isValid(), True)
+            self.assertEqual(layer.featureCount(), 50)
+            for feature in layer.getFeatures():
+                # the _xml_ column reads back as an XML document
+                xml = ET.fromstring(xml_from_attribute(feature["_xml_"]))
+                self.assertIsInstance(xml, ET.Element)
+
+    def test_xml_compression_round_trip(self):
+        feature = ET.fromstring(FEATURE)
+        expected = ET.tostring(feature).decode("utf8")
+
+        for compress_xml in (False, True):
+            with self.subTest(compress_xml=compress_xml):
+                loader = ComplexFeatureLoaderInGpkg(
+                    "/tmp/gmlas_test_round_trip.gpkg", compress_xml=compress_xml
+                )
+                value = loader._xml_value(ET.tostring(feature))
+                self.assertEqual(isinstance(value, str), not compress_xml)
+                self.assertEqual(xml_from_attribute(value), expected)
+
+    def test_xpath_attribute_matcher(self):
+        feature = ET.fromstring(FEATURE)
+        unprefixed = copy.deepcopy(feature)
+        remove_prefix(unprefixed)
+
+        for xpath, value_type in (
+            ("name/text()", QVariant.String),
+            ("name", QVariant.String),
+            ("name/text()", QVariant.DateTime),
+            ("count/text()", QVariant.Int),
+            ("count", QVariant.Double),
+            ("measure[1]/value/text()", QVariant.Double),
+            ("measure[unit='cm']/value", QVariant.Double),
+            ("measure/value", QVariant.String),
+            # failed conversions
+            ("name/text()", QVariant.Int),
+            ("measure[1]/value", QVariant.Int),
+            ("measure/value", QVariant.Double),
+            # unsupported type
+            ("name", QVariant.Bool),
+            # no match
+            ("missing/text()", QVariant.String),
+            ("missing", QVariant.String),
+            # attribute predicates, evaluated on a copy without namespaces
+            ("link[@href='http://example.com/s1']", QVariant.String),
+            ("link[@href]/text()", QVariant.String),
+            ("link[@href='other']", QVariant.String),
+        ):
+            with self.subTest(xpath=xpath, value_type=value_type):
+                matcher = _attribute_matcher(xpath, value_type)
+                self.assertEqual(matcher.needs_copy, "@" in xpath)
+                self.assertEqual(
+                    matcher.value(unprefixed if matcher.needs_copy else feature),
+                    resolve_xpath_value(feature, xpath, value_type),
+                )
+
+        # several text() values, the former code failed to join them
+        matcher = _attribute_matcher("measure/value/text()", QVariant.String)
+        self.assertEqual(matcher.value(feature), "[1.5;2.5]")
+
+    def srids(self, feature: str) -> dict:
+        """Return the srid of each geometry of a feature, by tag of its parent"""
+        geoms = gml_extract._extractGmlGeometries(ET.fromstring(feature), False)
+        return {no_prefix(tag): srid for (_, srid, _), tag in geoms}
+
+    def test_geometry_srs_name_inherited(self):
+        gml_extract._get_srid_from_name.cache_clear()
+        srids = self.srids(
+            '<app:F xmlns:app="urn:app" {}>'
+            '<app:geometries srsName="EPSG:2154">'
+            "<app:a><gml:Point><gml:pos>1 2</gml:pos></gml:Point></app:a>"
+            "<app:b><gml:Point><gml:pos>3 4</gml:pos></gml:Point></app:b>"
+            '<app:c><gml:Point srsName="EPSG:3857"><gml:pos>5 6</gml:pos></gml:Point>'
+            "</app:c></app:geometries></app:F>".format(GML_NS)
+        )
+        # from the ancestor, unless the geometry has its own srsName
+        self.assertEqual(srids, {"a": 2154, "b": 2154, "c": 3857})
+        # the EPSG database is read once for each srsName
+        cache_info = gml_extract._get_srid_from_name.cache_info()
+        self.assertEqual((cache_info.misses, cache_info.hits), (2, 1))
+
+    def test_geometry_srs_name_precedence(self):
+        ring = (
+            '<gml:exterior><gml:LinearRing srsName="EPSG:3857">'
+            "<gml:posList>0 0 1 0 1 1 0 0</gml:posList>"
+            "</gml:LinearRing></gml:exterior>"
+        )
+        srids = self.srids(
+            '<app:F xmlns:app="urn:app" {}>'
+            '<app:geometries srsName="EPSG:2154">'
+            "<app:a><gml:Polygon>{}</gml:Polygon></app:a></app:geometries>"
+            "<app:b><gml:Polygon>{}</gml:Polygon></app:b></app:F>".format(
+                GML_NS, ring, ring
+            )
+        )
+        # the ancestor wins over a descendant of the geometry
+        self.assertEqual(srids, {"a": 2154, "b": 3857})
+
+    def test_wkb_from_simple_gml(self):
+        for gml in SIMPLE_GEOMETRIES:
+            for swap_xy in (False, True):
+                with self.subTest(gml=gml, swap_xy=swap_xy):
+                    wkb = _wkb_from_simple_gml(ET.fromstring(gml), swap_xy)
+                    self.assertIsNotNone(wkb)
+
+                    # same geometry as the one parsed by QGIS
+                    expected = QgsOgcUtils.geometryFromGML(gml)
+                    if swap_xy:
+                        expected = _swap_qgs_geometry(expected)
+                    self.assertEqual(
+                        qgs_geometry_from_wkb(wkb).asWkt(), expected.asWkt()
+                    )
+
+    def test_wkb_from_simple_gml_3d(self):
+        # QgsOgcUtils only builds 2D geometries, compare with OGR
+        for gml in GEOMETRIES_3D:
+            for swap_xy in (False, True):
+                with self.subTest(gml=gml, swap_xy=swap_xy):
+                    wkb = _wkb_from_simple_gml(ET.fromstring(gml), swap_xy)
+                    geom = qgs_geometry_from_wkb(wkb)
+                    self.assertTrue(geom.constGet().is3D())
+
+                    expected = qgs_geometry_from_wkb(
+                        ogr.CreateGeometryFromGML(gml).ExportToIsoWkb()
+                    )
+                    if swap_xy:
+                        expected = _swap_qgs_geometry(expected)
+                    self.assertEqual(geom.asWkt(), expected.asWkt())
+
+    def test_wkb_from_simple_gml_fallback(self):
+        for gml in FALLBACK_GEOMETRIES:
+            with self.subTest(gml=gml):
+                self.assertIsNone(_wkb_from_simple_gml(ET.fromstring(gml), False))
+
+        # custom separators are still parsed, by OGR
+        for gml in FALLBACK_GEOMETRIES[:2]:
+            with self.subTest(gml=gml):
+                self.assertEqual(
+                    qgs_geometry_from_wkb(
+                        ogr.CreateGeometryFromGML(gml).ExportToIsoWkb()
+                    ).asWkt(),
+                    QgsOgcUtils.geometryFromGML(gml).asWkt(),
+                )
+
+    def test_swap_qgs_geometry(self):
+        for wkt, expected in (
+            ("Point (1 2)", "Point (2 1)"),
+            ("LineString ZM (1 2 3 4, 5 6 7 8)", "LineString ZM (2 1 3 4, 6 5 7 8)"),
+            (
+                "CircularString (1 2, 3 4, 5 6)",
+                "CircularString (2 1, 4 3, 6 5)",
+            ),
+            (
+                "MultiPolygon Z (((0 1 9, 0 2 9, 3 2 9, 0 1 9)))",
+                "MultiPolygon Z (((1 0 9, 2 0 9, 2 3 9, 1 0 9)))",
+            ),
+        ):
+            geom = _swap_qgs_geometry(QgsGeometry.fromWkt(wkt))
+            self.assertEqual(geom.asWkt(), expected)
+
 
 # ############################################################################
 # ####### Stand-alone run ########
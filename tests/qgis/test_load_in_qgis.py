@@ -16,8 +16,10 @@
 """
 
 # standard library
+import os
 import tempfile
 from pathlib import Path
+from unittest import mock
 
 # 3rd party
 from osgeo import gdal, osr
@@ -27,7 +29,9 @@ from qgis.core import QgsCoordinateReferenceSystem, QgsProject
 from qgis.testing import unittest
 
 # project
+from gml_application_schema_toolbox.core import load_gmlas_in_qgis
 from gml_application_schema_toolbox.core.load_gmlas_in_qgis import import_in_qgis
+from gml_application_schema_toolbox.core.xml_utils import no_ns
 
 
 # ############################################################################
@@ -36,7 +40,7 @@ from gml_application_schema_toolbox.core.load_gmlas_in_qgis import import_in_qgi
 class TestLoadInQGIS(unittest.TestCase):
     """Tests."""
 
-    def convert_and_import(self, xml_file):
+    def convert_and_import(self, xml_file, lazy: bool = False):
         # GMLAS configuration file
         config_file = Path("tests/fixtures/gmlasconf.xml")
         self.assertTrue(config_file.is_file())
@@ -79,8 +83,14 @@ class TestLoadInQGIS(unittest.TestCase):
         # fix geometry types
         ds = None
         # populate the qgis project
-        import_in_qgis(gmlas_uri=out_file, provider="SQLite", add_form_code=True)
+        self.gmlas_uri = out_file
+        self.gmlas_import = import_in_qgis(
+            gmlas_uri=out_file, provider="SQLite", add_form_code=True, lazy=lazy
+        )
+
+        return self.project_content()
 
+    def project_content(self):
         layers = []
         for lid in sorted(QgsProject.instance().mapLayers().keys()):
             vl = QgsProject.instance().mapLayer(lid)
@@ -230,6 +240,117 @@ class TestLoadInQGIS(unittest.TestCase):
         self.assertEqual(len(relations), len(imported_relations))
         self.assertListEqual(relations, imported_relations)
 
+    def test_load_waterml2_lazy(self):
+        sample_file = Path(
+            "tests/fixtures/BRGM_raw_database_observation_waterml2_output.xml"
+        )
+        self.assertTrue(sample_file.is_file())
+
+        layers, relations = self.convert_and_import(sample_file)
+        lazy_layers, lazy_relations = self.convert_and_import(sample_file, lazy=True)
+
+        # only top-level layers are loaded
+        self.assertIn(("om_observation", 100), lazy_layers)
+        self.assertNotIn(("measurementtimeseries_point", 100), lazy_layers)
+        self.assertLess(len(lazy_layers), len(layers))
+
+        # load child layers until the whole project is loaded
+        while True:
+            loaded = self.project_content()
+            for layer in list(QgsProject.instance().mapLayers().values()):
+                self.gmlas_import.load_children(layer)
+            if self.project_content() == loaded:
+                break
+
+        lazy_layers, lazy_relations = loaded
+        self.assertListEqual(layers, lazy_layers)
+        self.assertListEqual(relations, lazy_relations)
+
+    def test_load_waterml2_lazy_on_demand(self):
+        sample_file = Path(
+            "tests/fixtures/BRGM_raw_database_observation_waterml2_output.xml"
+        )
+        self.assertTrue(sample_file.is_file())
+
+        layers, relations = self.convert_and_import(sample_file, lazy=True)
+        self.assertNotIn(("measurementtimeseries_point", 100), layers)
+
+        # a child layer is loaded with its parent layers
+        for ln, lyr in self.gmlas_import.layers.items():
+            if lyr["layer_name"] == "measurementtimeseries_point":
+                break
+        layer = self.gmlas_import.load_layer(ln)
+        self.assertIsNotNone(layer)
+        self.assertIn(("measurementtimeseries_point", 100), self.project_content()[0])
+        self.assertIs(self.gmlas_import.layer_by_xpath(no_ns(lyr["xpath"])), layer)
+
+        # removed layers are loaded again by their parent layer
+        loaded = self.project_content()
+        QgsProject.instance().removeMapLayer(layer.id())
+        self.assertNotEqual(self.project_content(), loaded)
+        for layer in list(QgsProject.instance().mapLayers().values()):
+            self.gmlas_import.load_children(layer)
+        self.assertEqual(self.project_content(), loaded)
+
+    def test_load_waterml2_cached(self):
+        sample_file = Path(
+            "tests/fixtures/BRGM_raw_database_observation_waterml2_output.xml"
+        )
+        self.assertTrue(sample_file.is_file())
+
+        layers, relations = self.convert_and_import(sample_file)
+        cache_folder = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_folder.cleanup)
+
+        with mock.patch.object(
+            load_gmlas_in_qgis,
+            "skeleton_cache_folder",
+            return_value=Path(cache_folder.name),
+        ):
+            for _ in range(2):
+                QgsProject.instance().clear()
+                import_in_qgis(
+                    gmlas_uri=self.gmlas_uri,
+                    provider="SQLite",
+                    add_form_code=True,
+                    use_cache=True,
+                )
+                # nothing is written next to the database
+                self.assertFalse(Path(self.gmlas_uri + ".skeleton.json").exists())
+                self.assertEqual(len(list(Path(cache_folder.name).iterdir())), 1)
+                cached_layers, cached_relations = self.project_content()
+                self.assertListEqual(layers, cached_layers)
+                self.assertListEqual(relations, cached_relations)
+
+            # the metadata tables are not read from the cache
+            with mock.patch.object(
+                load_gmlas_in_qgis, "GmlasMetadata", side_effect=AssertionError
+            ):
+                QgsProject.instance().clear()
+                import_in_qgis(
+                    gmlas_uri=self.gmlas_uri,
+                    provider="SQLite",
+                    add_form_code=True,
+                    use_cache=True,
+                )
+                self.assertListEqual(layers, self.project_content()[0])
+
+            # a modified database is read again
+            os.utime(self.gmlas_uri, ns=(0, 0))
+            with mock.patch.object(
+                load_gmlas_in_qgis,
+                "GmlasMetadata",
+                wraps=load_gmlas_in_qgis.GmlasMetadata,
+            ) as metadata:
+                QgsProject.instance().clear()
+                import_in_qgis(
+                    gmlas_uri=self.gmlas_uri,
+                    provider="SQLite",
+                    add_form_code=True,
+                    use_cache=True,
+                )
+                metadata.assert_called_once()
+
     def test_load_multiple_geometries(self):
         sample_file = Path("tests/fixtures/EUReg.example.xml")
         self.assertTrue(sample_file.is_file())
@@ -0,0 +1,196 @@
+#! python3  # noqa E265
+
+"""
+    Usage from the repo root folder:
+
+    .. code-block:: bash
+
+        # for whole tests
+        python -m unittest tests.qgis.test_load_tasks
+        # for specific test
+        python -m unittest tests.qgis.test_load_tasks.TestLoadTasks.test_start_task
+"""
+
+# standard library
+from pathlib import Path
+from unittest import mock
+
+# PyQGIS
+from qgis.testing import unittest
+
+# project
+from gml_application_schema_toolbox.__about__ import __title__
+from gml_application_schema_toolbox.gui import InputError, load_tasks
+from gml_application_schema_toolbox.gui.load_tasks import (
+    GmlLoadTask,
+    ImportGmlasTask,
+    LoadXmlTask,
+    start_task,
+)
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class DummyTask(GmlLoadTask):
+    def __init__(self, error=None, on_finished=None):
+        super().__init__("Dummy load", on_finished)
+        self.error = error
+        self.added = False
+
+    def load(self):
+        if self.error is not None:
+            raise self.error
+
+    def add_to_project(self):
+        self.added = True
+
+
+class TestLoadTasks(unittest.TestCase):
+    def setUp(self):
+        # no message box during tests
+        patcher = mock.patch.object(load_tasks, "QMessageBox")
+        self.message_box = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_gml_load_task(self):
+        on_finished = mock.Mock()
+        task = DummyTask(on_finished=on_finished)
+        self.assertTrue(task.run())
+        task.finished(True)
+        self.assertTrue(task.added)
+        on_finished.assert_called_once_with(task)
+        self.message_box.warning.assert_not_called()
+
+    def test_gml_load_task_error(self):
+        on_finished = mock.Mock()
+        task = DummyTask(RuntimeError("boom"), on_finished)
+        self.assertFalse(task.run())
+        self.assertIsInstance(task.exception, RuntimeError)
+        task.finished(False)
+        self.assertFalse(task.added)
+        on_finished.assert_not_called()
+        self.message_box.warning.assert_called_once_with(None, __title__, "boom")
+
+        # errors of the callback are reported as well
+        task = DummyTask(on_finished=mock.Mock(side_effect=RuntimeError("late")))
+        self.assertTrue(task.run())
+        task.finished(True)
+        self.assertIsInstance(task.exception, RuntimeError)
+        self.message_box.warning.assert_called_with(None, __title__, "late")
+
+        # input errors show their own message
+        task = DummyTask(InputError("bad input"))
+        self.assertFalse(task.run())
+        with mock.patch.object(InputError, "show") as show:
+            task.finished(False)
+        show.assert_called_once_with()
+        self.assertEqual(self.message_box.warning.call_count, 2)
+
+    def test_gml_load_task_cancel(self):
+        on_finished = mock.Mock()
+        task = DummyTask(on_finished=on_finished)
+        task.cancel()
+        # the feedback given to the loading functions is canceled too
+        self.assertTrue(task.feedback.isCanceled())
+        self.assertFalse(task.run())
+        task.finished(False)
+        on_finished.assert_not_called()
+        self.message_box.warning.assert_not_called()
+
+    def test_load_xml_task(self):
+        sample_file = Path("tests/fixtures/brgm_ef_piezo_50_2.xml")
+
+        task = LoadXmlTask(
+            str(sample_file.resolve()),
+            dict(output_local_file="/tmp/gmlas_test_load_task.gpkg", streaming=True),
+        )
+        self.assertTrue(task.run())
+        self.assertIsNone(task.exception)
+        self.assertEqual(len(task.layers), 2)
+        for layer in task.layers.values():
+            self.assertEqual(layer.isValid(), True)
+            self.assertEqual(layer.featureCount(), 50)
+
+    def test_load_xml_task_options(self):
+        with mock.patch.object(
+            load_tasks, "load_as_xml_layer", return_value={}
+        ) as load_as_xml_layer:
+            for path, is_remote in (
+                ("/tmp/doc.xml", False),
+                ("http://example.com/wfs?request=GetFeature", True),
+                ("https://example.com/doc.xml", True),
+            ):
+                task = LoadXmlTask(path, dict(swap_xy=True, compress_xml=True))
+                self.assertTrue(task.run())
+                load_as_xml_layer.assert_called_with(
+                    path,
+                    is_remote=is_remote,
+                    feedback=task.feedback,
+                    swap_xy=True,
+                    compress_xml=True,
+                )
+
+    def test_import_gmlas_task(self):
+        translate = mock.Mock()
+        params = {"destNameOrDestDS": "/tmp/gmlas_test_import_task.sqlite"}
+        import_args = {"gmlas_uri": "/tmp/gmlas_test_import_task.sqlite"}
+
+        with mock.patch.object(
+            load_tasks, "import_in_qgis"
+        ) as import_in_qgis, mock.patch.object(load_tasks, "datasource_pool") as pool:
+            # conversion only
+            task = ImportGmlasTask(translate, params)
+            self.assertTrue(task.run())
+            translate.assert_called_once_with(params, task.feedback)
+            task.finished(True)
+            import_in_qgis.assert_not_called()
+            # metadata of the replaced database forgotten
+            pool.clear.assert_called_once_with()
+
+            # layers loaded once converted
+            task = ImportGmlasTask(translate, params, import_args)
+            self.assertTrue(task.run())
+            task.finished(True)
+            import_in_qgis.assert_called_once_with(**import_args)
+            # kept to load child layers on demand
+            self.assertIs(task.gmlas_import, import_in_qgis.return_value)
+
+    def test_import_gmlas_task_error(self):
+        translate = mock.Mock(side_effect=RuntimeError("conversion failed"))
+        task = ImportGmlasTask(translate, {}, {})
+
+        with mock.patch.object(load_tasks, "gdal") as gdal, mock.patch.object(
+            load_tasks, "import_in_qgis"
+        ) as import_in_qgis:
+            self.assertFalse(task.run())
+            # the GDAL error handler is removed even on errors
+            gdal.PushErrorHandler.assert_called_once()
+            gdal.PopErrorHandler.assert_called_once_with()
+            task.finished(False)
+
+        import_in_qgis.assert_not_called()
+        self.message_box.warning.assert_called_once_with(
+            None, __title__, "conversion failed"
+        )
+
+    def test_start_task(self):
+        with mock.patch.object(load_tasks, "QgsApplication") as application:
+            for signal in ("taskCompleted", "taskTerminated"):
+                with self.subTest(signal=signal):
+                    task = DummyTask()
+                    self.assertIs(start_task(task), task)
+                    application.taskManager().addTask.assert_called_with(task)
+                    # kept alive while running
+                    self.assertIn(task, load_tasks._running_tasks)
+
+                    getattr(task, signal).emit()
+                    self.assertNotIn(task, load_tasks._running_tasks)
+
+
+# ############################################################################
+# ####### Stand-alone run ########
+# ################################
+if __name__ == "__main__":
+    unittest.main()
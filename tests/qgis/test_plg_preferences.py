@@ -51,6 +51,15 @@ class TestPlgPreferences(unittest.TestCase):
         self.assertTrue(hasattr(settings, "network_max_features"))
         self.assertIsInstance(settings.network_max_features, int)
         self.assertEqual(settings.network_max_features, 100)
+        self.assertTrue(hasattr(settings, "network_page_size"))
+        self.assertIsInstance(settings.network_page_size, int)
+        self.assertEqual(settings.network_page_size, 1000)
+        self.assertTrue(hasattr(settings, "network_download_workers"))
+        self.assertIsInstance(settings.network_download_workers, int)
+        self.assertEqual(settings.network_download_workers, 4)
+        self.assertTrue(hasattr(settings, "network_cache_size"))
+        self.assertIsInstance(settings.network_cache_size, int)
+        self.assertEqual(settings.network_cache_size, 100)
 
         # usage
         self.assertTrue(hasattr(settings, "impex_access_mode"))
@@ -0,0 +1,387 @@
+#! python3  # noqa E265
+
+"""
+    Usage from the repo root folder:
+
+    .. code-block:: bash
+
+        # for whole tests
+        python -m unittest tests.qgis.test_wfs_download
+        # for specific test
+        python -m unittest tests.qgis.test_wfs_download.TestWfsDownload.test_merge_feature_collections
+"""
+
+# standard library
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+# 3rd party
+import requests
+from owslib.feature.wfs100 import WebFeatureService_1_0_0
+from owslib.util import ServiceException
+
+# project
+from gml_application_schema_toolbox.core import wfs_download
+from gml_application_schema_toolbox.core.wfs_download import (
+    SNIFF_SIZE,
+    check_exception,
+    download_features,
+    download_features_paged,
+    download_features_tiled,
+    fetch_page,
+    merge_feature_collections,
+    page_summary,
+    server_limit,
+    split_bbox,
+)
+from gml_application_schema_toolbox.toolbelt.file_downloader import DownloadManifest
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+GML_ID = "{http://www.opengis.net/gml/3.2}id"
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class Wfs100(WebFeatureService_1_0_0):
+    """Fake WFS 1.0.0 service, without capabilities."""
+
+    def __new__(cls):
+        return object.__new__(cls)
+
+    def __init__(self):
+        self.version = "1.0.0"
+
+    def getOperationByName(self, name):
+        return SimpleNamespace(
+            methods=[{"type": "Get", "url": "http://example.com/wfs"}]
+        )
+
+
+class CappedWfs:
+    """Fake WFS 2.0 server, returning at most max_count features per request."""
+
+    def __init__(self, write_page, features: int, max_count: int, matched=True):
+        self.write_page = write_page
+        self.features = features
+        self.max_count = max_count
+        self.matched = matched
+        self.requests = []
+
+    def getGETGetFeatureRequest(self, startindex=0, maxfeatures=None, **params):
+        return "http://example.com/wfs?startindex={}&count={}".format(
+            startindex, maxfeatures
+        )
+
+    def fetch_page(self, url: str, path: str) -> str:
+        query = parse_qs(urlparse(url).query)
+        start = int(query["startindex"][0])
+        count = min(int(query["count"][0]), self.max_count)
+        self.requests.append((start, count))
+        return self.write_page(
+            Path(path).name,
+            ["f{}".format(i) for i in range(start, min(start + count, self.features))],
+            self.features if self.matched else "unknown",
+            path,
+        )
+
+
+class TiledWfs(CappedWfs):
+    """Fake WFS 2.0 server, with features on a 25 x 20 grid."""
+
+    def __init__(self, *args, capabilities=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if capabilities is not None:
+            self._capabilities = ET.fromstring(capabilities)
+
+    def getGETGetFeatureRequest(self, bbox, maxfeatures=None, **params):
+        return "http://example.com/wfs?bbox={}&count={}".format(
+            ",".join(str(c) for c in bbox[:4]), maxfeatures
+        )
+
+    def fetch_page(self, url: str, path: str) -> str:
+        query = parse_qs(urlparse(url).query)
+        xmin, ymin, xmax, ymax = (float(c) for c in query["bbox"][0].split(","))
+        ids = [
+            "f{}".format(i)
+            for i in range(self.features)
+            if xmin <= i % 25 + 0.5 <= xmax and ymin <= i // 25 + 0.5 <= ymax
+        ]
+        count = min(int(query["count"][0]), self.max_count)
+        self.requests.append(query["bbox"][0])
+        return self.write_page(
+            Path(path).name,
+            ids[:count],
+            len(ids) if self.matched else "unknown",
+            path,
+        )
+
+
+class TestWfsDownload(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def write_page(self, name, ids, matched=10, path=None):
+        members = "".join(
+            '<wfs:member><app:F gml:id="{0}"><app:v>{0}</app:v></app:F>'
+            "</wfs:member>".format(i)
+            for i in ids
+        )
+        path = Path(path or Path(self.tmp_dir.name) / name)
+        path.write_text(
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<wfs:FeatureCollection xmlns:wfs="http://www.opengis.net/wfs/2.0" '
+            'xmlns:gml="http://www.opengis.net/gml/3.2" xmlns:app="urn:app" '
+            'numberMatched="{}" numberReturned="{}">'
+            "<wfs:boundedBy/>{}</wfs:FeatureCollection>".format(
+                matched, len(ids), members
+            ),
+            encoding="utf-8",
+        )
+        return str(path)
+
+    def test_page_summary(self):
+        page = self.write_page("page.xml", ["f1", "f2", "f3"])
+        self.assertEqual(page_summary(page), (3, "f1", 10))
+
+        report = Path(self.tmp_dir.name) / "report.xml"
+        report.write_text(
+            '<ows:ExceptionReport xmlns:ows="http://www.opengis.net/ows/1.1">'
+            "<ows:Exception><ows:ExceptionText>Unknown type</ows:ExceptionText>"
+            "</ows:Exception></ows:ExceptionReport>"
+        )
+        with self.assertRaises(ServiceException):
+            page_summary(str(report))
+
+        # response cut by the server
+        cut = Path(self.tmp_dir.name) / "cut.xml"
+        content = Path(page).read_bytes()
+        cut.write_bytes(content[: content.index(b'gml:id="f1"')])
+        with self.assertRaises(ServiceException):
+            page_summary(str(cut))
+        with self.assertRaises(ServiceException):
+            merge_feature_collections([page, str(cut)], str(cut) + ".merged")
+
+    def test_fetch_page(self):
+        path = str(Path(self.tmp_dir.name) / "page.xml")
+        with mock.patch.object(
+            wfs_download.requests,
+            "get",
+            side_effect=requests.ConnectionError("Connection refused"),
+        ):
+            with self.assertRaises(ServiceException) as context:
+                fetch_page("http://example.com/wfs", path)
+        self.assertIn("Connection refused", str(context.exception))
+
+    def test_check_exception(self):
+        # only the beginning of the document is parsed
+        page = Path(self.write_page("page.xml", ["f1"]))
+        page.write_bytes(page.read_bytes() + b"<not closed" * SNIFF_SIZE)
+        check_exception(str(page))
+
+        report = Path(self.tmp_dir.name) / "report.xml"
+        report.write_text(
+            '<ServiceExceptionReport version="1.2.0">'
+            "<ServiceException>Unknown type</ServiceException>"
+            "</ServiceExceptionReport>"
+        )
+        with self.assertRaises(ServiceException) as context:
+            check_exception(str(report))
+        self.assertEqual(str(context.exception), "Unknown type")
+
+        not_xml = Path(self.tmp_dir.name) / "error.html"
+        not_xml.write_text("Internal Server Error")
+        with self.assertRaises(ServiceException):
+            check_exception(str(not_xml))
+
+    def test_merge_feature_collections(self):
+        pages = [
+            self.write_page("page_0.xml", ["f1", "f2"]),
+            self.write_page("page_1.xml", ["f2", "f3"]),
+            self.write_page("page_2.xml", []),
+        ]
+        output = Path(self.tmp_dir.name) / "merged.xml"
+
+        # duplicated features are skipped
+        self.assertEqual(merge_feature_collections(pages, str(output)), 3)
+
+        root = ET.parse(output).getroot()
+        self.assertEqual(root.tag, "{http://www.opengis.net/wfs/2.0}FeatureCollection")
+        self.assertEqual(root.get("numberReturned"), "3")
+        self.assertEqual(root.get("numberMatched"), "10")
+        self.assertEqual([member[0].get(GML_ID) for member in root], ["f1", "f2", "f3"])
+
+        # tiles of different queries, up to a limit
+        pages[1] = self.write_page("page_1.xml", ["f2", "f3"], matched=4)
+        self.assertEqual(merge_feature_collections(pages, str(output), 2), 2)
+        root = ET.parse(output).getroot()
+        self.assertEqual(root.get("numberReturned"), "2")
+        self.assertEqual(root.get("numberMatched"), "unknown")
+
+    def test_download_manifest(self):
+        output = str(Path(self.tmp_dir.name) / "out.xml")
+        manifest = DownloadManifest(output, "http://example.com/wfs?count=10")
+        self.assertEqual(manifest.state, {})
+        manifest.save(pages={"0": [10, 10, "f1", 25]})
+
+        # the state is reused by the same request only
+        manifest = DownloadManifest(output, "http://example.com/wfs?count=10")
+        self.assertEqual(manifest.state["pages"], {"0": [10, 10, "f1", 25]})
+        self.assertEqual(
+            DownloadManifest(output, "http://example.com/wfs?count=20").state, {}
+        )
+
+        manifest.remove()
+        self.assertFalse(Path(output + DownloadManifest.SUFFIX).exists())
+
+    def test_download_features_wfs_1_0_0(self):
+        output = str(Path(self.tmp_dir.name) / "out.xml")
+        urls = []
+
+        def fetch_page(url, path):
+            urls.append(url)
+            return self.write_page(Path(path).name, ["f1"], path=path)
+
+        with mock.patch.object(wfs_download, "fetch_page", side_effect=fetch_page):
+            download_features(
+                Wfs100(),
+                {"typename": ["app:F"], "bbox": [0, 1, 2, 3], "maxfeatures": 10},
+                output,
+            )
+
+        query = parse_qs(urlparse(urls[0]).query)
+        self.assertEqual(
+            query,
+            {
+                "service": ["WFS"],
+                "version": ["1.0.0"],
+                "request": ["GetFeature"],
+                "typename": ["app:F"],
+                "bbox": ["0,1,2,3"],
+                "maxfeatures": ["10"],
+            },
+        )
+        self.assertTrue(Path(output).is_file())
+
+    def test_download_features_paged(self):
+        output = str(Path(self.tmp_dir.name) / "out.xml")
+        # pages limited by the server to less features than requested
+        for matched in (True, False):
+            for features, max_features, expected in (
+                (25, None, 25),
+                (25, 12, 12),
+                (30, None, 30),
+                (4, None, 4),
+                (0, None, 0),
+            ):
+                with self.subTest(
+                    matched=matched, features=features, max_features=max_features
+                ):
+                    wfs = CappedWfs(self.write_page, features, 5, matched)
+                    with mock.patch.object(wfs_download, "fetch_page", wfs.fetch_page):
+                        count = download_features_paged(
+                            wfs, {}, output, 10, 3, max_features
+                        )
+
+                    self.assertEqual(count, expected)
+                    root = ET.parse(output).getroot()
+                    self.assertEqual(
+                        [member[0].get(GML_ID) for member in root],
+                        ["f{}".format(i) for i in range(expected)],
+                    )
+                    # then paged with the size of the first page
+                    self.assertEqual(wfs.requests[0], (0, 5))
+                    step = min(features, 5) or 5
+                    self.assertTrue(all(start % step == 0 for start, _ in wfs.requests))
+                    if matched:
+                        # no request after the last feature
+                        self.assertTrue(
+                            all(start < max(expected, 1) for start, _ in wfs.requests)
+                        )
+
+    def test_server_limit(self):
+        self.assertIsNone(server_limit(Wfs100()))
+        wfs = TiledWfs(
+            self.write_page,
+            0,
+            0,
+            capabilities='<wfs:WFS_Capabilities xmlns:wfs="http://www.opengis.net/wfs" '
+            'xmlns:ows="http://www.opengis.net/ows">'
+            "<ows:OperationsMetadata>"
+            '<ows:Operation name="GetFeature">'
+            '<ows:Constraint name="DefaultMaxFeatures">'
+            "<ows:Value>1000</ows:Value></ows:Constraint></ows:Operation>"
+            '<ows:Constraint name="CountDefault">'
+            "<ows:NoValues/><ows:DefaultValue>50</ows:DefaultValue></ows:Constraint>"
+            '<ows:Constraint name="ImplementsResultPaging">'
+            "<ows:NoValues/><ows:DefaultValue>TRUE</ows:DefaultValue></ows:Constraint>"
+            "</ows:OperationsMetadata></wfs:WFS_Capabilities>",
+        )
+        self.assertEqual(server_limit(wfs), 50)
+
+    def test_download_features_tiled(self):
+        output = str(Path(self.tmp_dir.name) / "out.xml")
+        capabilities = (
+            '<wfs:WFS_Capabilities xmlns:wfs="http://www.opengis.net/wfs/2.0" '
+            'xmlns:ows="http://www.opengis.net/ows/1.1"><ows:OperationsMetadata>'
+            '<ows:Constraint name="CountDefault">'
+            "<ows:NoValues/><ows:DefaultValue>50</ows:DefaultValue></ows:Constraint>"
+            "</ows:OperationsMetadata></wfs:WFS_Capabilities>"
+        )
+        # server limited to 50 features, less than the tile size
+        for matched, capabilities, expected, warning in (
+            (True, capabilities, 500, False),
+            (False, capabilities, 500, False),
+            (True, None, 500, False),
+            (False, None, 50, True),
+        ):
+            with self.subTest(matched=matched, capabilities=bool(capabilities)):
+                wfs = TiledWfs(
+                    self.write_page, 500, 50, matched, capabilities=capabilities
+                )
+                with mock.patch.object(
+                    wfs_download, "fetch_page", wfs.fetch_page
+                ), mock.patch.object(wfs_download, "plg_logger") as logger:
+                    count = download_features_tiled(
+                        wfs, {"bbox": [0, 0, 25, 20]}, output, 100, 3
+                    )
+
+                self.assertEqual(count, expected)
+                root = ET.parse(output).getroot()
+                self.assertEqual(
+                    len({member[0].get(GML_ID) for member in root}), expected
+                )
+                pushed = [
+                    call
+                    for call in logger.log.call_args_list
+                    if call.kwargs.get("push")
+                ]
+                self.assertEqual(bool(pushed), warning)
+
+    def test_split_bbox(self):
+        self.assertEqual(
+            split_bbox([0, 0, 2, 4, "EPSG:4326"]),
+            [
+                [0, 0, 1, 2, "EPSG:4326"],
+                [1, 0, 2, 2, "EPSG:4326"],
+                [0, 2, 1, 4, "EPSG:4326"],
+                [1, 2, 2, 4, "EPSG:4326"],
+            ],
+        )
+
+
+# ############################################################################
+# ####### Stand-alone run ########
+# ################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+#! python3  # noqa E265
+
+"""
+    Usage from the repo root folder:
+
+    .. code-block:: bash
+
+        # for whole tests
+        python -m unittest tests.qgis.test_xml_utils
+        # for specific test
+        python -m unittest tests.qgis.test_xml_utils.TestXmlUtils.test_ns_agnostic_xpath
+"""
+
+# standard library
+import copy
+import unittest
+import xml.etree.ElementTree as ET
+from unittest import mock
+
+# project
+from gml_application_schema_toolbox.core.xml_utils import (
+    ns_agnostic_xpath,
+    remove_prefix,
+)
+
+# ############################################################################
+# ########## Globals #############
+# ################################
+
+FEATURE = """<app:Station xmlns:app="urn:app" xmlns:gml="http://www.opengis.net/gml/3.2"
+    xmlns:xlink="http://www.w3.org/1999/xlink" gml:id="s1">
+  <app:name>Station 1</app:name>
+  <app:measure><app:value>1.5</app:value><app:unit>m</app:unit></app:measure>
+  <app:measure><app:value>2.5</app:value><app:unit>cm</app:unit></app:measure>
+  <code>S1</code>
+  <app:link xlink:href="http://example.com/s1"/>
+</app:Station>"""
+
+# ############################################################################
+# ########## Classes #############
+# ################################
+
+
+class TestXmlUtils(unittest.TestCase):
+    def setUp(self):
+        self.feature = ET.fromstring(FEATURE)
+        self.unprefixed = copy.deepcopy(self.feature)
+        remove_prefix(self.unprefixed)
+
+    def assertSameResults(self, xpath):
+        ns_xpath = ns_agnostic_xpath(xpath)
+        self.assertIsNotNone(ns_xpath)
+        # same nodes as the original expression on a tree without namespaces
+        self.assertEqual(
+            [n.text for n in self.feature.findall(ns_xpath)],
+            [n.text for n in self.unprefixed.findall(xpath)],
+        )
+
+    def test_ns_agnostic_xpath(self):
+        self.assertEqual(ns_agnostic_xpath("name"), "{*}name")
+        self.assertEqual(ns_agnostic_xpath("measure/value"), "{*}measure/{*}value")
+        self.assertEqual(ns_agnostic_xpath("name/text()"), "{*}name/text()")
+        # prefixed names, wildcards, parent steps and functions are kept
+        self.assertEqual(ns_agnostic_xpath("{urn:app}name"), "{urn:app}name")
+        self.assertEqual(ns_agnostic_xpath("./*/.."), "./*/..")
+        self.assertEqual(ns_agnostic_xpath("measure[1]"), "{*}measure[1]")
+        self.assertEqual(
+            ns_agnostic_xpath("measure[unit='cm']/value"),
+            "{*}measure[{*}unit='cm']/{*}value",
+        )
+        self.assertEqual(
+            ns_agnostic_xpath("measure[last()]/value"),
+            "{*}measure[last()]/{*}value",
+        )
+
+        for xpath in (
+            "name",
+            "code",
+            "measure/value",
+            "measure[1]/value",
+            "measure[last()]/unit",
+            "measure[unit='cm']/value",
+            ".//value",
+        ):
+            with self.subTest(xpath=xpath):
+                self.assertSameResults(xpath)
+
+    def test_ns_agnostic_xpath_fallback(self):
+        # attribute names would still be prefixed on the original tree
+        self.assertIsNone(ns_agnostic_xpath("link[@href]"))
+        self.assertIsNone(ns_agnostic_xpath("measure[@id='m1']/value"))
+
+        # no namespace wildcard before Python 3.8
+        with mock.patch("sys.version_info", (3, 7, 0)):
+            self.assertIsNone(ns_agnostic_xpath("name"))
+
+
+# ############################################################################
+# ####### Stand-alone run ########
+# ################################
+if __name__ == "__main__":
+    unittest.main()